@@ -2,19 +2,30 @@ import os
 import httpx
 import base64
 import json
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 import logging
 from dotenv import load_dotenv
 from PIL import Image
 from io import BytesIO
-import numpy as np
-import torch
-from transformers import AutoImageProcessor, AutoModelForImageClassification
 import uuid
 import time
 import asyncio
+import threading
+import multiprocessing
 from concurrent.futures import ThreadPoolExecutor
 import functools
+from config import Config
+from batching import MicroBatcher
+from inference_pool import InferencePool
+from result_cache import create_result_cache
+from fdc_store import open_fdc_store
+from nutrition_cache import create_nutrition_cache
+from http_clients import http_clients
+from circuit_breaker import CircuitBreaker, CircuitOpenError, Hedger
+
+# torch, transformers and the modules built on them are imported inside
+# load_model() and the inference functions, so importing this module (and
+# serving non-AI routes) doesn't pay the multi-second ML stack import
 
 # Load environment variables
 load_dotenv()
@@ -27,65 +38,323 @@ logger = logging.getLogger("ai_orchestrator")
 USDA_API_KEY = os.getenv("USDA_API_KEY")
 USDA_API_URL = os.getenv("USDA_API_URL", "https://api.nal.usda.gov/fdc/v1")
 
+# Nutrient totals reported for every meal
+NUTRIENT_KEYS = ["calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium"]
+
 # Global variables for model and processor
 image_processor = None
+fast_preprocessor = None
 model = None
+inference_backend = None
 model_loaded = False
 executor = ThreadPoolExecutor(max_workers=1)  # Single worker for model inference
+inference_pool: Optional[InferencePool] = None  # Worker processes when INFERENCE_MODE is "process"
 
-def load_model():
-    """Load the food classification model and image processor."""
-    global image_processor, model, model_loaded
+# Optional small first-pass classifier (CASCADE_MODEL_NAME)
+cascade_processor = None
+cascade_fast_preprocessor = None
+cascade_model = None
+cascade_backend = None
+cascade_label_index = None  # Cascade class index for each main-model class
+
+# Shared with forked inference workers so escalation counts add up across processes
+_cascade_images = multiprocessing.Value("q", 0)
+_cascade_escalated = multiprocessing.Value("q", 0)
+
+_load_lock = threading.Lock()
+model_state = "not_loaded"  # not_loaded -> loading -> warming_up -> ready, or failed
+
+def _load_classifier(model_name: str) -> Tuple[Any, Any, bool]:
+    """
+    Load an image processor and classification model from a local snapshot
+    or the hub. Returns (processor, model, whether the weights are mapped).
+    """
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+    from model_snapshot import is_snapshot, load_snapshot_model
+    
+    if is_snapshot(model_name):
+        # Offline snapshot: no hub lookups, weights mapped read-only from disk
+        processor = AutoImageProcessor.from_pretrained(model_name, local_files_only=True)
+        try:
+            return processor, load_snapshot_model(model_name), True
+        except Exception as e:
+            logger.warning(f"Could not memory-map snapshot, loading normally: {str(e)}")
+            return processor, AutoModelForImageClassification.from_pretrained(model_name, local_files_only=True), False
+    
+    processor = AutoImageProcessor.from_pretrained(model_name)
+    return processor, AutoModelForImageClassification.from_pretrained(model_name), False
+
+def _build_backend(model_name: str, classifier: Any) -> Tuple[Any, Any]:
+    """Quantize if configured and wrap the model in the configured backend"""
+    from inference_backends import create_backend, quantize_dynamic_int8
+    
+    classifier.eval()  # Set to evaluation mode
+    if Config.QUANTIZE_MODEL and Config.INFERENCE_BACKEND != "onnx":
+        # ONNX quantizes its own exported graph instead
+        classifier = quantize_dynamic_int8(classifier)
+        logger.info(f"Using int8 dynamically quantized {model_name}")
+    backend = create_backend(Config.INFERENCE_BACKEND, classifier,
+                             quantized=Config.QUANTIZE_MODEL, model_name=model_name)
+    return classifier, backend
+
+def _normalize_label(label: str) -> str:
+    return label.strip().lower().replace(" ", "_").replace("-", "_")
+
+def build_label_index(id2label: Dict[int, str], cascade_id2label: Dict[int, str]) -> Optional[List[int]]:
+    """
+    Map every main-model class to the cascade class with the same name.
+    Returns None if the two models don't share exactly the same label set.
+    """
+    cascade_ids = {_normalize_label(name): idx for idx, name in cascade_id2label.items()}
+    if len(cascade_ids) != len(id2label):
+        return None
+    index = []
+    for idx in range(len(id2label)):
+        cascade_idx = cascade_ids.get(_normalize_label(id2label[idx]))
+        if cascade_idx is None:
+            return None
+        index.append(cascade_idx)
+    return index
+
+def load_cascade_model() -> None:
+    """
+    Load the small first-pass classifier. Any problem, including a label
+    space that differs from the main model, only disables the cascade.
+    """
+    global cascade_processor, cascade_fast_preprocessor, cascade_model, cascade_backend, cascade_label_index
+    import torch
+    from preprocessing import build_fast_preprocessor
+    
     try:
-        logger.info("Loading food classification model and processor...")
-        image_processor = AutoImageProcessor.from_pretrained("nateraw/food")
-        model = AutoModelForImageClassification.from_pretrained("nateraw/food")
-        model.eval()  # Set to evaluation mode
-        model_loaded = True
-        logger.info("Food classification model and processor loaded successfully")
+        processor, classifier, weights_mapped = _load_classifier(Config.CASCADE_MODEL_NAME)
+        label_index = build_label_index(model.config.id2label, classifier.config.id2label)
+        if label_index is None:
+            logger.error(f"Cascade model {Config.CASCADE_MODEL_NAME} has a different label space "
+                         f"than {Config.MODEL_NAME}; cascade disabled")
+            return
+        classifier, backend = _build_backend(Config.CASCADE_MODEL_NAME, classifier)
+        if Config.INFERENCE_MODE == "process" and not weights_mapped:
+            classifier.share_memory()
     except Exception as e:
-        logger.error(f"Error loading model: {str(e)}")
-        raise
+        logger.error(f"Error loading cascade model, cascade disabled: {str(e)}")
+        return
+    
+    cascade_processor = processor
+    cascade_model = classifier
+    cascade_backend = backend
+    cascade_label_index = torch.tensor(label_index, dtype=torch.long)
+    if Config.FAST_PREPROCESSING:
+        cascade_fast_preprocessor = build_fast_preprocessor(processor, Config.MAX_BATCH_SIZE)
+    logger.info(f"Cascade enabled: {Config.CASCADE_MODEL_NAME} first, escalating below "
+                f"{Config.CASCADE_THRESHOLD:.0%} confidence")
+
+def load_model():
+    """
+    Load the food classification model and image processor, then warm it up.
+    Safe to call from several threads at once: only the first call loads.
+    """
+    global image_processor, fast_preprocessor, model, inference_backend, model_loaded, inference_pool, model_state
+    with _load_lock:
+        if model_loaded:
+            return
+        try:
+            model_state = "loading"
+            logger.info("Loading food classification model and processor...")
+            from preprocessing import build_fast_preprocessor
+            
+            image_processor, model, weights_mapped = _load_classifier(Config.MODEL_NAME)
+            model, inference_backend = _build_backend(Config.MODEL_NAME, model)
+            logger.info(f"Using {inference_backend.name} inference backend")
+            if Config.FAST_PREPROCESSING:
+                fast_preprocessor = build_fast_preprocessor(image_processor, Config.MAX_BATCH_SIZE)
+            logger.info("Food classification model and processor loaded successfully")
+            
+            if Config.CASCADE_MODEL_NAME:
+                load_cascade_model()
+            
+            if Config.INFERENCE_MODE == "process" and inference_pool is None:
+                # Move weights to shared memory, then fork the workers so they all
+                # map the same pages instead of loading their own copy. Mapped
+                # snapshot weights are already shared through the page cache.
+                if not weights_mapped:
+                    model.share_memory()
+                inference_pool = InferencePool(Config.MAX_WORKERS)
+                inference_pool.start()
+            
+            model_state = "warming_up"
+            warm_up_model()
+            
+            model_loaded = True
+            model_state = "ready"
+        except Exception as e:
+            model_state = "failed"
+            logger.error(f"Error loading model: {str(e)}")
+            raise
+
+def get_model_state() -> str:
+    """Return the model lifecycle state used for readiness checks"""
+    return model_state
+
+def _synthetic_image_bytes() -> bytes:
+    """Encode a noise photo as JPEG so warm-up exercises the real decode path"""
+    image = Image.effect_noise((1024, 768), 64).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+def warm_up_sync(images_data: List[bytes]) -> None:
+    """Decode and classify a synthetic batch, raising on any failure"""
+    classify_images_sync([decode_image(image_data) for image_data in images_data], warm_up=True)
+
+def warm_up_model():
+    """
+    Run synthetic batches at every configured batch size, so the first real
+    requests don't pay allocator, thread-pool and kernel-selection costs
+    """
+    if not Config.WARMUP_ENABLED:
+        return
+    
+    batch_sizes = Config.WARMUP_BATCH_SIZES or sorted(
+        {1, Config.MAX_BATCH_SIZE} | {2 ** i for i in range(Config.MAX_BATCH_SIZE.bit_length())
+                                      if 2 ** i <= Config.MAX_BATCH_SIZE}
+    )
+    sample = _synthetic_image_bytes()
+    start_time = time.time()
+    
+    for batch_size in batch_sizes:
+        batch = [sample] * batch_size
+        if inference_pool is not None:
+            # Every worker process has its own allocator and thread pools
+            inference_pool.run_on_each(warm_up_sync, batch)
+        else:
+            # Warm up on the inference thread itself so its buffers get allocated
+            executor.submit(warm_up_sync, batch).result()
+    
+    logger.info(f"Model warm-up finished for batch sizes {batch_sizes} in {time.time() - start_time:.2f}s")
+
+_load_task: Optional[asyncio.Task] = None
 
 async def ensure_model_loaded():
     """Ensure the model is loaded before processing."""
-    global model_loaded
+    global _load_task
     if not model_loaded:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, load_model)
+        # Share one background load between startup and early requests
+        if _load_task is None or _load_task.done():  # Done but not loaded means it failed; retry
+            loop = asyncio.get_event_loop()
+            _load_task = asyncio.ensure_future(loop.run_in_executor(None, load_model))
+        await asyncio.shield(_load_task)
 
-def process_image_sync(image_data: bytes) -> List[Dict[str, Any]]:
-    """Process image synchronously in thread pool"""
-    try:
-        # Convert bytes to PIL Image
-        image = Image.open(BytesIO(image_data))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize image more aggressively for faster processing
-        max_size = 224
-        if max(image.size) > max_size:
-            ratio = max_size / max(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
-        
-        # Prepare inputs
-        inputs = image_processor(images=image, return_tensors="pt")
-        
-        # Get model predictions with no_grad for faster inference
-        with torch.no_grad():
-            outputs = model(**inputs)
-            logits = outputs.logits
-            probs = torch.nn.functional.softmax(logits, dim=-1)
-            top_probs, top_indices = torch.topk(probs, k=3)
-        
-        # Process outputs
+def get_model_input_size() -> Optional[Tuple[int, int]]:
+    """Return the (width, height) the image processor feeds to the model, if fixed"""
+    size = getattr(image_processor, "size", None) or {}
+    if "height" in size and "width" in size:
+        return size["width"], size["height"]
+    return None
+
+def decode_image(image_data: bytes) -> Image.Image:
+    """Decode uploaded bytes into an RGB image sized for the model"""
+    # Convert bytes to PIL Image (only the header is read here)
+    image = Image.open(BytesIO(image_data))
+    
+    target_size = get_model_input_size()
+    draft_size = target_size or (Config.MAX_IMAGE_DIMENSION, Config.MAX_IMAGE_DIMENSION)
+    
+    # Ask the JPEG decoder to downscale in the DCT domain (by 1/2, 1/4 or 1/8)
+    # while staying at or above the target size, so a 12 MP photo never
+    # becomes a full-resolution bitmap
+    if image.format == "JPEG":
+        image.draft("RGB", draft_size)
+    
+    # Convert to RGB if necessary
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    if target_size is None:
+        # Unknown processor geometry: shrink and let the processor resize
+        if max(image.size) > Config.MAX_IMAGE_DIMENSION:
+            image.thumbnail(draft_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        return image
+    
+    # Resize straight to the model input so the processor doesn't resize again
+    if image.size != target_size:
+        scale = min(image.size[0] / target_size[0], image.size[1] / target_size[1])
+        if scale >= 2:
+            # Much larger than the target: box-reduce first, then a cheap bilinear pass
+            image = image.resize(target_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        else:
+            image = image.resize(target_size, getattr(image_processor, "resample", Image.Resampling.BILINEAR))
+    
+    return image
+
+def _class_probabilities(images: List[Image.Image], processor: Any, preprocessor: Any,
+                         backend: Any, do_resize: bool) -> Any:
+    """Preprocess a batch and return softmax probabilities from one forward pass"""
+    import torch
+    
+    if preprocessor is not None:
+        pixel_values = preprocessor(images)
+    else:
+        pixel_values = processor(images=images, do_resize=do_resize, return_tensors="pt")["pixel_values"]
+    
+    # Get model predictions with no_grad for faster inference
+    with torch.no_grad():
+        return torch.nn.functional.softmax(backend(pixel_values), dim=-1)
+
+def _record_cascade(images: int, escalated: int) -> None:
+    with _cascade_images.get_lock():
+        _cascade_images.value += images
+    with _cascade_escalated.get_lock():
+        _cascade_escalated.value += escalated
+
+def get_cascade_stats() -> Dict[str, Any]:
+    """Return how many images the cascade handled and how many it escalated"""
+    images = _cascade_images.value
+    escalated = _cascade_escalated.value
+    return {
+        "enabled": cascade_backend is not None,
+        "model": Config.CASCADE_MODEL_NAME or None,
+        "threshold": Config.CASCADE_THRESHOLD,
+        "images": images,
+        "escalated": escalated,
+        "escalation_rate": escalated / images if images else 0.0,
+    }
+
+def classify_images_sync(images: List[Image.Image], warm_up: bool = False) -> List[List[Dict[str, Any]]]:
+    """
+    Run a batched forward pass and return the top predictions per image.
+    With a cascade model, only images it isn't confident about go through
+    the main model. Warm-up runs both models on every image.
+    """
+    import torch
+    
+    # decode_image already resized the images when the processor has a
+    # fixed input size
+    main_do_resize = get_model_input_size() is None
+    
+    if cascade_backend is None:
+        probs = _class_probabilities(images, image_processor, fast_preprocessor,
+                                     inference_backend, main_do_resize)
+    else:
+        # Reorder the cascade's classes into the main model's label order
+        probs = _class_probabilities(images, cascade_processor, cascade_fast_preprocessor,
+                                     cascade_backend, True)[:, cascade_label_index]
+        confident = (probs.max(dim=-1).values >= Config.CASCADE_THRESHOLD).tolist()
+        escalate = [index for index, ok in enumerate(confident) if warm_up or not ok]
+        if escalate:
+            probs[escalate] = _class_probabilities([images[index] for index in escalate], image_processor,
+                                                   fast_preprocessor, inference_backend, main_do_resize)
+        if not warm_up:
+            _record_cascade(len(images), len(escalate))
+    
+    top_probs, top_indices = torch.topk(probs, k=Config.TOP_PREDICTIONS)
+    
+    # Process outputs
+    results = []
+    for row_probs, row_indices in zip(top_probs, top_indices):
         food_items = []
-        for prob, idx in zip(top_probs[0], top_indices[0]):
+        for prob, idx in zip(row_probs, row_indices):
             confidence = prob.item()
-            if confidence > 0.1:  # Only include items with confidence > 10%
+            if confidence > Config.CONFIDENCE_THRESHOLD:  # Only include items with confidence > 10%
                 food_name = model.config.id2label[idx.item()]
                 food_items.append({
                     "name": food_name,
@@ -93,21 +362,119 @@ def process_image_sync(image_data: bytes) -> List[Dict[str, Any]]:
                     "portion_size": "medium",
                     "weight_grams": 100
                 })
-        
-        return food_items
-        
+        results.append(food_items)
+    
+    return results
+
+def process_images_sync(images_data: List[bytes]) -> List[List[Dict[str, Any]]]:
+    """Decode and classify a batch of images synchronously in the thread pool"""
+    results: List[List[Dict[str, Any]]] = [[] for _ in images_data]
+    
+    # Decode each image separately so one bad upload doesn't fail the batch
+    decoded = []
+    for position, image_data in enumerate(images_data):
+        try:
+            decoded.append((position, decode_image(image_data)))
+        except Exception as e:
+            logger.error(f"Error decoding image: {str(e)}")
+    
+    if not decoded:
+        return results
+    
+    try:
+        predictions = classify_images_sync([image for _, image in decoded])
+        for (position, _), food_items in zip(decoded, predictions):
+            results[position] = food_items
     except Exception as e:
-        logger.error(f"Error in process_image_sync: {str(e)}")
-        return []
+        logger.error(f"Error in process_images_sync: {str(e)}")
+    
+    return results
+
+def process_image_sync(image_data: bytes) -> List[Dict[str, Any]]:
+    """Process image synchronously in thread pool"""
+    return process_images_sync([image_data])[0]
+
+async def run_inference(fn, *args):
+    """Run an inference function on the worker processes or the inference thread"""
+    if inference_pool is not None:
+        return await inference_pool.run(fn, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, fn, *args)
+
+async def run_inference_batch(images_data: List[bytes]) -> List[List[Dict[str, Any]]]:
+    """Run one batch of images on the inference workers"""
+    return await run_inference(process_images_sync, images_data)
+
+def shutdown_inference() -> None:
+    """Stop inference worker processes, if any"""
+    global inference_pool
+    if inference_pool is not None:
+        inference_pool.shutdown()
+        inference_pool = None
+
+# Micro-batcher that groups concurrent requests into a single forward pass
+inference_batcher = MicroBatcher(
+    run_inference_batch,
+    max_batch_size=Config.MAX_BATCH_SIZE,
+    window_ms=Config.BATCH_WINDOW_MS,
+    max_concurrency=Config.MAX_WORKERS if Config.INFERENCE_MODE == "process" else 1,
+    name="inference"
+)
+
+async def fetch_food_details(fdc_ids: List[int]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Fetch several FDC foods with one multi-item POST /foods call. Returns the
+    food records in request order, None for ids FDC didn't return.
+    """
+    response = await http_clients.get("usda").post(
+        f"{USDA_API_URL}/foods",
+        params={"api_key": USDA_API_KEY},
+        json={"fdcIds": list(dict.fromkeys(fdc_ids)), "format": "full"}
+    )
+    response.raise_for_status()
+    foods_by_id = {food.get("fdcId"): food for food in response.json() if isinstance(food, dict)}
+    return [foods_by_id.get(fdc_id) for fdc_id in fdc_ids]
+
+# Collects /food/{id} detail lookups from all in-flight meals into multi-item
+# requests; FDC accepts at most 20 ids per call
+usda_detail_batcher = MicroBatcher(
+    fetch_food_details,
+    max_batch_size=min(Config.USDA_BATCH_SIZE, 20),
+    window_ms=Config.USDA_BATCH_WINDOW_MS,
+    max_concurrency=Config.USDA_BATCH_CONCURRENCY,
+    name="usda_details"
+)
+
+# Fails USDA lookups fast while the upstream is erroring or slow
+usda_breaker = CircuitBreaker(
+    "usda",
+    window_size=Config.USDA_BREAKER_WINDOW,
+    min_calls=Config.USDA_BREAKER_MIN_CALLS,
+    failure_threshold=Config.USDA_BREAKER_FAILURE_RATE,
+    slow_call_seconds=Config.USDA_BREAKER_SLOW_CALL_SECONDS,
+    open_seconds=Config.USDA_BREAKER_OPEN_SECONDS
+) if Config.USDA_BREAKER_ENABLED else None
+
+# Optional hedged requests, timed from the breaker's latency history
+usda_hedger = Hedger(
+    usda_breaker,
+    percentile=Config.USDA_HEDGE_PERCENTILE,
+    min_delay_ms=Config.USDA_HEDGE_MIN_DELAY_MS
+) if usda_breaker is not None and Config.USDA_HEDGE_ENABLED else None
 
 class AIOrchestrator:
     """
     Orchestrates the AI inference flow with timeout handling and optimization
     """
     
+    # Total time allowed for one meal, streamed or not
+    PROCESSING_TIMEOUT = 60.0
+    
     def __init__(self):
-        self.http_timeout = httpx.Timeout(10.0, connect=5.0)  # 10s total, 5s connect
         self.logger = logging.getLogger("ai_orchestrator")
+        self.result_cache = create_result_cache()
+        self.fdc_store = open_fdc_store()
+        self.nutrition_cache = create_nutrition_cache()
         self.logger.info("AIOrchestrator initialized")
     
     async def process_meal(self, image_data: Optional[bytes], 
@@ -130,10 +497,19 @@ class AIOrchestrator:
         
         try:
             # Set overall timeout for the entire process
-            async with asyncio.timeout(60.0):  # 60 second total timeout
+            async with asyncio.timeout(self.PROCESSING_TIMEOUT):
                 
                 # Step 1: Process image to identify foods (if provided)
-                if image_data:
+                cached = None
+                if image_data and self.result_cache:
+                    # Retried uploads of the same photo skip inference and USDA entirely
+                    cached, fingerprint = await self.result_cache.lookup(image_data)
+                    if cached:
+                        self.logger.info(f"[{request_id}] Result cache hit")
+                        results["identified_foods"] = cached["identified_foods"]
+                        results["nutrition"] = cached["nutrition"]
+                
+                if image_data and not cached:
                     self.logger.info(f"[{request_id}] Starting food item identification")
                     
                     try:
@@ -154,6 +530,12 @@ class AIOrchestrator:
                             )
                             results["nutrition"] = nutrition_data
                             
+                            if self.result_cache and self.is_cacheable(food_items, nutrition_data):
+                                self.result_cache.store(fingerprint, {
+                                    "identified_foods": food_items,
+                                    "nutrition": nutrition_data
+                                })
+                            
                     except asyncio.TimeoutError:
                         self.logger.warning(f"[{request_id}] Food identification timed out, using fallback")
                         results["identified_foods"] = self.get_fallback_foods()
@@ -180,7 +562,9 @@ class AIOrchestrator:
             return results
             
         except asyncio.TimeoutError:
-            self.logger.error(f"[{request_id}] Overall processing timed out after 60 seconds")
+            self.logger.error(
+                f"[{request_id}] Overall processing timed out after {self.PROCESSING_TIMEOUT:.0f} seconds"
+            )
             # Return fallback data
             return {
                 "identified_foods": self.get_fallback_foods(),
@@ -192,6 +576,244 @@ class AIOrchestrator:
             self.logger.error(f"[{request_id}] Error in process_meal: {str(e)}", exc_info=True)
             raise
     
+    async def process_meal_stream(self, image_data: Optional[bytes],
+                                  audio_data: Optional[bytes],
+                                  manual_transcript: Optional[str],
+                                  user_profile: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming variant of process_meal. Yields (event, data) pairs as each
+        stage finishes: identified_foods, one nutrition_item per food,
+        the aggregate nutrition, transcript, advice and finally done.
+        Timeouts fall back like process_meal does; any other failure ends
+        the stream with an error event.
+        """
+        request_id = str(uuid.uuid4())[:8]
+        self.logger.info(f"[{request_id}] === AI STREAM PROCESSING START ===")
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        # Same total limit as process_meal. A timeout scope must not span a
+        # yield, so each await below is bounded by what is left of it
+        deadline = loop.time() + self.PROCESSING_TIMEOUT
+        nutrition_data: Dict[str, Any] = {}
+        sent = set()
+        
+        try:
+            if image_data:
+                cached = None
+                fingerprint = None
+                if self.result_cache:
+                    async with asyncio.timeout_at(deadline):
+                        cached, fingerprint = await self.result_cache.lookup(image_data)
+                
+                if cached:
+                    self.logger.info(f"[{request_id}] Result cache hit")
+                    sent.add("identified_foods")
+                    yield "identified_foods", cached["identified_foods"]
+                    for item in cached["nutrition"].get("items", []):
+                        yield "nutrition_item", item
+                    nutrition_data = cached["nutrition"]
+                else:
+                    try:
+                        async with asyncio.timeout_at(deadline):
+                            food_items = await asyncio.wait_for(self.identify_food_items(image_data), timeout=30.0)
+                    except asyncio.TimeoutError:
+                        if loop.time() >= deadline:
+                            raise
+                        food_items = None
+                    
+                    if food_items is None:
+                        # A guessed "mixed meal" is not worth a USDA lookup
+                        self.logger.warning(f"[{request_id}] Food identification timed out, using fallback")
+                        sent.add("identified_foods")
+                        yield "identified_foods", self.get_fallback_foods()
+                        nutrition_data = self.get_fallback_nutrition()
+                    else:
+                        sent.add("identified_foods")
+                        yield "identified_foods", food_items
+                        items = []
+                        client = http_clients.get("usda")
+                        pending = {
+                            asyncio.ensure_future(self.get_single_food_nutrition(client, food))
+                            for food in food_items[:Config.MAX_FOOD_ITEMS]
+                        }
+                        lookup_deadline = min(loop.time() + Config.SINGLE_API_TIMEOUT, deadline)
+                        try:
+                            # Emit each item as soon as its lookup finishes
+                            while pending:
+                                remaining = lookup_deadline - loop.time()
+                                if remaining <= 0:
+                                    self.logger.warning(f"[{request_id}] USDA API calls timed out")
+                                    break
+                                done, pending = await asyncio.wait(
+                                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                                )
+                                for task in done:
+                                    if task.exception() is None:
+                                        items.append(task.result())
+                                        yield "nutrition_item", task.result()
+                        finally:
+                            for task in pending:
+                                task.cancel()
+                        
+                        if items:
+                            nutrition_data = self.aggregate_nutrition(items)
+                            if self.result_cache and self.is_cacheable(food_items, nutrition_data):
+                                self.result_cache.store(fingerprint, {
+                                    "identified_foods": food_items,
+                                    "nutrition": nutrition_data
+                                })
+                        else:
+                            nutrition_data = self.get_estimated_nutrition(food_items)
+                
+                sent.add("nutrition")
+                yield "nutrition", nutrition_data
+            
+            if audio_data:
+                async with asyncio.timeout_at(deadline):
+                    transcript = await self.transcribe_audio(audio_data)
+                yield "transcript", transcript
+            elif manual_transcript:
+                yield "transcript", manual_transcript
+            
+            if nutrition_data:
+                async with asyncio.timeout_at(deadline):
+                    advice = await self.generate_advice_fast(nutrition_data, user_profile)
+                yield "advice", advice
+        
+        except asyncio.TimeoutError:
+            self.logger.error(
+                f"[{request_id}] Overall processing timed out after {self.PROCESSING_TIMEOUT:.0f} seconds"
+            )
+            # Finish with the same fallback process_meal returns
+            if "identified_foods" not in sent:
+                yield "identified_foods", self.get_fallback_foods()
+            if "nutrition" not in sent:
+                yield "nutrition", self.get_fallback_nutrition()
+            yield "advice", "Unable to analyze meal within time limit. Please try with a smaller image."
+        except Exception as e:
+            self.logger.error(f"[{request_id}] Error in process_meal_stream: {str(e)}", exc_info=True)
+            yield "error", {"detail": str(e)}
+            return
+        
+        total_time = time.time() - start_time
+        self.logger.info(f"[{request_id}] === AI STREAM PROCESSING END ({total_time:.2f}s) ===")
+        yield "done", {"processing_time": total_time}
+
+    async def process_meal_batch(self, images_data: List[bytes],
+                                 user_profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Analyze several meal photos at once. All images that miss the result
+        cache go through one batched forward pass, and each distinct food name
+        is looked up in USDA once for the whole batch. Results are returned in
+        the same order as the images.
+        """
+        request_id = str(uuid.uuid4())[:8]
+        self.logger.info(f"[{request_id}] === AI BATCH PROCESSING START ({len(images_data)} images) ===")
+        start_time = time.time()
+
+        results: List[Dict[str, Any]] = [
+            {"identified_foods": [], "transcript": None, "nutrition": {}, "advice": None}
+            for _ in images_data
+        ]
+
+        # Step 1: Serve repeated photos from the result cache
+        fingerprints: List[Any] = [None] * len(images_data)
+        misses: List[int] = []
+        if self.result_cache:
+            lookups = await asyncio.gather(*(self.result_cache.lookup(data) for data in images_data))
+            for position, (cached, fingerprint) in enumerate(lookups):
+                fingerprints[position] = fingerprint
+                if cached:
+                    results[position]["identified_foods"] = cached["identified_foods"]
+                    results[position]["nutrition"] = cached["nutrition"]
+                else:
+                    misses.append(position)
+        else:
+            misses = list(range(len(images_data)))
+
+        if misses:
+            # Step 2: One forward pass for every uncached image
+            try:
+                predictions = await asyncio.wait_for(
+                    self.identify_food_items_batch([images_data[position] for position in misses]),
+                    timeout=30.0
+                )
+            except asyncio.TimeoutError:
+                self.logger.warning(f"[{request_id}] Batch identification timed out, using fallback")
+                predictions = [self.get_fallback_foods() for _ in misses]
+
+            # Step 3: Look up each distinct food once across the whole batch
+            foods_by_name: Dict[str, Dict[str, Any]] = {}
+            for food_items in predictions:
+                for food in food_items[:Config.MAX_FOOD_ITEMS]:
+                    foods_by_name.setdefault(food["name"], food)
+            nutrition_by_name = await self.get_nutrition_by_name(list(foods_by_name.values()))
+
+            for position, food_items in zip(misses, predictions):
+                items = [
+                    dict(nutrition_by_name[food["name"]])
+                    for food in food_items[:Config.MAX_FOOD_ITEMS]
+                    if food["name"] in nutrition_by_name
+                ]
+                results[position]["identified_foods"] = food_items
+                if items:
+                    nutrition_data = self.aggregate_nutrition(items)
+                    if self.result_cache and self.is_cacheable(food_items, nutrition_data):
+                        self.result_cache.store(fingerprints[position], {
+                            "identified_foods": food_items,
+                            "nutrition": nutrition_data
+                        })
+                else:
+                    nutrition_data = self.get_estimated_nutrition(food_items)
+                results[position]["nutrition"] = nutrition_data
+
+        # Step 4: Advice per meal
+        for result in results:
+            if result["nutrition"]:
+                result["advice"] = await self.generate_advice_fast(result["nutrition"], user_profile)
+
+        total_time = time.time() - start_time
+        self.logger.info(f"[{request_id}] === AI BATCH PROCESSING END ({total_time:.2f}s, "
+                         f"{len(images_data) - len(misses)} cached) ===")
+        return results
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return cache, batching and worker counters for monitoring"""
+        return {
+            "result_cache": self.result_cache.get_stats() if self.result_cache else None,
+            "inference_batcher": inference_batcher.get_stats(),
+            "usda_detail_batcher": usda_detail_batcher.get_stats(),
+            "usda_breaker": usda_breaker.get_stats() if usda_breaker else None,
+            "usda_hedging": usda_hedger.get_stats() if usda_hedger else None,
+            "inference_pool": inference_pool.get_stats() if inference_pool else None,
+            "cascade": get_cascade_stats(),
+            "nutrition_cache": self.nutrition_cache.get_stats() if self.nutrition_cache else None,
+        }
+    
+    async def prewarm_nutrition_cache(self) -> int:
+        """
+        Look up every label the model can predict, so requests find their
+        nutrition already cached. Returns the number of labels warmed.
+        """
+        if not self.nutrition_cache or model is None:
+            return 0
+        
+        labels = list(model.config.id2label.values())
+        slots = asyncio.Semaphore(max(1, Config.NUTRITION_PREWARM_CONCURRENCY))
+        start_time = time.time()
+        
+        async def warm(client: httpx.AsyncClient, label: str) -> None:
+            async with slots:
+                await self.nutrition_cache.get_or_fetch(
+                    label, lambda: self.lookup_food_nutrition(client, {"name": label}, background=True)
+                )
+        
+        client = http_clients.get("usda")
+        await asyncio.gather(*(warm(client, label) for label in labels), return_exceptions=True)
+        
+        self.logger.info(f"Prewarmed nutrition for {len(labels)} labels in {time.time() - start_time:.2f}s")
+        return len(labels)
+    
     async def identify_food_items(self, image_data: bytes) -> List[Dict[str, Any]]:
         """
         Use MobileNetV2 model to identify food items with timeout handling
@@ -203,13 +825,12 @@ class AIOrchestrator:
             # Ensure model is loaded
             await ensure_model_loaded()
             
-            # Process image in thread pool with timeout
-            loop = asyncio.get_event_loop()
-            food_items = await loop.run_in_executor(
-                executor, 
-                process_image_sync, 
-                image_data
-            )
+            if Config.ENABLE_BATCHING:
+                # Share a forward pass with other in-flight requests
+                food_items = await inference_batcher.submit(image_data)
+            else:
+                # Process image on the inference workers
+                food_items = await run_inference(process_image_sync, image_data)
             
             self.logger.info(f"[{request_id}] Identified {len(food_items)} food items")
             return food_items if food_items else self.get_fallback_foods()
@@ -217,7 +838,59 @@ class AIOrchestrator:
         except Exception as e:
             self.logger.error(f"[{request_id}] Error identifying food items: {str(e)}")
             return self.get_fallback_foods()
-    
+
+    async def identify_food_items_batch(self, images_data: List[bytes]) -> List[List[Dict[str, Any]]]:
+        """Identify food items in several images with a single batched forward pass"""
+        try:
+            await ensure_model_loaded()
+
+            if Config.ENABLE_BATCHING:
+                predictions = await inference_batcher.submit_many(images_data)
+            else:
+                predictions = await run_inference(process_images_sync, images_data)
+
+            return [food_items if food_items else self.get_fallback_foods() for food_items in predictions]
+
+        except Exception as e:
+            self.logger.error(f"Error identifying food items in batch: {str(e)}")
+            return [self.get_fallback_foods() for _ in images_data]
+
+    async def get_nutrition_by_name(self, foods: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up nutrition for distinct foods concurrently on one client.
+        Foods whose lookup fails or times out are left out of the result.
+        """
+        nutrition_by_name: Dict[str, Dict[str, Any]] = {}
+        uncached = []
+        for food in foods:
+            cached = await self.get_cached_nutrition(food)
+            if cached is not None:
+                nutrition_by_name[food["name"]] = cached
+            else:
+                uncached.append(food)
+        if not uncached:
+            return nutrition_by_name
+
+        client = http_clients.get("usda")
+        try:
+            lookups = await asyncio.wait_for(
+                asyncio.gather(
+                    *(self.get_single_food_nutrition(client, food) for food in uncached),
+                    return_exceptions=True
+                ),
+                timeout=Config.SINGLE_API_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            self.logger.warning("USDA API calls timed out, using estimated values")
+            return nutrition_by_name
+
+        nutrition_by_name.update(
+            (food["name"], lookup)
+            for food, lookup in zip(uncached, lookups)
+            if isinstance(lookup, dict)
+        )
+        return nutrition_by_name
+
     async def get_nutrition_data_fast(self, food_items: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Get nutrition data with optimized API calls and timeouts
@@ -225,51 +898,37 @@ class AIOrchestrator:
         try:
             self.logger.info(f"Getting nutrition data for {len(food_items)} food items")
             
-            # Initialize aggregated nutrition data
-            nutrition_data = {
-                "calories": 0,
-                "protein": 0,
-                "carbs": 0,
-                "fat": 0,
-                "fiber": 0,
-                "sugar": 0,
-                "sodium": 0,
-                "items": []
-            }
+            # Limit to the first few items to reduce API calls
+            limited_items = food_items[:Config.MAX_FOOD_ITEMS]
             
-            # Limit to first 3 items to reduce API calls
-            limited_items = food_items[:3]
+            # Everything already cached: no lookups to schedule
+            cached = [await self.get_cached_nutrition(food) for food in limited_items]
+            if all(item is not None for item in cached):
+                return self.aggregate_nutrition(cached)
             
-            # Use connection pooling and concurrent requests
-            async with httpx.AsyncClient(timeout=self.http_timeout) as client:
-                # Create tasks for concurrent API calls
-                tasks = []
-                for food in limited_items:
-                    task = self.get_single_food_nutrition(client, food)
-                    tasks.append(task)
-                
-                # Execute all tasks concurrently with timeout
-                try:
-                    results = await asyncio.wait_for(
-                        asyncio.gather(*tasks, return_exceptions=True),
-                        timeout=10.0  # 10 second timeout for all API calls
-                    )
-                    
-                    # Process results
-                    for result in results:
-                        if isinstance(result, dict) and not isinstance(result, Exception):
-                            nutrition_data["items"].append(result)
-                            nutrition_data["calories"] += result.get("calories", 0)
-                            nutrition_data["protein"] += result.get("protein", 0)
-                            nutrition_data["carbs"] += result.get("carbs", 0)
-                            nutrition_data["fat"] += result.get("fat", 0)
-                            nutrition_data["fiber"] += result.get("fiber", 0)
-                            nutrition_data["sugar"] += result.get("sugar", 0)
-                            nutrition_data["sodium"] += result.get("sodium", 0)
+            # Concurrent requests over the shared, pooled USDA client
+            client = http_clients.get("usda")
+            # Create tasks for concurrent API calls
+            tasks = []
+            for food in limited_items:
+                task = self.get_single_food_nutrition(client, food)
+                tasks.append(task)
+            
+            # Execute all tasks concurrently with timeout
+            try:
+                results = await asyncio.wait_for(
+                    asyncio.gather(*tasks, return_exceptions=True),
+                    timeout=10.0  # 10 second timeout for all API calls
+                )
                 
-                except asyncio.TimeoutError:
-                    self.logger.warning("USDA API calls timed out, using estimated values")
-                    return self.get_estimated_nutrition(food_items)
+                # Process results
+                nutrition_data = self.aggregate_nutrition(
+                    [result for result in results if isinstance(result, dict)]
+                )
+            
+            except asyncio.TimeoutError:
+                self.logger.warning("USDA API calls timed out, using estimated values")
+                return self.get_estimated_nutrition(food_items)
             
             return nutrition_data if nutrition_data["items"] else self.get_estimated_nutrition(food_items)
             
@@ -277,72 +936,152 @@ class AIOrchestrator:
             self.logger.error(f"Error getting nutrition data: {str(e)}")
             return self.get_estimated_nutrition(food_items)
     
+    def aggregate_nutrition(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Sum per-item nutrition into meal totals"""
+        nutrition_data = {key: 0 for key in NUTRIENT_KEYS}
+        nutrition_data["items"] = []
+        for item in items:
+            nutrition_data["items"].append(item)
+            for key in NUTRIENT_KEYS:
+                nutrition_data[key] += item.get(key, 0)
+        return nutrition_data
+    
+    async def get_cached_nutrition(self, food: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return nutrition for a food from the nutrition cache, or None"""
+        return await self.nutrition_cache.get_cached(food["name"]) if self.nutrition_cache else None
+    
     async def get_single_food_nutrition(self, client: httpx.AsyncClient, food: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Get nutrition data for a single food item
+        Get nutrition data for a single food item, from the nutrition cache
+        when possible, falling back to estimated values
         """
         try:
-            # Search for the food item
-            search_url = f"{USDA_API_URL}/foods/search"
-            search_params = {
-                "api_key": USDA_API_KEY,
-                "query": food["name"],
-                "pageSize": 1
-            }
-            
-            search_response = await client.get(search_url, params=search_params)
-            if search_response.status_code != 200:
-                return self.get_estimated_single_nutrition(food)
-            
-            search_result = search_response.json()
-            if not search_result.get("foods"):
-                return self.get_estimated_single_nutrition(food)
-            
-            # Get detailed nutrition data
-            food_id = search_result["foods"][0]["fdcId"]
+            if self.nutrition_cache:
+                nutrition = await self.nutrition_cache.get_or_fetch(
+                    food["name"], lambda: self.lookup_food_nutrition(client, food)
+                )
+            else:
+                nutrition = await self.lookup_food_nutrition(client, food)
+        except Exception as e:
+            self.logger.error(f"Error getting nutrition for {food['name']}: {str(e)}")
+            nutrition = None
+        
+        return nutrition if nutrition is not None else self.get_estimated_single_nutrition(food)
+    
+    async def lookup_food_nutrition(self, client: httpx.AsyncClient, food: Dict[str, Any],
+                                    background: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Look up a food in the offline FDC store, then the USDA API.
+        Returns None if neither knows it, the API call fails or the USDA
+        circuit is open. Background lookups (the prewarm) skip the circuit
+        breaker, so their failures can't open it on user requests.
+        """
+        if self.fdc_store:
+            # Local indexed lookup; the USDA API is only asked if configured
+            try:
+                local_nutrition = self.fdc_store.search(food["name"])
+            except Exception as e:
+                self.logger.error(f"Error searching FDC store for {food['name']}: {str(e)}")
+                local_nutrition = None
+            if local_nutrition is not None:
+                return local_nutrition
+            if not Config.USDA_API_FALLBACK:
+                return None
+        
+        fetch = functools.partial(self.fetch_usda_nutrition, client, food)
+        try:
+            if usda_breaker is None or background:
+                return await fetch()
+            if usda_hedger is not None:
+                # Race a second request against a slow first one
+                return await usda_breaker.call(lambda: usda_hedger.call(fetch))
+            return await usda_breaker.call(fetch)
+        except CircuitOpenError:
+            # USDA is failing or slow: serve estimates right away instead of waiting
+            return None
+        except Exception as e:
+            self.logger.error(f"Error looking up nutrition for {food['name']}: {str(e)}")
+            return None
+    
+    async def fetch_usda_nutrition(self, client: httpx.AsyncClient, food: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Search USDA for a food and fetch its nutrients. Returns None if USDA
+        has no match; HTTP errors are raised so the circuit breaker sees them.
+        """
+        # Search for the food item
+        search_url = f"{USDA_API_URL}/foods/search"
+        search_params = {
+            "api_key": USDA_API_KEY,
+            "query": food["name"],
+            "pageSize": 1
+        }
+        
+        search_response = await client.get(search_url, params=search_params)
+        search_response.raise_for_status()
+        
+        search_result = search_response.json()
+        if not search_result.get("foods"):
+            return None
+        
+        # Get detailed nutrition data
+        food_id = search_result["foods"][0]["fdcId"]
+        if Config.USDA_BATCH_DETAILS:
+            # Share a multi-item request with other in-flight lookups
+            food_data = await usda_detail_batcher.submit(food_id)
+            if food_data is None:
+                return None
+        else:
             detail_url = f"{USDA_API_URL}/food/{food_id}"
             detail_params = {"api_key": USDA_API_KEY}
             
             detail_response = await client.get(detail_url, params=detail_params)
-            if detail_response.status_code != 200:
-                return self.get_estimated_single_nutrition(food)
+            detail_response.raise_for_status()
             
             food_data = detail_response.json()
-            
-            # Extract nutrition values
-            food_nutrition = {
-                "name": food["name"],
-                "calories": 0,
-                "protein": 0,
-                "carbs": 0,
-                "fat": 0,
-                "fiber": 0,
-                "sugar": 0,
-                "sodium": 0
-            }
-            
-            # Map USDA nutrients to our format
-            nutrient_map = {
-                "Energy": "calories",
-                "Protein": "protein",
-                "Carbohydrate, by difference": "carbs",
-                "Total lipid (fat)": "fat",
-                "Fiber, total dietary": "fiber",
-                "Sugars, Total": "sugar",
-                "Sodium, Na": "sodium"
-            }
-            
-            for nutrient in food_data.get("foodNutrients", []):
-                nutrient_name = nutrient.get("nutrient", {}).get("name")
-                if nutrient_name in nutrient_map:
-                    value = nutrient.get("amount", 0)
-                    food_nutrition[nutrient_map[nutrient_name]] = value
-            
-            return food_nutrition
-            
-        except Exception as e:
-            self.logger.error(f"Error getting nutrition for {food['name']}: {str(e)}")
-            return self.get_estimated_single_nutrition(food)
+        
+        # Extract nutrition values
+        food_nutrition = {
+            "name": food["name"],
+            "calories": 0,
+            "protein": 0,
+            "carbs": 0,
+            "fat": 0,
+            "fiber": 0,
+            "sugar": 0,
+            "sodium": 0
+        }
+        
+        # Map USDA nutrients to our format
+        nutrient_map = {
+            "Energy": "calories",
+            "Protein": "protein",
+            "Carbohydrate, by difference": "carbs",
+            "Total lipid (fat)": "fat",
+            "Fiber, total dietary": "fiber",
+            "Sugars, Total": "sugar",
+            "Sodium, Na": "sodium"
+        }
+        
+        for nutrient in food_data.get("foodNutrients", []):
+            nutrient_name = nutrient.get("nutrient", {}).get("name")
+            if nutrient_name in nutrient_map:
+                value = nutrient.get("amount", 0)
+                food_nutrition[nutrient_map[nutrient_name]] = value
+        
+        return food_nutrition
+    
+    def is_cacheable(self, food_items: List[Dict[str, Any]], nutrition_data: Dict[str, Any]) -> bool:
+        """
+        Whether a result came entirely from a real model prediction and real
+        nutrition lookups. Fallback foods, estimated items and lookups that
+        failed or timed out would otherwise be replayed for the cache TTL.
+        """
+        if any(food.get("fallback") for food in food_items):
+            return False
+        items = nutrition_data.get("items") or []
+        if len(items) != len(food_items[:Config.MAX_FOOD_ITEMS]):
+            return False
+        return not any(item.get("estimated") for item in items)
     
     def get_fallback_foods(self) -> List[Dict[str, Any]]:
         """Return fallback food items when AI fails"""
@@ -351,7 +1090,8 @@ class AIOrchestrator:
                 "name": "mixed meal",
                 "confidence": 0.5,
                 "portion_size": "medium",
-                "weight_grams": 200
+                "weight_grams": 200,
+                "fallback": True
             }
         ]
     
@@ -394,7 +1134,8 @@ class AIOrchestrator:
             "fat": 6,
             "fiber": 2,
             "sugar": 4,
-            "sodium": 300
+            "sodium": 300,
+            "estimated": True
         }
     
     async def transcribe_audio(self, audio_data: bytes) -> str:
@@ -0,0 +1,57 @@
+"""
+Supabase Auth for TrackTreat AI user routes
+
+The database connector uses the service role, which is not subject to row
+level security, so routes that read or write a user's rows must know who
+is calling. They take the user id from the `sub` claim of the Supabase
+access token in the Authorization header, never from the request itself.
+"""
+import logging
+from typing import Optional
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("auth")
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+def verify_access_token(token: str) -> str:
+    """Return the user id of a valid Supabase access token, or raise a 401"""
+    try:
+        claims = jwt.decode(
+            token,
+            Config.SUPABASE_JWT_SECRET,
+            algorithms=["HS256"],
+            audience=Config.SUPABASE_JWT_AUDIENCE
+        )
+    except JWTError as e:
+        logger.warning(f"Rejected access token: {str(e)}")
+        raise _unauthorized("Invalid or expired access token")
+    user_id = claims.get("sub")
+    if not user_id:
+        raise _unauthorized("Access token has no subject")
+    return user_id
+
+async def current_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> str:
+    """FastAPI dependency: the id of the authenticated user"""
+    if not Config.SUPABASE_JWT_SECRET:
+        # Fail closed rather than serve any user's rows to anyone
+        raise HTTPException(status_code=503, detail="Authentication is not configured")
+    if credentials is None:
+        raise _unauthorized("Missing bearer token")
+    return verify_access_token(credentials.credentials)
+
+async def authorized_user_id(user_id: str, current: str = Depends(current_user_id)) -> str:
+    """FastAPI dependency for routes with a {user_id} path: only that user may call them"""
+    if user_id != current:
+        raise HTTPException(status_code=403, detail="Not allowed to access another user's data")
+    return user_id
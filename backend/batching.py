@@ -0,0 +1,145 @@
+"""
+Dynamic micro-batching for TrackTreat AI
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("batching")
+
+class MicroBatcher:
+    """
+    Collects individual requests for a short window (or until the batch is full)
+    and resolves all of them with a single call to an async batch function.
+
+    The batch function receives a list of items and must return a list of
+    results in the same order.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int = 8, window_ms: float = 10.0,
+                 max_concurrency: int = 1, name: str = "batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_concurrency = max(1, max_concurrency)
+        self.name = name
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending_batches = set()
+
+        # Counters for monitoring
+        self.batches_run = 0
+        self.items_processed = 0
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue a single item and wait for its result from the next batch
+        """
+        futures = self._enqueue([item])
+        return await futures[0]
+
+    async def submit_many(self, items: List[Any]) -> List[Any]:
+        """
+        Queue several items at once so they land in the same batch when possible
+        """
+        futures = self._enqueue(items)
+        return list(await asyncio.gather(*futures))
+
+    def _enqueue(self, items: List[Any]) -> List[asyncio.Future]:
+        self._ensure_worker()
+        futures = []
+        for item in items:
+            future = self._loop.create_future()
+            self._queue.put_nowait((item, future))
+            futures.append(future)
+        return futures
+
+    def _ensure_worker(self) -> None:
+        """Start the collector task on the running event loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._worker = loop.create_task(self._collect())
+
+    async def _collect(self) -> None:
+        """Group queued items into batches and dispatch them"""
+        while True:
+            batch = [await self._queue.get()]
+
+            # Wait for a free dispatch slot; more items can queue up meanwhile
+            await self._slots.acquire()
+
+            deadline = self._loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            task = self._loop.create_task(self._dispatch(batch))
+            self._pending_batches.add(task)
+            task.add_done_callback(self._pending_batches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """Run the batch function and hand each result back to its caller"""
+        try:
+            # Skip items whose callers already gave up (e.g. timed out)
+            live = [(item, future) for item, future in batch if not future.done()]
+            if not live:
+                return
+
+            try:
+                results = await self.batch_fn([item for item, _ in live])
+                if len(results) != len(live):
+                    raise RuntimeError(
+                        f"{self.name}: batch function returned {len(results)} results for {len(live)} items"
+                    )
+            except Exception as e:
+                logger.error(f"{self.name}: batch of {len(live)} failed: {str(e)}")
+                for _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.batches_run += 1
+            self.items_processed += len(live)
+
+            for (_, future), result in zip(live, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def get_stats(self) -> dict:
+        """Return batching counters"""
+        return {
+            "batches_run": self.batches_run,
+            "items_processed": self.items_processed,
+            "avg_batch_size": (self.items_processed / self.batches_run) if self.batches_run else 0.0,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+    async def close(self) -> None:
+        """Stop the collector task"""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
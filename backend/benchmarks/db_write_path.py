@@ -0,0 +1,188 @@
+"""
+Measure DatabaseConnector write-path latency against a local PostgREST
+stand-in: the old round-trip patterns next to the current ones
+
+The stand-in is a small in-memory HTTP server that understands the subset
+of PostgREST used by db_connector (eq filters, on_conflict upserts, bulk
+inserts, Prefer: return=...) and sleeps `--latency-ms` per request to play
+the part of the network and database.
+
+Usage (from the backend directory):
+    python -m benchmarks.db_write_path [--iterations 50] [--latency-ms 5] [--meals 5] [--port 8766]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+from statistics import mean, median
+from typing import Any, Awaitable, Callable, Dict, List
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+class PostgrestStandIn:
+    """In-memory tables behind a PostgREST-shaped HTTP API"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000.0
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.requests = 0
+        self.app = FastAPI()
+        self.app.add_api_route("/rest/v1/{table}", self.handle, methods=["GET", "POST", "PATCH"])
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], filters: Dict[str, str]) -> bool:
+        return all(str(row.get(column)) == value for column, value in filters.items())
+
+    async def handle(self, table: str, request: Request) -> Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        rows = self.tables.setdefault(table, [])
+        filters = {
+            column: value[3:] for column, value in request.query_params.items()
+            if value.startswith("eq.")
+        }
+        prefer = request.headers.get("prefer", "")
+
+        if request.method == "GET":
+            return Response(
+                content=json.dumps([row for row in rows if self._matches(row, filters)]),
+                media_type="application/json"
+            )
+
+        body = await request.json()
+        if request.method == "PATCH":
+            changed = [row for row in rows if self._matches(row, filters)]
+            for row in changed:
+                row.update(body)
+        else:
+            conflict_column = request.query_params.get("on_conflict")
+            changed = []
+            for new_row in body if isinstance(body, list) else [body]:
+                new_row = {"id": str(uuid.uuid4()), **new_row}
+                existing = None
+                if conflict_column and "resolution=merge-duplicates" in prefer:
+                    existing = next(
+                        (row for row in rows if row.get(conflict_column) == new_row.get(conflict_column)), None
+                    )
+                if existing is not None:
+                    existing.update({k: v for k, v in new_row.items() if k != "id"})
+                    changed.append(existing)
+                else:
+                    rows.append(new_row)
+                    changed.append(new_row)
+
+        status_code = 201 if request.method == "POST" else 200
+        if "return=representation" in prefer:
+            return Response(content=json.dumps(changed), status_code=status_code, media_type="application/json")
+        return Response(status_code=204 if request.method == "PATCH" else status_code)
+
+def start_stand_in(stand_in: PostgrestStandIn, port: int):
+    """Run the stand-in with uvicorn on a background thread"""
+    server = uvicorn.Server(uvicorn.Config(stand_in.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+async def time_async(fn: Callable[[int], Awaitable[Any]], iterations: int) -> List[float]:
+    """Return per-call times in milliseconds after one warm-up call"""
+    await fn(-1)
+    times = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        await fn(i)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+async def run(args: argparse.Namespace, stand_in: PostgrestStandIn) -> None:
+    # Imported late so the connector picks up the stand-in's URL
+    from db_connector import db
+    from http_clients import http_clients
+
+    # The old patterns talk to PostgREST directly through the same client
+    supabase = db.backend
+    url = supabase.url
+    user_ids = [str(uuid.uuid4()) for _ in range(args.iterations + 1)]
+
+    def meal(i: int) -> Dict[str, Any]:
+        return {
+            "user_id": user_ids[i],
+            "meal_name": "Lunch",
+            "nutrition": {"calories": 650, "protein": 35, "carbs": 75, "fat": 22},
+            "transcript": "Grilled chicken salad with quinoa and avocado",
+        }
+
+    # The previous write paths, kept here for comparison
+    async def old_update_gamification(i: int) -> None:
+        response = await supabase.client.get(f"{url}/gamification", params={"user_id": f"eq.{user_ids[i]}"},
+                                             headers=supabase._get_headers())
+        response.raise_for_status()
+        if response.json():
+            response = await supabase.client.patch(f"{url}/gamification", params={"user_id": f"eq.{user_ids[i]}"},
+                                                   headers=supabase._get_headers(), json={"xp": i})
+        else:
+            response = await supabase.client.post(f"{url}/gamification", headers=supabase._get_headers(),
+                                                  json={"xp": i, "user_id": user_ids[i]})
+        response.raise_for_status()
+
+    async def old_create_meal(i: int) -> str:
+        response = await supabase.client.post(f"{url}/meals", headers=supabase._get_headers(include_return=True),
+                                              json=meal(i))
+        response.raise_for_status()
+        return response.json()[0]["id"]
+
+    async def old_create_meals(i: int) -> List[str]:
+        return [await old_create_meal(i) for _ in range(args.meals)]
+
+    scenarios = [
+        ("gamification update (existing row)", old_update_gamification,
+         lambda i: db.update_gamification(user_ids[i], {"xp": i})),
+        ("create meal", old_create_meal, lambda i: db.create_meal(meal(i))),
+        (f"log {args.meals} meals", old_create_meals, lambda i: db.create_meals([meal(i)] * args.meals)),
+    ]
+
+    # Every user starts with a gamification row, as the signup trigger ensures
+    for user_id in user_ids:
+        await db.update_gamification(user_id, {"xp": 0})
+
+    print(f"stand-in latency {args.latency_ms:.1f} ms/request, {args.iterations} iterations")
+    for name, old, new in scenarios:
+        for label, fn in (("before", old), ("after", new)):
+            requests_before = stand_in.requests
+            times = await time_async(fn, args.iterations)
+            round_trips = (stand_in.requests - requests_before) / (args.iterations + 1)
+            print(f"{name:36s} {label:6s}  mean={mean(times):7.2f} ms  p50={median(times):7.2f} ms  "
+                  f"round_trips={round_trips:.1f}")
+
+    await http_clients.aclose()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated per-request latency")
+    parser.add_argument("--meals", type=int, default=5, help="Meals per bulk insert")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("SUPABASE_SERVICE_KEY", "benchmark")
+    os.environ.setdefault("SUPABASE_ANON_KEY", "benchmark")
+    os.environ["DB_BACKEND"] = "supabase"
+    os.environ["DB_CACHE_ENABLED"] = "false"
+
+    stand_in = PostgrestStandIn(args.latency_ms)
+    server, thread = start_stand_in(stand_in, args.port)
+    try:
+        asyncio.run(run(args, stand_in))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Benchmark the fast NumPy preprocessor against the Hugging Face image processor
+
+Usage (from the backend directory):
+    python -m benchmarks.preprocess [--images DIR] [--batch-sizes 1 8] [--iterations 50]
+"""
+import os
+import sys
+import time
+import argparse
+from typing import List
+import numpy as np
+from PIL import Image
+
+import ai_orchestrator
+from ai_orchestrator import load_model
+from preprocessing import FastImagePreprocessor
+
+def load_images(directory: str, count: int) -> List[Image.Image]:
+    """Load images from a folder, or generate synthetic photos if none is given"""
+    if directory:
+        paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+        images = [Image.open(path).convert("RGB") for path in paths[:count]]
+        if images:
+            return images
+        print(f"No images found in {directory}, using synthetic images")
+
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        small = rng.integers(0, 256, size=(48, 64, 3), dtype=np.uint8)
+        images.append(Image.fromarray(small).resize((640, 480), Image.Resampling.BICUBIC))
+    return images
+
+def time_call(fn, iterations: int) -> float:
+    """Return the mean time per call in milliseconds"""
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default="", help="Folder of sample images (default: synthetic)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    load_model()
+    processor = ai_orchestrator.image_processor
+    fast = FastImagePreprocessor(processor, max_batch_size=max(args.batch_sizes))
+
+    ok = True
+    for batch_size in args.batch_sizes:
+        images = load_images(args.images, batch_size)
+
+        reference = processor(images=images, return_tensors="pt")["pixel_values"]
+        candidate = fast(images)
+        max_diff = float((reference - candidate).abs().max())
+        ok = ok and max_diff <= args.tolerance
+
+        hf_ms = time_call(lambda: processor(images=images, return_tensors="pt"), args.iterations)
+        fast_ms = time_call(lambda: fast(images), args.iterations)
+
+        print(f"batch={batch_size:3d}  hf={hf_ms:8.2f} ms  fast={fast_ms:8.2f} ms  "
+              f"speedup={hf_ms / fast_ms:5.1f}x  max_abs_diff={max_diff:.2e}")
+
+    if not ok:
+        print(f"FAIL: outputs differ by more than {args.tolerance}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
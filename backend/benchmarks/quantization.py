@@ -0,0 +1,152 @@
+"""
+Compare the float and int8 quantized food classifiers on a labelled image folder
+
+The folder should contain one sub-folder per label (e.g. pizza/, sushi/),
+named like the model's id2label entries. Reports top-1/top-3 agreement
+between the two models, accuracy against the folder labels, latency per
+image and memory use.
+
+The float baseline is loaded straight from the checkpoint, independent of
+QUANTIZE_MODEL and INFERENCE_BACKEND, and the int8 model is quantized from
+a copy of it.
+
+Usage (from the backend directory):
+    python -m benchmarks.quantization --images /path/to/labelled/images [--limit 500] [--model nateraw/food]
+"""
+import io
+import os
+import sys
+import copy
+import time
+import argparse
+import resource
+from typing import Dict, List, Optional, Tuple
+import torch
+from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+from config import Config
+from ai_orchestrator import decode_image
+from preprocessing import FastImagePreprocessor
+from inference_backends import quantize_dynamic_int8
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS is the best we can do without /proc (kB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def serialized_size_mb(model: torch.nn.Module) -> float:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+def load_samples(directory: str, limit: int) -> List[Tuple[str, str]]:
+    """Return (path, label) pairs from a folder-per-label layout"""
+    samples = []
+    for label in sorted(os.listdir(directory)):
+        label_dir = os.path.join(directory, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for name in sorted(os.listdir(label_dir)):
+            if name.lower().endswith((".jpg", ".jpeg", ".png")):
+                samples.append((os.path.join(label_dir, name), label))
+    return samples[:limit] if limit else samples
+
+def normalize_label(label: str) -> str:
+    return label.strip().lower().replace(" ", "_").replace("-", "_")
+
+def top_k(model: torch.nn.Module, pixel_values: torch.Tensor, k: int = 3) -> Tuple[List[int], float]:
+    """Return the top-k class indices and the latency in milliseconds"""
+    start = time.perf_counter()
+    with torch.no_grad():
+        logits = model(pixel_values=pixel_values).logits
+    elapsed = (time.perf_counter() - start) * 1000
+    return torch.topk(logits, k=k, dim=-1).indices[0].tolist(), elapsed
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "mean": sum(ordered) / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder with one sub-folder per label")
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of images (0 = all)")
+    parser.add_argument("--model", default=Config.MODEL_NAME, help="Hub id or local snapshot directory")
+    parser.add_argument("--min-top1-agreement", type=float, default=None,
+                        help="Exit non-zero if top-1 agreement falls below this fraction")
+    args = parser.parse_args()
+
+    samples = load_samples(args.images, args.limit)
+    if not samples:
+        print(f"No labelled images found in {args.images}")
+        return 1
+
+    rss_start = current_rss_mb()
+    float_model = AutoModelForImageClassification.from_pretrained(args.model).eval()
+    image_processor = AutoImageProcessor.from_pretrained(args.model)
+    rss_float = current_rss_mb()
+
+    quantized_model = quantize_dynamic_int8(copy.deepcopy(float_model))
+    rss_quantized = current_rss_mb()
+
+    preprocessor = FastImagePreprocessor(image_processor, max_batch_size=1)
+    label_to_id = {normalize_label(name): idx for idx, name in float_model.config.id2label.items()}
+
+    top1_agree = top3_agree = 0
+    correct: Dict[str, List[int]] = {"float": [0, 0], "int8": [0, 0]}
+    labelled = 0
+    latencies: Dict[str, List[float]] = {"float": [], "int8": []}
+
+    for path, label in samples:
+        with open(path, "rb") as f:
+            pixel_values = preprocessor([decode_image(f.read())]).clone()
+
+        float_top, float_ms = top_k(float_model, pixel_values)
+        int8_top, int8_ms = top_k(quantized_model, pixel_values)
+        latencies["float"].append(float_ms)
+        latencies["int8"].append(int8_ms)
+
+        top1_agree += float_top[0] == int8_top[0]
+        top3_agree += float_top[0] in int8_top
+
+        expected: Optional[int] = label_to_id.get(normalize_label(label))
+        if expected is not None:
+            labelled += 1
+            for name, predicted in (("float", float_top), ("int8", int8_top)):
+                correct[name][0] += predicted[0] == expected
+                correct[name][1] += expected in predicted
+
+    total = len(samples)
+    print(f"Images: {total} ({labelled} with labels known to the model)")
+    print(f"Top-1 agreement: {top1_agree / total:.2%}")
+    print(f"Top-3 agreement (float top-1 in int8 top-3): {top3_agree / total:.2%}")
+    if labelled:
+        for name in ("float", "int8"):
+            print(f"{name:5s} accuracy: top-1 {correct[name][0] / labelled:.2%}, "
+                  f"top-3 {correct[name][1] / labelled:.2%}")
+    for name in ("float", "int8"):
+        stats = summarize(latencies[name])
+        print(f"{name:5s} latency: mean {stats['mean']:.1f} ms, p50 {stats['p50']:.1f} ms, p95 {stats['p95']:.1f} ms")
+    print(f"float model: {serialized_size_mb(float_model):.1f} MB weights, "
+          f"+{rss_float - rss_start:.0f} MB RSS")
+    print(f"int8  model: {serialized_size_mb(quantized_model):.1f} MB weights, "
+          f"+{rss_quantized - rss_float:.0f} MB RSS")
+
+    if args.min_top1_agreement is not None and top1_agree / total < args.min_top1_agreement:
+        print(f"FAIL: top-1 agreement below {args.min_top1_agreement:.2%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Measure API cold-start time: import time of `main` and time to the first
+successful /health response from a fresh uvicorn process
+
+Usage (from the backend directory):
+    python -m benchmarks.startup [--runs 5] [--port 8765]
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from statistics import median
+from typing import List, Optional, Tuple
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import sys, time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start, 'torch' in sys.modules)"
+)
+
+def measure_import() -> Tuple[float, bool]:
+    """Return (seconds to import main, whether torch got imported)"""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    elapsed, torch_loaded = result.stdout.strip().splitlines()[-1].split()
+    return float(elapsed), torch_loaded == "True"
+
+def measure_first_health(port: int, timeout: float) -> Optional[float]:
+    """Start uvicorn and return seconds until /health first answers 200"""
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(url, timeout=0.5).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None:
+                return None
+            time.sleep(0.01)
+        return None
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def report(name: str, values: List[float]) -> None:
+    print(f"{name}: median {median(values) * 1000:.0f} ms, "
+          f"min {min(values) * 1000:.0f} ms, max {max(values) * 1000:.0f} ms")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for /health")
+    args = parser.parse_args()
+
+    import_times = []
+    for _ in range(args.runs):
+        elapsed, torch_loaded = measure_import()
+        import_times.append(elapsed)
+        if torch_loaded:
+            print("warning: importing main pulled in torch")
+    report("import main", import_times)
+
+    health_times = []
+    for _ in range(args.runs):
+        elapsed = measure_first_health(args.port, args.timeout)
+        if elapsed is None:
+            print("FAIL: /health never answered")
+            return 1
+        health_times.append(elapsed)
+    report("first /health", health_times)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+In-process caching helpers for TrackTreat AI
+"""
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    LRU cache with a per-entry TTL, a bounded number of entries and an
+    optional memory budget.
+
+    Sizes are estimated with the `sizeof` callable when `max_bytes` is set.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0,
+                 max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        # Counters for monitoring
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value, or `default` if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value, evicting least recently used entries to stay within limits"""
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            # Never let a single entry flush the whole cache
+            return
+
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes and self._bytes > self.max_bytes
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Drop a single entry if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Iterate over live entries without touching their LRU position"""
+        now = time.monotonic()
+        with self._lock:
+            snapshot = [(key, value) for key, (value, expires_at, _) in self._entries.items()
+                        if expires_at > now]
+        return iter(snapshot)
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight call.
+
+    The shared call runs as its own task, so a caller that times out or is
+    cancelled doesn't cancel it for everyone else waiting on the same key.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, "asyncio.Future"] = {}
+
+        # Counters for monitoring
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `fn()`, or the call already running for `key`"""
+        future = self._in_flight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done, key=key: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, future: "asyncio.Future") -> None:
+        self._in_flight.pop(key, None)
+        if not future.cancelled():
+            # Mark the exception as retrieved in case every waiter gave up
+            future.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return call counters"""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
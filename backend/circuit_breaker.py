@@ -0,0 +1,215 @@
+"""
+Circuit breaker and hedged requests for TrackTreat AI upstream calls
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+class CircuitBreaker:
+    """
+    Tracks the outcome and latency of the last `window_size` calls to an
+    upstream. Once at least `min_calls` are recorded and the share of failed
+    or slow calls reaches `failure_threshold`, the circuit opens and calls
+    fail immediately. After `open_seconds` a single probe is let through
+    (half-open): success closes the circuit, failure opens it again.
+
+    Every state change starts a new generation, and a call's outcome only
+    counts in the generation it started in, so a slow call from before the
+    circuit opened can't close it again. A call cancelled by its caller
+    after `slow_call_seconds` (e.g. by a surrounding timeout) counts as
+    failed: that is how a hung upstream looks from here.
+
+    Meant to be used from one event loop, like the rest of the async code.
+    """
+
+    def __init__(self, name: str, window_size: int = 50, min_calls: int = 10,
+                 failure_threshold: float = 0.5, slow_call_seconds: float = 3.0,
+                 open_seconds: float = 30.0):
+        self.name = name
+        self.min_calls = max(1, min_calls)
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+
+        self.state = CLOSED
+        self._generation = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        # (failed or slow, latency in seconds) of recent calls
+        self._outcomes: Deque[Tuple[bool, float]] = deque(maxlen=max(1, window_size))
+
+        # Counters for monitoring
+        self.calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Return True if a call may go upstream now"""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._set_state(HALF_OPEN)
+            logger.info(f"{self.name}: circuit half-open, probing upstream")
+
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self._generation += 1
+
+    def record(self, success: bool, latency: float, generation: Optional[int] = None) -> None:
+        """
+        Record the outcome of a call that `allow` let through. `generation`
+        is the breaker's generation when the call started; outcomes from an
+        earlier generation are ignored.
+        """
+        self.calls += 1
+        if generation is not None and generation != self._generation:
+            return
+        bad = not success or latency >= self.slow_call_seconds
+
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            if bad:
+                self._open()
+            else:
+                self._outcomes.clear()
+                self._set_state(CLOSED)
+                logger.info(f"{self.name}: circuit closed, upstream recovered")
+            self._outcomes.append((bad, latency))
+            return
+
+        self._outcomes.append((bad, latency))
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls \
+                and self.failure_rate() >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self._set_state(OPEN)
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        logger.warning(f"{self.name}: circuit open for {self.open_seconds:.0f}s "
+                       f"(failure rate {self.failure_rate():.0%})")
+
+    def failure_rate(self) -> float:
+        """Share of failed or slow calls in the rolling window"""
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for bad, _ in self._outcomes if bad) / len(self._outcomes)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile of recent successful calls, or None without enough data"""
+        latencies = sorted(latency for bad, latency in self._outcomes if not bad)
+        if len(latencies) < self.min_calls:
+            return None
+        index = min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+        return latencies[index]
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` through the breaker, raising CircuitOpenError when open"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        generation = self._generation
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            latency = time.monotonic() - start
+            if latency >= self.slow_call_seconds:
+                # The caller timed out on a hung upstream
+                self.record(False, latency, generation)
+            elif self.state == HALF_OPEN and generation == self._generation:
+                # The caller gave up early; only free the probe slot
+                self._probe_in_flight = False
+            raise
+        except Exception:
+            self.record(False, time.monotonic() - start, generation)
+            raise
+        self.record(True, time.monotonic() - start, generation)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return breaker state, rolling rates and latency percentiles"""
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "state": self.state,
+            "failure_rate": self.failure_rate(),
+            "window_calls": len(self._outcomes),
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "latency_p50_ms": p50 * 1000 if p50 is not None else None,
+            "latency_p95_ms": p95 * 1000 if p95 is not None else None,
+        }
+
+class Hedger:
+    """
+    Sends a second, identical request when the first one is slower than a
+    recent latency percentile, and returns whichever finishes first
+    """
+
+    def __init__(self, breaker: CircuitBreaker, percentile: float = 95.0, min_delay_ms: float = 50.0):
+        self.breaker = breaker
+        self.percentile = percentile
+        self.min_delay = min_delay_ms / 1000.0
+
+        # Counters for monitoring
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()`, hedging with a second `fn()` if the first is slow"""
+        delay = self.breaker.latency_percentile(self.percentile)
+        if delay is None:
+            # Not enough history to know what "slow" is yet
+            return await fn()
+
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({first}, timeout=max(delay, self.min_delay))
+        if done:
+            return first.result()
+
+        self.hedges += 1
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Both may finish in the same wakeup; any success beats a failure
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                if not pending:
+                    raise first.exception() if first in done else next(iter(done)).exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hedging counters"""
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
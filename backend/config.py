@@ -16,24 +16,126 @@ class Config:
     NUTRITION_API_TIMEOUT = 15  # USDA API calls timeout
     SINGLE_API_TIMEOUT = 10  # Single API call timeout
     HTTP_CONNECT_TIMEOUT = 5  # HTTP connection timeout
+    STORAGE_TIMEOUT = float(os.getenv("STORAGE_TIMEOUT", "30"))  # Supabase Storage upload timeout
+    
+    # Shared HTTP client pools (one per upstream)
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # Seconds an idle connection is kept
+    HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "False").lower() in ("true", "1", "t")  # Needs the h2 package
     
     # Image processing settings
-    MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
+    MAX_IMAGE_SIZE = int(os.getenv("MAX_IMAGE_SIZE", str(5 * 1024 * 1024)))  # 5MB upload cap
+    UPLOAD_CHUNK_SIZE = 64 * 1024  # Bytes read from an upload at a time
+    UPLOAD_FORM_OVERHEAD = 64 * 1024  # Request bytes allowed on top of the images (multipart headers, profile)
     LARGE_IMAGE_WARNING = 1 * 1024 * 1024  # 1MB
     MAX_IMAGE_DIMENSION = 224  # Max dimension for model input
+    FAST_PREPROCESSING = os.getenv("FAST_PREPROCESSING", "True").lower() in ("true", "1", "t")
     
     # AI Model settings
-    MODEL_NAME = "nateraw/food"
+    MODEL_NAME = os.getenv("MODEL_NAME", "nateraw/food")  # Hub id, or a local snapshot directory
+    INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager")  # "eager", "torchscript" or "onnx"
+    MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "model_cache")  # Where converted models are stored
+    QUANTIZE_MODEL = os.getenv("QUANTIZE_MODEL", "False").lower() in ("true", "1", "t")  # int8 weights
     CONFIDENCE_THRESHOLD = 0.1  # Minimum confidence for food items
     MAX_FOOD_ITEMS = 3  # Maximum food items to process for nutrition
     TOP_PREDICTIONS = 3  # Number of top predictions to return
+    CASCADE_MODEL_NAME = os.getenv("CASCADE_MODEL_NAME", "")  # Small first-pass classifier; empty disables
+    CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.6"))  # Escalate below this top-1 confidence
+    MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", "10"))  # Photos per /analyze-meal/batch request
+    
+    # Asynchronous job queue settings
+    JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))  # Jobs waiting before 429
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # Concurrent meal analyses
+    JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))  # How long finished jobs are kept
+    JOB_WEBHOOK_TIMEOUT = float(os.getenv("JOB_WEBHOOK_TIMEOUT", "5"))
+    # Server processes (uvicorn/gunicorn read it too); jobs live in one process's memory
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # Comma-separated webhook hosts; empty allows any host that resolves to public addresses
+    JOB_WEBHOOK_ALLOWED_HOSTS = [host.strip().lower() for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()]
+    
+    # Result cache settings
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # 32MB
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2048"))
+    RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))  # 1 hour
+    RESULT_CACHE_PHASH = os.getenv("RESULT_CACHE_PHASH", "False").lower() in ("true", "1", "t")
+    RESULT_CACHE_PHASH_DISTANCE = int(os.getenv("RESULT_CACHE_PHASH_DISTANCE", "4"))  # Max differing bits
     
     # USDA API settings
     USDA_API_KEY = os.getenv("USDA_API_KEY")
     USDA_API_URL = os.getenv("USDA_API_URL", "https://api.nal.usda.gov/fdc/v1")
     
+    # Batch /food/{id} detail lookups across requests into POST /foods calls
+    USDA_BATCH_DETAILS = os.getenv("USDA_BATCH_DETAILS", "True").lower() in ("true", "1", "t")
+    USDA_BATCH_SIZE = int(os.getenv("USDA_BATCH_SIZE", "20"))  # FDC allows at most 20 ids per call
+    USDA_BATCH_WINDOW_MS = float(os.getenv("USDA_BATCH_WINDOW_MS", "5"))
+    USDA_BATCH_CONCURRENCY = int(os.getenv("USDA_BATCH_CONCURRENCY", "4"))  # Batch requests in flight at once
+    
+    # USDA circuit breaker: open when too many recent calls fail or are slow
+    USDA_BREAKER_ENABLED = os.getenv("USDA_BREAKER_ENABLED", "True").lower() in ("true", "1", "t")
+    USDA_BREAKER_WINDOW = int(os.getenv("USDA_BREAKER_WINDOW", "50"))  # Recent calls considered
+    USDA_BREAKER_MIN_CALLS = int(os.getenv("USDA_BREAKER_MIN_CALLS", "10"))  # Calls needed before opening
+    USDA_BREAKER_FAILURE_RATE = float(os.getenv("USDA_BREAKER_FAILURE_RATE", "0.5"))
+    USDA_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("USDA_BREAKER_SLOW_CALL_SECONDS", "3"))  # Slow counts as failed
+    USDA_BREAKER_OPEN_SECONDS = float(os.getenv("USDA_BREAKER_OPEN_SECONDS", "30"))  # Wait before probing again
+    # Hedged requests (needs the breaker for latency history)
+    USDA_HEDGE_ENABLED = os.getenv("USDA_HEDGE_ENABLED", "False").lower() in ("true", "1", "t")
+    USDA_HEDGE_PERCENTILE = float(os.getenv("USDA_HEDGE_PERCENTILE", "95"))
+    USDA_HEDGE_MIN_DELAY_MS = float(os.getenv("USDA_HEDGE_MIN_DELAY_MS", "50"))
+    
+    # Offline FoodData Central store (built with import_fdc.py)
+    FDC_DB_PATH = os.getenv("FDC_DB_PATH", "data/fdc.sqlite3")
+    # Ask the USDA API about foods the offline store doesn't know
+    USDA_API_FALLBACK = os.getenv("USDA_API_FALLBACK", "False").lower() in ("true", "1", "t")
+    
+    # Per-food nutrition cache settings
+    NUTRITION_CACHE_ENABLED = os.getenv("NUTRITION_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    NUTRITION_CACHE_MAX_ENTRIES = int(os.getenv("NUTRITION_CACHE_MAX_ENTRIES", "4096"))
+    NUTRITION_CACHE_TTL = float(os.getenv("NUTRITION_CACHE_TTL", str(7 * 24 * 3600)))  # 1 week
+    NUTRITION_CACHE_PATH = os.getenv("NUTRITION_CACHE_PATH", "data/nutrition_cache.sqlite3")  # Empty: memory only
+    NUTRITION_PREWARM = os.getenv("NUTRITION_PREWARM", "True").lower() in ("true", "1", "t")  # Look up all labels at startup
+    NUTRITION_PREWARM_CONCURRENCY = int(os.getenv("NUTRITION_PREWARM_CONCURRENCY", "8"))
+    
+    # Meal history settings
+    MEALS_PAGE_SIZE = int(os.getenv("MEALS_PAGE_SIZE", "50"))  # Rows fetched per keyset page
+    MEALS_MAX_PAGE_SIZE = int(os.getenv("MEALS_MAX_PAGE_SIZE", "200"))
+    
+    # Database settings
+    DB_BACKEND = os.getenv("DB_BACKEND", "")  # "supabase", "postgres", "sqlite" or "mock"; empty: Supabase if set up
+    # Direct Postgres connection (DB_BACKEND=postgres). Use a direct or session-mode
+    # pooler URL: transaction-mode poolers don't keep prepared statements.
+    DATABASE_URL = os.getenv("DATABASE_URL", "")
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))  # Prepared statements per connection
+    SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "data/tracktreat.sqlite3")
+    SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))  # Connections (and worker threads)
+    
+    # Supabase Auth: user routes take the user from a verified access token.
+    # Without the project's JWT secret those routes answer 503.
+    SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+    SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+    
+    # Read-through cache for profile and gamification rows
+    DB_CACHE_ENABLED = os.getenv("DB_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    DB_CACHE_MAX_ENTRIES = int(os.getenv("DB_CACHE_MAX_ENTRIES", "10000"))  # Per table
+    PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+    GAMIFICATION_CACHE_TTL = float(os.getenv("GAMIFICATION_CACHE_TTL", "60"))
+    
     # Thread pool settings
-    MAX_WORKERS = 2  # Number of worker threads
+    MAX_WORKERS = int(os.getenv("MAX_WORKERS", "2"))  # Number of inference worker processes in process mode
+    INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")  # "thread" (single worker thread) or "process"
+    
+    # Inference batching settings
+    ENABLE_BATCHING = os.getenv("ENABLE_BATCHING", "True").lower() in ("true", "1", "t")
+    BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "10"))  # How long to collect images for a batch
+    MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))  # Maximum images per forward pass
+    
+    # Model warm-up settings
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "True").lower() in ("true", "1", "t")
+    # Comma-separated batch sizes; empty means 1, 2, 4, ... up to MAX_BATCH_SIZE
+    WARMUP_BATCH_SIZES = [int(size) for size in os.getenv("WARMUP_BATCH_SIZES", "").split(",") if size.strip()]
     
     # Fallback nutrition values (per 100g)
     FALLBACK_NUTRITION = {
@@ -0,0 +1,419 @@
+"""
+Pluggable storage backends behind DatabaseConnector
+
+A backend only moves rows in and out of the profiles, meals and
+gamification tables described in supabase/schema.sql. Caching, cursors,
+ID assignment and error logging stay in DatabaseConnector, so backends
+raise on failure instead of returning sentinel values.
+"""
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from dotenv import load_dotenv
+from config import Config
+from http_clients import http_clients
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("db_backends")
+
+# Supabase configuration
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
+
+BACKENDS = ("supabase", "postgres", "sqlite", "mock")
+
+# Writable columns per table in supabase/schema.sql. SQL backends reject
+# anything else, like PostgREST does, which also keeps column names that
+# end up in SQL text out of user input.
+TABLE_COLUMNS = {
+    "profiles": ("id", "user_id", "weight_kg", "height_cm", "dob", "gender", "activity_level",
+                 "created_at", "updated_at"),
+    "meals": ("id", "user_id", "image_url", "voice_url", "transcript", "meal_name", "nutrition",
+              "advice", "logged_at", "created_at", "updated_at"),
+    "gamification": ("user_id", "badges", "current_level", "xp", "last_updated"),
+}
+JSON_COLUMNS = {"nutrition", "badges"}
+TIMESTAMP_COLUMNS = {"logged_at", "created_at", "updated_at", "last_updated"}
+
+def checked_columns(table: str, data: Dict[str, Any]) -> List[str]:
+    """Return the keys of `data`, raising ValueError on unknown columns"""
+    unknown = set(data) - set(TABLE_COLUMNS[table])
+    if unknown:
+        raise ValueError(f"Unknown {table} column(s): {', '.join(sorted(unknown))}")
+    return list(data)
+
+class DatabaseBackend:
+    """
+    Interface every storage backend implements.
+
+    Meal pages are ordered by (logged_at, id) descending; `after` is the
+    (logged_at, id) of the last row already seen and `columns` is None for
+    every column.
+    """
+
+    name = "base"
+
+    async def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def update_profile(self, user_id: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def insert_meals(self, meals: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    async def select_meals(self, user_id: str, start_date: Optional[str], end_date: Optional[str],
+                           after: Optional[Tuple[str, str]], limit: int,
+                           columns: Optional[List[str]]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def update_meal(self, meal_id: str, user_id: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def delete_meal(self, meal_id: str, user_id: str) -> None:
+        raise NotImplementedError
+
+    async def get_gamification(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def upsert_gamification(self, user_id: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return backend counters for /metrics"""
+        return {"backend": self.name}
+
+    async def close(self) -> None:
+        """Release connections held by the backend"""
+
+class SupabaseBackend(DatabaseBackend):
+    """
+    Supabase's PostgREST API over the shared, pooled HTTP client
+    """
+
+    name = "supabase"
+
+    def __init__(self, url: str):
+        self.url = f"{url}/rest/v1"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared, pooled HTTP client for Supabase REST requests"""
+        return http_clients.get("supabase_rest")
+
+    async def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        response = await self.client.get(
+            f"{self.url}/profiles",
+            params={"user_id": f"eq.{user_id}"},
+            headers=self._get_headers()
+        )
+        response.raise_for_status()
+
+        profiles = response.json()
+        return profiles[0] if profiles else None
+
+    async def update_profile(self, user_id: str, data: Dict[str, Any]) -> None:
+        # Upsert like the SQL backends: a PATCH matching no row succeeds
+        # without writing anything, so a missing profile would go unnoticed
+        data = {key: value for key, value in data.items() if key not in ("id", "user_id")}
+        response = await self.client.post(
+            f"{self.url}/profiles",
+            params={"on_conflict": "user_id"},
+            headers=self._get_headers(prefer=["resolution=merge-duplicates", "missing=default", "return=minimal"]),
+            json={**data, "user_id": user_id}
+        )
+        response.raise_for_status()
+
+    async def insert_meals(self, meals: List[Dict[str, Any]]) -> None:
+        # A bulk insert takes its columns from the first row; list them all
+        # so rows with fewer keys get the column defaults instead of NULL
+        columns = sorted({column for meal in meals for column in meal})
+
+        response = await self.client.post(
+            f"{self.url}/meals",
+            params={"columns": ",".join(columns)},
+            headers=self._get_headers(prefer=["return=minimal", "missing=default"]),
+            json=meals
+        )
+        response.raise_for_status()
+
+    async def select_meals(self, user_id: str, start_date: Optional[str], end_date: Optional[str],
+                           after: Optional[Tuple[str, str]], limit: int,
+                           columns: Optional[List[str]]) -> List[Dict[str, Any]]:
+        params = {
+            "user_id": f"eq.{user_id}",
+            "select": ",".join(columns) if columns else "*",
+            "order": "logged_at.desc,id.desc",
+            "limit": str(limit),
+        }
+
+        # Date range and keyset conditions are ANDed together. The values
+        # come from parse_meal_time/decode_meal_cursor, which only let
+        # canonical timestamps and UUIDs through.
+        conditions = []
+        if start_date:
+            conditions.append(f'logged_at.gte."{start_date}"')
+        if end_date:
+            conditions.append(f'logged_at.lte."{end_date}"')
+        if after:
+            logged_at, meal_id = after
+            conditions.append(
+                f'or(logged_at.lt."{logged_at}",and(logged_at.eq."{logged_at}",id.lt."{meal_id}"))'
+            )
+        if conditions:
+            params["and"] = f"({','.join(conditions)})"
+
+        response = await self.client.get(
+            f"{self.url}/meals",
+            params=params,
+            headers=self._get_headers()
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def update_meal(self, meal_id: str, user_id: str, data: Dict[str, Any]) -> None:
+        response = await self.client.patch(
+            f"{self.url}/meals",
+            params={"id": f"eq.{meal_id}", "user_id": f"eq.{user_id}"},
+            headers=self._get_headers(prefer=["return=minimal"]),
+            json=data
+        )
+        response.raise_for_status()
+
+    async def delete_meal(self, meal_id: str, user_id: str) -> None:
+        response = await self.client.delete(
+            f"{self.url}/meals",
+            params={"id": f"eq.{meal_id}", "user_id": f"eq.{user_id}"},
+            headers=self._get_headers(prefer=["return=minimal"])
+        )
+        response.raise_for_status()
+
+    async def get_gamification(self, user_id: str) -> Optional[Dict[str, Any]]:
+        response = await self.client.get(
+            f"{self.url}/gamification",
+            params={"user_id": f"eq.{user_id}"},
+            headers=self._get_headers()
+        )
+        response.raise_for_status()
+
+        gamification_data = response.json()
+        return gamification_data[0] if gamification_data else None
+
+    async def upsert_gamification(self, user_id: str, data: Dict[str, Any]) -> None:
+        # Single INSERT ... ON CONFLICT (user_id) DO UPDATE of the given columns
+        response = await self.client.post(
+            f"{self.url}/gamification",
+            params={"on_conflict": "user_id"},
+            headers=self._get_headers(prefer=["resolution=merge-duplicates", "return=minimal"]),
+            json={**data, "user_id": user_id}
+        )
+        response.raise_for_status()
+
+    def _get_headers(self, include_return: bool = False,
+                     prefer: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        Get headers for Supabase API requests, with optional PostgREST
+        Prefer directives
+        """
+        headers = {
+            "apikey": SUPABASE_ANON_KEY,
+            "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+            "Content-Type": "application/json"
+        }
+
+        prefer = list(prefer or [])
+        if include_return:
+            prefer.append("return=representation")
+        if prefer:
+            headers["Prefer"] = ",".join(prefer)
+
+        return headers
+
+class MockBackend(DatabaseBackend):
+    """
+    Canned data for running without a database; writes are only logged
+    """
+
+    name = "mock"
+
+    async def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._get_mock_profile(user_id)
+
+    async def update_profile(self, user_id: str, data: Dict[str, Any]) -> None:
+        logger.info(f"Mock: Updating profile for user {user_id}: {json.dumps(data)}")
+
+    async def insert_meals(self, meals: List[Dict[str, Any]]) -> None:
+        for meal in meals:
+            logger.info(f"Mock: Creating meal {meal['id']}: {json.dumps(meal)}")
+
+    async def select_meals(self, user_id: str, start_date: Optional[str], end_date: Optional[str],
+                           after: Optional[Tuple[str, str]], limit: int,
+                           columns: Optional[List[str]]) -> List[Dict[str, Any]]:
+        meals = sorted(self._get_mock_meals(user_id, start_date, end_date),
+                       key=lambda meal: (meal["logged_at"], meal["id"]), reverse=True)
+        if after:
+            meals = [meal for meal in meals if (meal["logged_at"], meal["id"]) < after]
+        if columns:
+            meals = [{column: meal.get(column) for column in columns} for meal in meals]
+        return meals[:limit]
+
+    async def update_meal(self, meal_id: str, user_id: str, data: Dict[str, Any]) -> None:
+        logger.info(f"Mock: Updating meal {meal_id} for user {user_id}: {json.dumps(data)}")
+
+    async def delete_meal(self, meal_id: str, user_id: str) -> None:
+        logger.info(f"Mock: Deleting meal {meal_id} for user {user_id}")
+
+    async def get_gamification(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._get_mock_gamification(user_id)
+
+    async def upsert_gamification(self, user_id: str, data: Dict[str, Any]) -> None:
+        logger.info(f"Mock: Updating gamification for user {user_id}: {json.dumps(data)}")
+
+    def _get_mock_profile(self, user_id: str) -> Dict[str, Any]:
+        """
+        Generate mock profile data for testing
+        """
+        return {
+            "id": f"profile-{user_id}",
+            "user_id": user_id,
+            "weight_kg": 70,
+            "height_cm": 175,
+            "dob": "1990-01-01",
+            "gender": "male",
+            "activity_level": "moderate",
+            "created_at": "2025-05-20T10:00:00Z",
+            "updated_at": "2025-05-20T10:00:00Z"
+        }
+
+    def _get_mock_meals(self, user_id: str, start_date: Optional[str],
+                        end_date: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        Generate mock meal data for testing
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        yesterday = (datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) -
+                     timedelta(days=1)).strftime('%Y-%m-%d')
+
+        return [
+            {
+                "id": "meal-20250527083000",
+                "user_id": user_id,
+                "image_url": "https://example.com/meals/breakfast.jpg",
+                "meal_name": "Breakfast",
+                "transcript": "Oatmeal with berries and Greek yogurt",
+                "nutrition": {
+                    "calories": 450,
+                    "protein": 22,
+                    "carbs": 65,
+                    "fat": 12,
+                    "fiber": 8,
+                },
+                "advice": "Great breakfast choice! The oatmeal provides fiber and the Greek yogurt adds protein.",
+                "logged_at": f"{today}T08:30:00Z",
+                "created_at": f"{today}T08:30:00Z",
+            },
+            {
+                "id": "meal-20250527121500",
+                "user_id": user_id,
+                "image_url": "https://example.com/meals/lunch.jpg",
+                "meal_name": "Lunch",
+                "transcript": "Grilled chicken salad with quinoa and avocado",
+                "nutrition": {
+                    "calories": 680,
+                    "protein": 45,
+                    "carbs": 55,
+                    "fat": 25,
+                    "fiber": 12,
+                },
+                "advice": "Excellent protein source with healthy fats from the avocado. A well-balanced lunch.",
+                "logged_at": f"{today}T12:15:00Z",
+                "created_at": f"{today}T12:15:00Z",
+            },
+            {
+                "id": "meal-20250526190000",
+                "user_id": user_id,
+                "image_url": "https://example.com/meals/dinner_yesterday.jpg",
+                "meal_name": "Dinner",
+                "transcript": "Salmon with roasted vegetables and brown rice",
+                "nutrition": {
+                    "calories": 750,
+                    "protein": 40,
+                    "carbs": 65,
+                    "fat": 30,
+                    "fiber": 10,
+                },
+                "advice": "Omega-3 rich meal with good fiber content from the vegetables and brown rice.",
+                "logged_at": f"{yesterday}T19:00:00Z",
+                "created_at": f"{yesterday}T19:00:00Z",
+            }
+        ]
+
+    def _get_mock_gamification(self, user_id: str) -> Dict[str, Any]:
+        """
+        Generate mock gamification data for testing
+        """
+        return {
+            "user_id": user_id,
+            "badges": [
+                {
+                    "id": "first_meal",
+                    "name": "First Meal",
+                    "description": "Logged your first meal",
+                    "earned_at": "2025-05-20T10:15:00Z"
+                },
+                {
+                    "id": "streak_3",
+                    "name": "3-Day Streak",
+                    "description": "Logged meals for 3 consecutive days",
+                    "earned_at": "2025-05-23T09:30:00Z"
+                }
+            ],
+            "current_level": 3,
+            "xp": 280,
+            "streak_days": 7,
+            "last_updated": datetime.now().isoformat()
+        }
+
+def create_db_backend(name: Optional[str] = None) -> DatabaseBackend:
+    """
+    Build the configured storage backend. With no DB_BACKEND set, Supabase
+    is used when its credentials are present and mock data otherwise.
+    """
+    name = (name or Config.DB_BACKEND or "").lower()
+    if not name:
+        if SUPABASE_URL and SUPABASE_SERVICE_KEY:
+            name = "supabase"
+        else:
+            logger.warning("Supabase credentials not found. Using mock data.")
+            name = "mock"
+
+    if name == "supabase":
+        if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+            raise ValueError("DB_BACKEND=supabase needs SUPABASE_URL and SUPABASE_SERVICE_KEY")
+        return SupabaseBackend(SUPABASE_URL)
+    if name == "postgres":
+        if not Config.DATABASE_URL:
+            raise ValueError("DB_BACKEND=postgres needs DATABASE_URL")
+        # Imported lazily: asyncpg is an optional dependency
+        from postgres_backend import PostgresBackend
+        return PostgresBackend(
+            Config.DATABASE_URL,
+            min_size=Config.DB_POOL_MIN_SIZE,
+            max_size=Config.DB_POOL_MAX_SIZE,
+            statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE
+        )
+    if name == "sqlite":
+        # Imported lazily so the Supabase path never loads it
+        from sqlite_backend import SqliteBackend
+        return SqliteBackend(Config.SQLITE_DB_PATH, pool_size=Config.SQLITE_POOL_SIZE)
+    if name == "mock":
+        return MockBackend()
+    raise ValueError(f"Unknown database backend: {name} (expected one of {', '.join(BACKENDS)})")
@@ -1,55 +1,144 @@
-import os
 import json
+import uuid
+import base64
 import logging
-from typing import Dict, List, Any, Optional, Union
 from datetime import datetime
-import httpx
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional, Tuple
+from config import Config
+from cache_utils import SingleFlight, TTLCache
+from db_backends import DatabaseBackend, create_db_backend
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("db_connector")
 
-# Supabase configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
+# Columns returned for each meal view (None: all of them). The list view
+# leaves out the long text fields (transcript, advice) and the voice URL.
+MEAL_PROJECTIONS = {
+    "list": ["id", "user_id", "meal_name", "image_url", "nutrition", "logged_at"],
+    "detail": None,
+}
+
+def encode_meal_cursor(meal: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past `meal` in (logged_at, id) order"""
+    raw = json.dumps([meal["logged_at"], meal["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def parse_meal_time(value: str) -> str:
+    """
+    Canonical ISO-8601 form of a client-supplied date or datetime; raises
+    ValueError otherwise. Only this form reaches backend filters, so
+    nothing from the request can add filter syntax.
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid date: {value!r}")
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r}")
+
+def decode_meal_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_meal_cursor; raises ValueError on a malformed cursor"""
+    try:
+        logged_at, meal_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return parse_meal_time(logged_at), str(uuid.UUID(meal_id))
+    except Exception:
+        raise ValueError("Invalid meal cursor")
+
+class ReadThroughCache:
+    """
+    Per-table cache of single-row reads keyed by user. Concurrent misses for
+    a user share one fetch, and a write invalidates the user's entry so the
+    next read goes back to the database.
+    """
+    
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.entries = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._flights = SingleFlight()
+        # Bumped on every invalidation so a fetch that started before a
+        # write can't put the old row back into the cache. Only kept while
+        # a fetch for the key is running.
+        self._versions: Dict[str, int] = {}
+        self._fetching: Dict[str, int] = {}
+        
+        # Counters for monitoring
+        self.invalidations = 0
+    
+    async def get(self, key: str,
+                  fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """Return the cached row for `key`, calling `fetch` once on a miss"""
+        row = self.entries.get(key)
+        if row is None:
+            version = self._versions.get(key, 0)
+            row = await self._flights.do((key, version), lambda: self._fetch_and_store(key, version, fetch))
+        # Callers get their own copy so they can't edit the cached row
+        return dict(row) if row is not None else None
+    
+    async def _fetch_and_store(self, key: str, version: int,
+                               fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        self._fetching[key] = self._fetching.get(key, 0) + 1
+        try:
+            row = await fetch()
+        finally:
+            stale = self._versions.get(key, 0) != version
+            self._fetching[key] -= 1
+            if not self._fetching[key]:
+                del self._fetching[key]
+                self._versions.pop(key, None)
+        if row is not None and not stale:
+            self.entries.set(key, row)
+        return row
+    
+    def invalidate(self, key: str) -> None:
+        """Drop the cached row for `key`"""
+        if key in self._fetching:
+            self._versions[key] = self._versions.get(key, 0) + 1
+        self.entries.delete(key)
+        self.invalidations += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit rate, invalidation and single-flight counters"""
+        return {
+            **self.entries.get_stats(),
+            "invalidations": self.invalidations,
+            "single_flight": self._flights.get_stats(),
+        }
 
 class DatabaseConnector:
     """
-    Handles connections and operations with the Supabase database
+    Handles reads and writes of user data, on top of a pluggable storage
+    backend (Supabase, embedded SQLite or mock data)
     """
     
-    def __init__(self):
-        if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
-            logger.warning("Supabase credentials not found. Using mock data.")
-            self.use_mock_data = True
-        else:
-            self.use_mock_data = False
-            
-        # HTTP client for API requests
-        self.client = httpx.AsyncClient()
+    def __init__(self, backend: Optional[DatabaseBackend] = None):
+        self.backend = backend or create_db_backend()
+        
+        # Profile and gamification rows are read far more often than written
+        self.profile_cache: Optional[ReadThroughCache] = None
+        self.gamification_cache: Optional[ReadThroughCache] = None
+        if Config.DB_CACHE_ENABLED:
+            self.profile_cache = ReadThroughCache(
+                "profiles", Config.DB_CACHE_MAX_ENTRIES, Config.PROFILE_CACHE_TTL
+            )
+            self.gamification_cache = ReadThroughCache(
+                "gamification", Config.DB_CACHE_MAX_ENTRIES, Config.GAMIFICATION_CACHE_TTL
+            )
     
     async def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get user profile data, from the cache when possible
+        """
+        if self.profile_cache is not None:
+            return await self.profile_cache.get(user_id, lambda: self._fetch_profile(user_id))
+        return await self._fetch_profile(user_id)
+    
+    async def _fetch_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
         Get user profile data from the database
         """
-        if self.use_mock_data:
-            return self._get_mock_profile(user_id)
-        
         try:
-            response = await self.client.get(
-                f"{SUPABASE_URL}/rest/v1/profiles",
-                params={"user_id": f"eq.{user_id}"},
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
-            
-            profiles = response.json()
-            return profiles[0] if profiles else None
+            return await self.backend.get_profile(user_id)
             
         except Exception as e:
             logger.error(f"Error getting profile: {str(e)}")
@@ -59,102 +148,110 @@ class DatabaseConnector:
         """
         Update user profile data in the database
         """
-        if self.use_mock_data:
-            logger.info(f"Mock: Updating profile for user {user_id}: {json.dumps(data)}")
-            return True
-        
         try:
-            response = await self.client.patch(
-                f"{SUPABASE_URL}/rest/v1/profiles",
-                params={"user_id": f"eq.{user_id}"},
-                headers=self._get_headers(),
-                json=data
-            )
-            response.raise_for_status()
+            await self.backend.update_profile(user_id, data)
             return True
             
         except Exception as e:
             logger.error(f"Error updating profile: {str(e)}")
             return False
+            
+        finally:
+            if self.profile_cache is not None:
+                self.profile_cache.invalidate(user_id)
     
     async def create_meal(self, meal_data: Dict[str, Any]) -> Optional[str]:
         """
         Create a new meal record in the database
         """
-        if self.use_mock_data:
-            meal_id = f"meal-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            logger.info(f"Mock: Creating meal {meal_id}: {json.dumps(meal_data)}")
-            return meal_id
+        meal_ids = await self.create_meals([meal_data])
+        return meal_ids[0] if meal_ids else None
+    
+    async def create_meals(self, meals: List[Dict[str, Any]]) -> List[str]:
+        """
+        Create several meal records with one multi-row insert. Returns their
+        IDs in order, or an empty list if the insert failed.
+        """
+        if not meals:
+            return []
+        
+        # IDs are assigned here so the insert doesn't have to echo rows back
+        meals = [{"id": str(uuid.uuid4()), **meal} for meal in meals]
         
         try:
-            response = await self.client.post(
-                f"{SUPABASE_URL}/rest/v1/meals",
-                headers=self._get_headers(include_return=True),
-                json=meal_data
-            )
-            response.raise_for_status()
-            
-            # Return the created meal ID
-            created_meal = response.json()
-            return created_meal.get("id")
+            await self.backend.insert_meals(meals)
+            return [meal["id"] for meal in meals]
             
         except Exception as e:
-            logger.error(f"Error creating meal: {str(e)}")
-            return None
+            logger.error(f"Error creating meals: {str(e)}")
+            return []
     
     async def get_meals(self, user_id: str, start_date: Optional[str] = None, 
-                       end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+                       end_date: Optional[str] = None, projection: str = "detail") -> List[Dict[str, Any]]:
         """
         Get meals for a user within a date range
         """
-        if self.use_mock_data:
-            return self._get_mock_meals(user_id, start_date, end_date)
+        meals = []
+        async for page in self.iter_meals(user_id, start_date, end_date, projection=projection):
+            meals.extend(page)
+        return meals
+    
+    async def iter_meals(self, user_id: str, start_date: Optional[str] = None,
+                         end_date: Optional[str] = None, cursor: Optional[str] = None,
+                         page_size: Optional[int] = None,
+                         projection: str = "list") -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield a user's meals page by page, newest first
+        """
+        while True:
+            meals, cursor = await self.get_meals_page(
+                user_id, start_date, end_date, cursor=cursor, limit=page_size, projection=projection
+            )
+            if meals:
+                yield meals
+            if cursor is None:
+                return
+    
+    async def get_meals_page(self, user_id: str, start_date: Optional[str] = None,
+                             end_date: Optional[str] = None, cursor: Optional[str] = None,
+                             limit: Optional[int] = None,
+                             projection: str = "list") -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get one page of meals, newest first, plus the cursor for the next page
+        (None on the last page). Pages are keyed on (logged_at, id) so each one
+        is an index range scan no matter how deep into the history it is.
+        Database errors are raised, not turned into an empty page.
+        """
+        if projection not in MEAL_PROJECTIONS:
+            raise ValueError(f"Unknown meal projection: {projection}")
+        limit = min(limit or Config.MEALS_PAGE_SIZE, Config.MEALS_MAX_PAGE_SIZE)
+        after = decode_meal_cursor(cursor) if cursor else None
+        start_date = parse_meal_time(start_date) if start_date else None
+        end_date = parse_meal_time(end_date) if end_date else None
         
         try:
-            params = {"user_id": f"eq.{user_id}"}
-            
-            # Add date range filters if provided
-            if start_date:
-                params["logged_at"] = f"gte.{start_date}"
-            if end_date:
-                # If both start and end dates are provided, update the condition
-                if start_date:
-                    params["logged_at"] = f"gte.{start_date},lte.{end_date}"
-                else:
-                    params["logged_at"] = f"lte.{end_date}"
-            
-            # Add ordering
-            params["order"] = "logged_at.desc"
-            
-            response = await self.client.get(
-                f"{SUPABASE_URL}/rest/v1/meals",
-                params=params,
-                headers=self._get_headers()
+            # One extra row tells us whether there is a next page
+            meals = await self.backend.select_meals(
+                user_id, start_date, end_date, after, limit + 1, MEAL_PROJECTIONS[projection]
             )
-            response.raise_for_status()
-            
-            return response.json()
             
         except Exception as e:
+            # Unlike a missing profile, an empty page would read as "no more
+            # meals" and silently cut the history short, so the error goes up
             logger.error(f"Error getting meals: {str(e)}")
-            return []
+            raise
+        
+        if len(meals) > limit:
+            meals = meals[:limit]
+            return meals, encode_meal_cursor(meals[-1])
+        return meals, None
     
     async def update_meal(self, meal_id: str, user_id: str, data: Dict[str, Any]) -> bool:
         """
         Update a meal record in the database
         """
-        if self.use_mock_data:
-            logger.info(f"Mock: Updating meal {meal_id} for user {user_id}: {json.dumps(data)}")
-            return True
-        
         try:
-            response = await self.client.patch(
-                f"{SUPABASE_URL}/rest/v1/meals",
-                params={"id": f"eq.{meal_id}", "user_id": f"eq.{user_id}"},
-                headers=self._get_headers(),
-                json=data
-            )
-            response.raise_for_status()
+            await self.backend.update_meal(meal_id, user_id, data)
             return True
             
         except Exception as e:
@@ -165,17 +262,8 @@ class DatabaseConnector:
         """
         Delete a meal record from the database
         """
-        if self.use_mock_data:
-            logger.info(f"Mock: Deleting meal {meal_id} for user {user_id}")
-            return True
-        
         try:
-            response = await self.client.delete(
-                f"{SUPABASE_URL}/rest/v1/meals",
-                params={"id": f"eq.{meal_id}", "user_id": f"eq.{user_id}"},
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
+            await self.backend.delete_meal(meal_id, user_id)
             return True
             
         except Exception as e:
@@ -184,21 +272,18 @@ class DatabaseConnector:
     
     async def get_gamification(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
-        Get gamification data for a user
+        Get gamification data for a user, from the cache when possible
+        """
+        if self.gamification_cache is not None:
+            return await self.gamification_cache.get(user_id, lambda: self._fetch_gamification(user_id))
+        return await self._fetch_gamification(user_id)
+    
+    async def _fetch_gamification(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get gamification data for a user from the database
         """
-        if self.use_mock_data:
-            return self._get_mock_gamification(user_id)
-        
         try:
-            response = await self.client.get(
-                f"{SUPABASE_URL}/rest/v1/gamification",
-                params={"user_id": f"eq.{user_id}"},
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
-            
-            gamification_data = response.json()
-            return gamification_data[0] if gamification_data else None
+            return await self.backend.get_gamification(user_id)
             
         except Exception as e:
             logger.error(f"Error getting gamification data: {str(e)}")
@@ -206,165 +291,35 @@ class DatabaseConnector:
     
     async def update_gamification(self, user_id: str, data: Dict[str, Any]) -> bool:
         """
-        Update gamification data for a user
+        Update gamification data for a user, creating the record if needed
         """
-        if self.use_mock_data:
-            logger.info(f"Mock: Updating gamification for user {user_id}: {json.dumps(data)}")
-            return True
-        
         try:
-            # Check if record exists
-            response = await self.client.get(
-                f"{SUPABASE_URL}/rest/v1/gamification",
-                params={"user_id": f"eq.{user_id}"},
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
-            
-            exists = len(response.json()) > 0
-            
-            if exists:
-                # Update existing record
-                response = await self.client.patch(
-                    f"{SUPABASE_URL}/rest/v1/gamification",
-                    params={"user_id": f"eq.{user_id}"},
-                    headers=self._get_headers(),
-                    json=data
-                )
-            else:
-                # Create new record
-                response = await self.client.post(
-                    f"{SUPABASE_URL}/rest/v1/gamification",
-                    headers=self._get_headers(),
-                    json={**data, "user_id": user_id}
-                )
-                
-            response.raise_for_status()
+            await self.backend.upsert_gamification(user_id, data)
             return True
             
         except Exception as e:
             logger.error(f"Error updating gamification data: {str(e)}")
             return False
+            
+        finally:
+            if self.gamification_cache is not None:
+                self.gamification_cache.invalidate(user_id)
     
-    def _get_headers(self, include_return: bool = False) -> Dict[str, str]:
-        """
-        Get headers for Supabase API requests
-        """
-        headers = {
-            "apikey": SUPABASE_ANON_KEY,
-            "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        if include_return:
-            headers["Prefer"] = "return=representation"
-        
-        return headers
-    
-    def _get_mock_profile(self, user_id: str) -> Dict[str, Any]:
+    def get_cache_stats(self) -> Dict[str, Any]:
         """
-        Generate mock profile data for testing
+        Get hit-rate metrics for the profile and gamification caches
         """
         return {
-            "id": f"profile-{user_id}",
-            "user_id": user_id,
-            "weight_kg": 70,
-            "height_cm": 175,
-            "dob": "1990-01-01",
-            "gender": "male",
-            "activity_level": "moderate",
-            "created_at": "2025-05-20T10:00:00Z",
-            "updated_at": "2025-05-20T10:00:00Z"
+            "enabled": Config.DB_CACHE_ENABLED,
+            "profiles": self.profile_cache.get_stats() if self.profile_cache is not None else None,
+            "gamification": self.gamification_cache.get_stats() if self.gamification_cache is not None else None,
         }
     
-    def _get_mock_meals(self, user_id: str, start_date: Optional[str], 
-                       end_date: Optional[str]) -> List[Dict[str, Any]]:
-        """
-        Generate mock meal data for testing
-        """
-        today = datetime.now().strftime('%Y-%m-%d')
-        yesterday = (datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - 
-                   datetime.timedelta(days=1)).strftime('%Y-%m-%d')
-        
-        return [
-            {
-                "id": "meal-20250527083000",
-                "user_id": user_id,
-                "image_url": "https://example.com/meals/breakfast.jpg",
-                "meal_name": "Breakfast",
-                "transcript": "Oatmeal with berries and Greek yogurt",
-                "nutrition": {
-                    "calories": 450,
-                    "protein": 22,
-                    "carbs": 65,
-                    "fat": 12,
-                    "fiber": 8,
-                },
-                "advice": "Great breakfast choice! The oatmeal provides fiber and the Greek yogurt adds protein.",
-                "logged_at": f"{today}T08:30:00Z",
-                "created_at": f"{today}T08:30:00Z",
-            },
-            {
-                "id": "meal-20250527121500",
-                "user_id": user_id,
-                "image_url": "https://example.com/meals/lunch.jpg",
-                "meal_name": "Lunch",
-                "transcript": "Grilled chicken salad with quinoa and avocado",
-                "nutrition": {
-                    "calories": 680,
-                    "protein": 45,
-                    "carbs": 55,
-                    "fat": 25,
-                    "fiber": 12,
-                },
-                "advice": "Excellent protein source with healthy fats from the avocado. A well-balanced lunch.",
-                "logged_at": f"{today}T12:15:00Z",
-                "created_at": f"{today}T12:15:00Z",
-            },
-            {
-                "id": "meal-20250526190000",
-                "user_id": user_id,
-                "image_url": "https://example.com/meals/dinner_yesterday.jpg",
-                "meal_name": "Dinner",
-                "transcript": "Salmon with roasted vegetables and brown rice",
-                "nutrition": {
-                    "calories": 750,
-                    "protein": 40,
-                    "carbs": 65,
-                    "fat": 30,
-                    "fiber": 10,
-                },
-                "advice": "Omega-3 rich meal with good fiber content from the vegetables and brown rice.",
-                "logged_at": f"{yesterday}T19:00:00Z",
-                "created_at": f"{yesterday}T19:00:00Z",
-            }
-        ]
-    
-    def _get_mock_gamification(self, user_id: str) -> Dict[str, Any]:
+    async def close(self) -> None:
         """
-        Generate mock gamification data for testing
+        Close the storage backend's connections
         """
-        return {
-            "user_id": user_id,
-            "badges": [
-                {
-                    "id": "first_meal",
-                    "name": "First Meal",
-                    "description": "Logged your first meal",
-                    "earned_at": "2025-05-20T10:15:00Z"
-                },
-                {
-                    "id": "streak_3",
-                    "name": "3-Day Streak",
-                    "description": "Logged meals for 3 consecutive days",
-                    "earned_at": "2025-05-23T09:30:00Z"
-                }
-            ],
-            "current_level": 3,
-            "xp": 280,
-            "streak_days": 7,
-            "last_updated": datetime.now().isoformat()
-        }
+        await self.backend.close()
 
 # Create a singleton instance
 db = DatabaseConnector()
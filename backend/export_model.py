@@ -0,0 +1,68 @@
+"""
+Convert the food classification model for an optimized inference backend
+
+Usage (from the backend directory):
+    python export_model.py --backend onnx
+    python export_model.py --backend all
+    python export_model.py --backend onnx --quantize
+    python export_model.py --snapshot models/food
+    python export_model.py --model "$CASCADE_MODEL_NAME" --backend onnx
+
+Artifacts are written to Config.MODEL_CACHE_DIR and picked up by load_model()
+when INFERENCE_BACKEND is set to the matching backend. A snapshot is an
+offline, memory-mappable copy of the model; point MODEL_NAME at its
+directory to use it.
+"""
+import os
+import sys
+import argparse
+import logging
+from transformers import AutoModelForImageClassification
+from config import Config
+from inference_backends import artifact_path, export_model, quantize_dynamic_int8
+from model_snapshot import save_snapshot
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("export_model")
+
+EXPORTABLE = ["torchscript", "onnx"]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=EXPORTABLE + ["all"], default="all")
+    parser.add_argument("--force", action="store_true", help="Re-export even if a cached artifact exists")
+    parser.add_argument("--quantize", action="store_true", help="Export the int8 quantized variant")
+    parser.add_argument("--model", default=Config.MODEL_NAME,
+                        help="Model to convert (default: MODEL_NAME; pass CASCADE_MODEL_NAME for the cascade)")
+    parser.add_argument("--snapshot", metavar="DIR", help="Write an offline safetensors snapshot to DIR and exit")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        save_snapshot(args.model, args.snapshot)
+        return 0
+
+    backends = EXPORTABLE if args.backend == "all" else [args.backend]
+
+    logger.info(f"Loading {args.model}...")
+    model = AutoModelForImageClassification.from_pretrained(args.model)
+    model.eval()
+
+    failed = False
+    for backend in backends:
+        path = artifact_path(backend, model_name=args.model, quantized=args.quantize)
+        if not args.force and os.path.exists(path):
+            logger.info(f"{backend}: cached artifact already at {path} (use --force to rebuild)")
+            continue
+        try:
+            # ONNX quantizes its exported float graph; TorchScript traces the quantized model
+            source = quantize_dynamic_int8(model) if args.quantize and backend != "onnx" else model
+            export_model(backend, source, path, quantized=args.quantize, model_name=args.model)
+        except Exception as e:
+            logger.error(f"{backend}: export failed: {str(e)}")
+            failed = True
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
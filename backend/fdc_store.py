@@ -0,0 +1,106 @@
+"""
+Offline USDA FoodData Central store for TrackTreat AI
+
+Holds the seven nutrients the orchestrator aggregates for every FDC food,
+plus a full-text index over the food descriptions, in one SQLite file built
+by import_fdc.py. Lookups never touch the network.
+"""
+import os
+import re
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("fdc_store")
+
+# Same order as ai_orchestrator.NUTRIENT_KEYS
+NUTRIENT_COLUMNS = ["calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium"]
+
+SCHEMA = f"""
+CREATE TABLE foods (
+    fdc_id INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    data_type TEXT NOT NULL,
+    {", ".join(f"{column} REAL NOT NULL DEFAULT 0" for column in NUTRIENT_COLUMNS)}
+);
+CREATE VIRTUAL TABLE foods_fts USING fts5(
+    description,
+    content='foods',
+    content_rowid='fdc_id',
+    tokenize='porter unicode61'
+);
+"""
+
+# Generic reference foods describe a dish better than a branded product does
+SEARCH_SQL = f"""
+SELECT foods.fdc_id, foods.description, {", ".join(f"foods.{column}" for column in NUTRIENT_COLUMNS)}
+FROM foods_fts
+JOIN foods ON foods.fdc_id = foods_fts.rowid
+WHERE foods_fts MATCH ?
+ORDER BY foods.data_type = 'branded_food', bm25(foods_fts), length(foods.description)
+LIMIT 1
+"""
+
+def build_match_query(name: str, operator: str = " ") -> Optional[str]:
+    """Turn a model label such as "french_fries" into an FTS5 query"""
+    tokens = re.findall(r"[a-z0-9]+", name.lower().replace("_", " "))
+    if not tokens:
+        return None
+    return operator.join(f'"{token}"' for token in tokens)
+
+class FdcStore:
+    """
+    Read-only access to an imported FDC database. Each thread gets its own
+    connection; SQLite serves the reads straight from the memory-mapped file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # Fail fast on a missing or unreadable file
+        self.food_count = self._connection().execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            connection.execute("PRAGMA mmap_size = 268435456")
+            connection.execute("PRAGMA query_only = ON")
+            self._local.connection = connection
+        return connection
+
+    def search(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Return nutrition per 100 g for the best match of a food name, in the
+        same format as the USDA API lookup, or None if nothing matches.
+        All words must match first; any word matching is the fallback.
+        """
+        connection = self._connection()
+        for operator in (" ", " OR "):
+            query = build_match_query(name, operator)
+            if query is None:
+                return None
+            row = connection.execute(SEARCH_SQL, (query,)).fetchone()
+            if row is not None:
+                nutrition = {"name": name}
+                nutrition.update(zip(NUTRIENT_COLUMNS, row[2:]))
+                return nutrition
+        return None
+
+def open_fdc_store(path: Optional[str] = None) -> Optional[FdcStore]:
+    """Open the configured FDC store, or return None if it hasn't been imported"""
+    path = path or Config.FDC_DB_PATH
+    if not path or not os.path.exists(path):
+        logger.info(f"No offline FDC store at {path}; nutrition comes from the USDA API")
+        return None
+    try:
+        store = FdcStore(path)
+    except sqlite3.Error as e:
+        logger.error(f"Could not open FDC store at {path}: {str(e)}")
+        return None
+    logger.info(f"Opened offline FDC store with {store.food_count} foods from {path}")
+    return store
@@ -0,0 +1,124 @@
+"""
+Shared, pooled HTTP clients for TrackTreat AI
+
+Every upstream gets one long-lived httpx.AsyncClient with its own
+connection pool, so requests reuse keep-alive connections instead of
+paying a fresh TCP+TLS handshake each time. The FastAPI lifespan closes
+them on shutdown.
+"""
+import logging
+from typing import Any, Dict, Optional
+import httpx
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("http_clients")
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class HttpClientRegistry:
+    """
+    Named httpx.AsyncClient instances, created on first use. A client that
+    was closed is recreated the next time it is requested.
+    """
+
+    def __init__(self):
+        self._settings: Dict[str, Dict[str, Any]] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._requests: Dict[str, int] = {}
+
+    def register(self, name: str, timeout: httpx.Timeout, max_connections: int,
+                 max_keepalive_connections: int, keepalive_expiry: float,
+                 http2: bool = False) -> None:
+        """Declare an upstream and how its pool should be sized"""
+        if http2 and not _http2_available():
+            logger.warning(f"HTTP/2 requested for {name} but the h2 package is missing; using HTTP/1.1")
+            http2 = False
+        self._settings[name] = {
+            "timeout": timeout,
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            "http2": http2,
+        }
+        self._requests.setdefault(name, 0)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Return the shared client for an upstream"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            settings = self._settings[name]
+
+            async def count_request(request: httpx.Request, name: str = name) -> None:
+                self._requests[name] += 1
+
+            client = httpx.AsyncClient(event_hooks={"request": [count_request]}, **settings)
+            self._clients[name] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close every client and its pooled connections"""
+        for name, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing {name} HTTP client: {str(e)}")
+        self._clients.clear()
+        logger.info("Shared HTTP clients closed")
+
+    @staticmethod
+    def _pool_stats(client: Optional[httpx.AsyncClient]) -> Dict[str, int]:
+        """Count open, idle and busy connections in a client's pool"""
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "open": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return pool utilization and request counts per upstream"""
+        stats = {}
+        for name, settings in self._settings.items():
+            client = self._clients.get(name)
+            pool = self._pool_stats(client if client is not None and not client.is_closed else None)
+            max_connections = settings["limits"].max_connections
+            stats[name] = {
+                "requests": self._requests[name],
+                "http2": settings["http2"],
+                "max_connections": max_connections,
+                "utilization": pool["active"] / max_connections if max_connections else 0.0,
+                **pool,
+            }
+        return stats
+
+def _timeout(total: float) -> httpx.Timeout:
+    return httpx.Timeout(total, connect=Config.HTTP_CONNECT_TIMEOUT)
+
+# Process-wide registry of upstream clients
+http_clients = HttpClientRegistry()
+
+for _name, _timeout_seconds in (
+    ("usda", Config.SINGLE_API_TIMEOUT),
+    ("supabase_rest", Config.SINGLE_API_TIMEOUT),
+    ("supabase_storage", Config.STORAGE_TIMEOUT),
+    ("webhooks", Config.JOB_WEBHOOK_TIMEOUT),
+):
+    http_clients.register(
+        _name,
+        timeout=_timeout(_timeout_seconds),
+        max_connections=Config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY,
+        http2=Config.HTTP2_ENABLED
+    )
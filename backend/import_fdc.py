@@ -0,0 +1,152 @@
+"""
+Build the offline FoodData Central store from the USDA bulk CSV download
+
+Download and unzip a "Full Download of All Data Types" (or any single data
+type) CSV release from https://fdc.nal.usda.gov/download-datasets.html, then
+run (from the backend directory):
+    python import_fdc.py --source /path/to/FoodData_Central_csv_2024-04-18
+    python import_fdc.py --source ... --include-branded --output data/fdc.sqlite3
+
+Only food.csv, nutrient.csv and food_nutrient.csv are read. The store is
+written to a temporary file and moved into place, so a running API never
+sees a half-built database. Point FDC_DB_PATH at it (default
+data/fdc.sqlite3) and restart.
+"""
+import os
+import csv
+import sys
+import time
+import sqlite3
+import argparse
+import logging
+from typing import Dict, List, Set, Tuple
+from config import Config
+from fdc_store import NUTRIENT_COLUMNS, SCHEMA
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("import_fdc")
+
+# Reference data types; branded_food adds ~2M products and is opt-in
+DEFAULT_DATA_TYPES = ["foundation_food", "sr_legacy_food", "survey_fndds_food"]
+
+# (nutrient name, unit) candidates per column, best first. Foundation foods
+# often only report energy through the Atwater factors.
+NUTRIENT_SOURCES: Dict[str, List[Tuple[str, str]]] = {
+    "calories": [("Energy", "KCAL"), ("Energy (Atwater General Factors)", "KCAL"),
+                 ("Energy (Atwater Specific Factors)", "KCAL")],
+    "protein": [("Protein", "G")],
+    "carbs": [("Carbohydrate, by difference", "G"), ("Carbohydrate, by summation", "G")],
+    "fat": [("Total lipid (fat)", "G"), ("Total fat (NLEA)", "G")],
+    "fiber": [("Fiber, total dietary", "G")],
+    "sugar": [("Sugars, Total", "G"), ("Sugars, total including NLEA", "G")],
+    "sodium": [("Sodium, Na", "MG")],
+}
+
+def read_csv(directory: str, name: str):
+    path = os.path.join(directory, name)
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+def load_nutrient_ids(directory: str) -> Dict[int, Tuple[int, int]]:
+    """Map FDC nutrient id -> (column index, priority) for the nutrients we keep"""
+    wanted = {
+        (name, unit): (column, priority)
+        for column, (key, sources) in enumerate(NUTRIENT_SOURCES.items())
+        for priority, (name, unit) in enumerate(sources)
+    }
+    nutrient_ids = {}
+    for row in read_csv(directory, "nutrient.csv"):
+        match = wanted.get((row["name"], row["unit_name"].upper()))
+        if match is not None:
+            nutrient_ids[int(row["id"])] = match
+    return nutrient_ids
+
+def load_foods(directory: str, data_types: Set[str]) -> Dict[int, Tuple[str, str]]:
+    """Map fdc_id -> (description, data_type) for the selected data types"""
+    foods = {}
+    for row in read_csv(directory, "food.csv"):
+        if row["data_type"] in data_types and row["description"]:
+            foods[int(row["fdc_id"])] = (row["description"], row["data_type"])
+    return foods
+
+def load_nutrients(directory: str, foods: Dict[int, Tuple[str, str]],
+                   nutrient_ids: Dict[int, Tuple[int, int]]) -> Dict[int, List[float]]:
+    """Stream food_nutrient.csv and keep the best-priority value per column"""
+    values: Dict[int, List[float]] = {}
+    priorities: Dict[int, List[int]] = {}
+    width = len(NUTRIENT_COLUMNS)
+    for row in read_csv(directory, "food_nutrient.csv"):
+        nutrient = nutrient_ids.get(int(row["nutrient_id"]))
+        if nutrient is None:
+            continue
+        fdc_id = int(row["fdc_id"])
+        if fdc_id not in foods or not row["amount"]:
+            continue
+        column, priority = nutrient
+        if fdc_id not in values:
+            values[fdc_id] = [0.0] * width
+            priorities[fdc_id] = [len(NUTRIENT_SOURCES[NUTRIENT_COLUMNS[i]]) for i in range(width)]
+        if priority < priorities[fdc_id][column]:
+            values[fdc_id][column] = float(row["amount"])
+            priorities[fdc_id][column] = priority
+    return values
+
+def write_store(path: str, foods: Dict[int, Tuple[str, str]], values: Dict[int, List[float]]) -> int:
+    """Write foods with nutrient data to a fresh database and index it"""
+    temp_path = f"{path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        placeholders = ", ".join("?" * (3 + len(NUTRIENT_COLUMNS)))
+        connection.executemany(
+            f"INSERT INTO foods VALUES ({placeholders})",
+            ((fdc_id, foods[fdc_id][0], foods[fdc_id][1], *row) for fdc_id, row in values.items())
+        )
+        connection.execute("INSERT INTO foods_fts(foods_fts) VALUES ('rebuild')")
+        connection.execute("INSERT INTO foods_fts(foods_fts) VALUES ('optimize')")
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+
+    os.replace(temp_path, path)
+    return len(values)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", required=True, help="Directory with the extracted FDC CSV files")
+    parser.add_argument("--output", default=Config.FDC_DB_PATH, help="SQLite file to write")
+    parser.add_argument("--include-branded", action="store_true", help="Also import branded_food products")
+    args = parser.parse_args()
+
+    data_types = set(DEFAULT_DATA_TYPES)
+    if args.include_branded:
+        data_types.add("branded_food")
+
+    start_time = time.time()
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    try:
+        nutrient_ids = load_nutrient_ids(args.source)
+        foods = load_foods(args.source, data_types)
+        logger.info(f"Selected {len(foods)} foods of types {sorted(data_types)}")
+        values = load_nutrients(args.source, foods, nutrient_ids)
+    except (OSError, KeyError, ValueError) as e:
+        logger.error(f"Could not read FDC CSV files from {args.source}: {str(e)}")
+        return 1
+
+    count = write_store(args.output, foods, values)
+    size_mb = os.path.getsize(args.output) / (1024 * 1024)
+    logger.info(f"Wrote {count} foods ({size_mb:.1f} MB) to {args.output} in {time.time() - start_time:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Pluggable inference backends for the food classification model
+"""
+import os
+import logging
+import tempfile
+from typing import Any, Optional
+import torch
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("inference_backends")
+
+BACKENDS = ("eager", "torchscript", "onnx")
+
+class _LogitsOnly(torch.nn.Module):
+    """Wraps a Hugging Face classifier so tracing/export sees a plain tensor output"""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model(pixel_values=pixel_values).logits
+
+def artifact_path(backend: str, model_name: Optional[str] = None, quantized: bool = False) -> str:
+    """Return where the converted model for a backend is cached on disk"""
+    model_name = model_name or Config.MODEL_NAME
+    if os.path.isdir(model_name):
+        # Local snapshot: name artifacts after the snapshot directory
+        safe_name = os.path.basename(os.path.normpath(model_name))
+    else:
+        safe_name = model_name.strip("/").replace("/", "--")
+    if quantized:
+        safe_name += ".int8"
+    extension = {"torchscript": "torchscript.pt", "onnx": "onnx"}[backend]
+    return os.path.join(Config.MODEL_CACHE_DIR, f"{safe_name}.{extension}")
+
+def quantize_dynamic_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Return a copy of the model with int8 weights for all Linear layers.
+    Activations are quantized on the fly, so no calibration data is needed.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _example_input(model: torch.nn.Module, batch_size: int = 2) -> torch.Tensor:
+    image_size = getattr(model.config, "image_size", Config.MAX_IMAGE_DIMENSION)
+    return torch.rand(batch_size, 3, image_size, image_size)
+
+def export_torchscript(model: torch.nn.Module, path: str) -> str:
+    """Trace and freeze the model into a TorchScript file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    wrapper = _LogitsOnly(model).eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(wrapper, _example_input(model), strict=False)
+        frozen = torch.jit.freeze(traced)
+    frozen.save(path)
+    logger.info(f"Exported TorchScript model to {path}")
+    return path
+
+def export_onnx(model: torch.nn.Module, path: str) -> str:
+    """Export the model to ONNX with a dynamic batch dimension"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    wrapper = _LogitsOnly(model).eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            (_example_input(model),),
+            path,
+            input_names=["pixel_values"],
+            output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=14
+        )
+    logger.info(f"Exported ONNX model to {path}")
+    return path
+
+def quantize_onnx(source_path: str, path: str) -> str:
+    """Write an int8 dynamically quantized copy of an ONNX model"""
+    import onnx  # Optional dependencies, only needed for this backend
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # Intermediate shape annotations left by the exporter can disagree with
+    # the quantizer's own shape inference, so let it recompute them
+    graph_model = onnx.load(source_path)
+    del graph_model.graph.value_info[:]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        clean_path = os.path.join(tmp_dir, "model.onnx")
+        onnx.save(graph_model, clean_path)
+        quantize_dynamic(clean_path, path, weight_type=QuantType.QInt8)
+    logger.info(f"Quantized ONNX model to {path}")
+    return path
+
+def export_model(backend: str, model: torch.nn.Module, path: Optional[str] = None,
+                 quantized: bool = False, model_name: Optional[str] = None) -> str:
+    """
+    Convert the model for a backend and cache the artifact on disk.
+
+    For TorchScript a quantized model is traced as-is. PyTorch can't export
+    quantized modules to ONNX, so for ONNX the float model is exported first
+    and then quantized with ONNX Runtime. `model_name` names the cached
+    artifacts (default: Config.MODEL_NAME), including that float graph.
+    """
+    path = path or artifact_path(backend, model_name=model_name, quantized=quantized)
+    if backend == "torchscript":
+        return export_torchscript(model, path)
+    if backend == "onnx":
+        if not quantized:
+            return export_onnx(model, path)
+        float_path = artifact_path("onnx", model_name=model_name)
+        if not os.path.exists(float_path):
+            export_onnx(model, float_path)
+        return quantize_onnx(float_path, path)
+    raise ValueError(f"Backend '{backend}' has no export step")
+
+class EagerBackend:
+    """Runs the Hugging Face model directly in PyTorch eager mode"""
+
+    name = "eager"
+
+    def __init__(self, model: torch.nn.Module):
+        self.model = model
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model(pixel_values=pixel_values).logits
+
+class TorchScriptBackend:
+    """Runs a frozen TorchScript module optimized for CPU inference"""
+
+    name = "torchscript"
+
+    def __init__(self, path: str):
+        module = torch.jit.load(path, map_location="cpu")
+        self.module = torch.jit.optimize_for_inference(module)
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.module(pixel_values)
+
+class OnnxRuntimeBackend:
+    """Runs the exported model with ONNX Runtime on the CPU"""
+
+    name = "onnx"
+
+    def __init__(self, path: str):
+        import onnxruntime  # Optional dependency, only needed for this backend
+        self._ort = onnxruntime
+        self.path = path
+        self._session = None
+        self._session_pid = None
+        # Fail fast at load time if the artifact is unusable
+        self._get_session()
+
+    def _get_session(self):
+        """Create the session lazily per process; sessions don't survive fork"""
+        if self._session is None or self._session_pid != os.getpid():
+            options = self._ort.SessionOptions()
+            options.graph_optimization_level = self._ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = torch.get_num_threads()
+            self._session = self._ort.InferenceSession(
+                self.path, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+            self._session_pid = os.getpid()
+        return self._session
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        session = self._get_session()
+        (logits,) = session.run(["logits"], {"pixel_values": pixel_values.numpy()})
+        return torch.from_numpy(logits)
+
+def create_backend(name: str, model: torch.nn.Module, quantized: bool = False,
+                   model_name: Optional[str] = None) -> Any:
+    """
+    Build the configured inference backend, exporting and caching the
+    converted artifact on first use. Falls back to eager mode on failure.
+
+    `model` must already be quantized for eager/TorchScript when `quantized`
+    is set; for ONNX it is the float model and quantization happens on export.
+    """
+    if name not in BACKENDS:
+        logger.warning(f"Unknown inference backend '{name}', using eager")
+        return EagerBackend(model)
+    if name == "eager":
+        return EagerBackend(model)
+
+    path = artifact_path(name, model_name=model_name, quantized=quantized)
+    try:
+        if not os.path.exists(path):
+            logger.info(f"No cached {name} artifact at {path}, exporting now")
+            export_model(name, model, path, quantized=quantized, model_name=model_name)
+        if name == "torchscript":
+            return TorchScriptBackend(path)
+        return OnnxRuntimeBackend(path)
+    except Exception as e:
+        logger.error(f"Could not load {name} backend, using eager: {str(e)}")
+        return EagerBackend(model)
@@ -0,0 +1,134 @@
+"""
+Process-pool inference workers for TrackTreat AI
+"""
+import os
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("inference_pool")
+
+def _init_worker(num_threads: int) -> None:
+    """Limit intra-op threads so workers don't oversubscribe the CPU"""
+    import torch
+    torch.set_num_threads(num_threads)
+
+class InferencePool:
+    """
+    Runs inference in N worker processes forked from a parent that has already
+    loaded the model, so every worker maps the same weight pages instead of
+    holding its own copy.
+
+    Each worker is a single-process executor, which lets dispatch pick the
+    worker with the fewest requests in flight. A worker that dies (a crash,
+    or the OOM killer) breaks only its own executor, which is replaced with
+    a freshly forked one.
+    """
+
+    def __init__(self, num_workers: int):
+        self.num_workers = max(1, num_workers)
+        self._threads_per_worker = max(1, (os.cpu_count() or 1) // self.num_workers)
+
+        # Workers must be forked so they inherit the already-loaded weights;
+        # spawn or forkserver workers would each need their own copy
+        self._context = multiprocessing.get_context("fork")
+        self._executors = [self._new_executor() for _ in range(self.num_workers)]
+        self._in_flight = [0] * self.num_workers
+        self._completed = [0] * self.num_workers
+        self._lock = threading.Lock()
+        self._pids: List[Optional[int]] = []
+
+        # Counters for monitoring
+        self.restarts = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self._threads_per_worker,)
+        )
+
+    def start(self) -> None:
+        """
+        Fork all workers right away, while the parent holds nothing but the
+        loaded model, instead of lazily on the first request
+        """
+        futures = [executor.submit(os.getpid) for executor in self._executors]
+        self._pids = [future.result() for future in futures]
+        logger.info(f"Started {self.num_workers} inference worker processes: {self._pids}")
+
+    def run_on_each(self, fn: Callable[..., Any], *args: Any) -> List[Any]:
+        """Run a picklable function once on every worker and wait for all of them"""
+        futures = [executor.submit(fn, *args) for executor in self._executors]
+        return [future.result() for future in futures]
+
+    def _acquire_worker(self) -> int:
+        """Pick the least-loaded worker and mark a request in flight on it"""
+        with self._lock:
+            index = min(range(self.num_workers), key=lambda i: self._in_flight[i])
+            self._in_flight[index] += 1
+            return index
+
+    def _release_worker(self, index: int) -> None:
+        with self._lock:
+            self._in_flight[index] -= 1
+            self._completed[index] += 1
+
+    def _replace_worker(self, index: int, broken: ProcessPoolExecutor) -> None:
+        """Swap a broken executor for a new one, once per breakage"""
+        with self._lock:
+            if self._executors[index] is not broken:
+                return
+            executor = self._new_executor()
+            self._executors[index] = executor
+            if index < len(self._pids):
+                self._pids[index] = None
+            self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+        logger.warning(f"Inference worker {index} died; started a replacement")
+
+        def record_pid(future: Any) -> None:
+            if future.exception() is None and index < len(self._pids):
+                self._pids[index] = future.result()
+
+        executor.submit(os.getpid).add_done_callback(record_pid)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a picklable function on the least-loaded worker. If the worker
+        dies the call fails, and later calls go to its replacement.
+        """
+        index = self._acquire_worker()
+        executor = self._executors[index]
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            self._replace_worker(index, executor)
+            raise
+        finally:
+            self._release_worker(index)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per-worker load counters"""
+        with self._lock:
+            return {
+                "workers": self.num_workers,
+                "pids": list(self._pids),
+                "in_flight": list(self._in_flight),
+                "completed": list(self._completed),
+                "restarts": self.restarts,
+            }
+
+    def shutdown(self) -> None:
+        """Stop all worker processes"""
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Inference worker processes stopped")
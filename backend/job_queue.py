@@ -0,0 +1,281 @@
+"""
+Bounded in-process job queue for asynchronous meal analysis
+
+Jobs and their results live in this process's memory, so a job can only
+be polled on the worker process that accepted it. Run one server process
+per instance (scale out with more instances behind sticky routing, not
+with uvicorn --workers).
+"""
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import ipaddress
+from urllib.parse import urlsplit
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+import httpx
+import httpcore
+from httpcore.backends.auto import AutoBackend
+from http_clients import http_clients
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("job_queue")
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+class InvalidWebhookError(ValueError):
+    """Raised for a webhook URL the server must not POST to"""
+
+async def check_webhook_url(url: str, allowed_hosts: Sequence[str] = ()) -> List[str]:
+    """
+    Reject webhook URLs that could point the server at internal services.
+
+    Only https URLs are accepted. With `allowed_hosts` set the host must be
+    one of them; otherwise every address the host resolves to must be a
+    public one (no loopback, private, link-local, reserved or multicast).
+    Returns the checked addresses, or an empty list for an allowed host.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https":
+        raise InvalidWebhookError("webhook_url must use https")
+    host = (parts.hostname or "").lower()
+    if not host:
+        raise InvalidWebhookError("webhook_url has no host")
+    if parts.username or parts.password:
+        raise InvalidWebhookError("webhook_url must not contain credentials")
+
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise InvalidWebhookError(f"webhook host {host} is not allowed")
+        return []
+
+    try:
+        port = parts.port or 443
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (ValueError, socket.gaierror):
+        raise InvalidWebhookError(f"webhook host {host} does not resolve")
+    checked = []
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise InvalidWebhookError(f"webhook host {host} resolves to a non-public address")
+        checked.append(str(address))
+    return checked
+
+class _PinnedBackend(AutoBackend):
+    """Dials a fixed address for one host name; TLS still verifies the name"""
+
+    def __init__(self, host: str, address: str):
+        self.host = host
+        self.address = address
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None) -> Any:
+        if host.lower() != self.host:
+            raise httpcore.ConnectError(f"Refusing to connect to unchecked host {host}")
+        return await super().connect_tcp(self.address, port, timeout=timeout, local_address=local_address)
+
+class PinnedTransport(httpx.AsyncHTTPTransport):
+    """
+    Transport that connects to an address checked by check_webhook_url
+    instead of resolving the host again, so a DNS answer that changes
+    between the check and the connect cannot redirect the request
+    """
+
+    def __init__(self, host: str, address: str):
+        super().__init__()
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            network_backend=_PinnedBackend(host, address)
+        )
+
+class MealJobQueue:
+    """
+    Runs meal analysis jobs on a fixed set of workers fed by a bounded queue.
+
+    Submitting to a full queue fails immediately with QueueFullError, so
+    overload turns into fast rejections instead of piled-up connections.
+    Finished jobs are kept for `result_ttl` seconds and can optionally be
+    pushed to a webhook.
+    """
+
+    def __init__(self, process_fn: Callable[..., Awaitable[Dict[str, Any]]],
+                 max_size: int = 100, num_workers: int = 4,
+                 result_ttl: float = 600.0, job_timeout: float = 100.0,
+                 webhook_timeout: float = 5.0, webhook_allowed_hosts: Sequence[str] = ()):
+        self.process_fn = process_fn
+        self.max_size = max(1, max_size)
+        self.num_workers = max(1, num_workers)
+        self.result_ttl = result_ttl
+        self.job_timeout = job_timeout
+        self.webhook_timeout = webhook_timeout
+        self.webhook_allowed_hosts = webhook_allowed_hosts
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+
+        # Counters for monitoring
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self._total_run_time = 0.0
+
+    async def start(self) -> None:
+        """Start the worker tasks"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(index)) for index in range(self.num_workers)
+        ]
+        logger.info(f"Started {self.num_workers} meal job workers (queue size {self.max_size})")
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks; queued jobs are dropped"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Meal job workers stopped")
+
+    async def check_webhook(self, url: str) -> List[str]:
+        """Raise InvalidWebhookError unless jobs may be POSTed to `url`"""
+        return await check_webhook_url(url, self.webhook_allowed_hosts)
+
+    def submit(self, payload: Dict[str, Any], webhook_url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a job and return its record. `payload` is passed to the
+        process function as keyword arguments.
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        self._purge_expired()
+
+        if self._queue.full():
+            self.rejected += 1
+            raise QueueFullError(self._estimate_retry_after())
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "webhook_url": webhook_url,
+        }
+        self._jobs[job_id] = job
+        self._payloads[job_id] = payload
+        self._queue.put_nowait(job_id)
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job record, or None if it is unknown or expired"""
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Worker {index} crashed on job {job_id}: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = self._jobs.get(job_id)
+        payload = self._payloads.pop(job_id, None)
+        if job is None or payload is None:
+            return
+
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        try:
+            result = await asyncio.wait_for(self.process_fn(**payload), timeout=self.job_timeout)
+            result["processing_time"] = time.time() - job["started_at"]
+            job["result"] = result
+            job["status"] = "completed"
+            self.completed += 1
+        except asyncio.TimeoutError:
+            job["error"] = "Processing timeout"
+            job["status"] = "failed"
+            self.failed += 1
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+            job["error"] = str(e)
+            job["status"] = "failed"
+            self.failed += 1
+        finally:
+            job["finished_at"] = time.time()
+            self._total_run_time += job["finished_at"] - job["started_at"]
+
+        if job["webhook_url"]:
+            await self._notify(job)
+
+    async def _notify(self, job: Dict[str, Any]) -> None:
+        """POST the finished job to its webhook; failures are only logged"""
+        url = job["webhook_url"]
+        try:
+            # Checked again at send time, and the POST goes to the address
+            # that passed: the host may resolve differently by now
+            addresses = await self.check_webhook(url)
+            if addresses:
+                transport = PinnedTransport(urlsplit(url).hostname.lower(), addresses[0])
+                async with httpx.AsyncClient(transport=transport, timeout=self.webhook_timeout) as client:
+                    response = await client.post(url, json=self.public_view(job))
+            else:
+                response = await http_clients.get("webhooks").post(
+                    url, json=self.public_view(job), timeout=self.webhook_timeout
+                )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Webhook for job {job['job_id']} failed: {str(e)}")
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _estimate_retry_after(self) -> int:
+        """Seconds until a slot is likely free, from the average job duration"""
+        finished = self.completed + self.failed
+        average = (self._total_run_time / finished) if finished else 5.0
+        waves = self._queue.qsize() / self.num_workers
+        return max(1, int(average * waves + 0.5))
+
+    @staticmethod
+    def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Job record without internal fields"""
+        return {key: value for key, value in job.items() if key != "webhook_url"}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue depth and job counters"""
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "workers": self.num_workers,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "stored_jobs": len(self._jobs),
+        }
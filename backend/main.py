@@ -1,7 +1,8 @@
 from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Form, Body
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uvicorn
 import os
 from datetime import datetime
@@ -19,13 +20,49 @@ from contextlib import asynccontextmanager
 import asyncio
 from ai_orchestrator import ai_orchestrator, load_model
 from fastapi import FastAPI
+from config import Config
+from upload_limits import UploadLimitMiddleware
+from auth import authorized_user_id, current_user_id
 
 app = FastAPI()
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="TrackTreat AI API", description="Backend API for TrackTreat AI application")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Owns everything that lives as long as the process: the background model
+    load, the job workers, inference worker processes and the shared HTTP
+    client pools, which are closed gracefully on shutdown
+    """
+    await preload_food_model()
+    await start_job_workers()
+    try:
+        yield
+    finally:
+        await stop_inference_workers()
+        await db.close()
+        await http_clients.aclose()
+
+app = FastAPI(
+    title="TrackTreat AI API",
+    description="Backend API for TrackTreat AI application",
+    lifespan=lifespan
+)
+
+# Cap upload request bodies while they stream in, before the multipart
+# parser spools them; added first so CORS headers still wrap the 413
+single_upload_limit = Config.MAX_IMAGE_SIZE + Config.UPLOAD_FORM_OVERHEAD
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/analyze-meal": single_upload_limit,
+        "/analyze-meal/jobs": single_upload_limit,
+        "/analyze-meal/stream": single_upload_limit,
+        "/analyze-meal/batch": Config.MAX_IMAGE_SIZE * Config.MAX_BATCH_IMAGES + Config.UPLOAD_FORM_OVERHEAD,
+    }
+)
 
 # Configure CORS
 app.add_middleware(
@@ -94,31 +131,18 @@ def read_root():
 
 # Profile routes
 @app.get("/profiles/{user_id}")
-async def get_profile(user_id: str):
-    # Placeholder for getting profile from Supabase
-    # In a real implementation, this would query the Supabase database
-    return {
-        "id": "profile-123",
-        "user_id": user_id,
-        "weight_kg": 70,
-        "height_cm": 175,
-        "dob": "1990-01-01",
-        "gender": "male",
-        "activity_level": "moderate",
-        "created_at": datetime.now().isoformat(),
-        "updated_at": datetime.now().isoformat(),
-    }
+async def get_profile(user_id: str = Depends(authorized_user_id)):
+    profile = await db.get_profile(user_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
 
 @app.put("/profiles/{user_id}")
-async def update_profile(user_id: str, profile: Profile):
-    # Placeholder for updating profile in Supabase
-    return {
-        "id": "profile-123",
-        "user_id": user_id,
-        **profile.dict(),
-        "created_at": datetime.now().isoformat(),
-        "updated_at": datetime.now().isoformat(),
-    }
+async def update_profile(profile: Profile, user_id: str = Depends(authorized_user_id)):
+    data = {**profile.dict(exclude_unset=True), "updated_at": datetime.now().isoformat()}
+    if not await db.update_profile(user_id, data):
+        raise HTTPException(status_code=502, detail="Could not update profile")
+    return await db.get_profile(user_id)
 
 # Meal routes
 @app.post("/meals/")
@@ -165,30 +189,56 @@ async def create_meal(meal: MealCreate, user_id: str = Form(...)):
     }
 
 @app.get("/meals/")
-async def get_meals(user_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
-    # Placeholder for querying meals from Supabase
-    # This would filter by user_id and date range
-    
-    # Mock response with a list of meals
-    return [
-        {
-            "id": "meal-20250527080000",
-            "user_id": user_id,
-            "image_url": "https://example.com/meals/breakfast.jpg",
-            "meal_name": "Breakfast",
-            "transcript": "Oatmeal with berries and Greek yogurt",
-            "nutrition": {
-                "calories": 450,
-                "protein": 22,
-                "carbs": 65,
-                "fat": 12,
-                "fiber": 8,
-            },
-            "advice": "Great breakfast choice! The oatmeal provides fiber and the Greek yogurt adds protein.",
-            "logged_at": "2025-05-27T08:30:00Z",
-            "created_at": "2025-05-27T08:30:00Z",
-        }
-    ]
+async def get_meals(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    view: str = "detail", cursor: Optional[str] = None, limit: Optional[int] = None,
+                    user_id: str = Depends(current_user_id)):
+    """
+    List the authenticated user's meals, newest first.
+
+    Without `limit` the whole range is streamed as one JSON array, fetched
+    from the database a page at a time. With `limit` a single page is returned
+    and the cursor for the next one is in the X-Next-Cursor header.
+    `view=list` drops the transcript and advice text.
+    """
+    if view not in MEAL_PROJECTIONS:
+        raise HTTPException(status_code=400, detail=f"view must be one of: {', '.join(MEAL_PROJECTIONS)}")
+    try:
+        if cursor:
+            decode_meal_cursor(cursor)
+        for value in (start_date, end_date):
+            if value:
+                parse_meal_time(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+
+    # The first page is read up front so a database failure is still a 502
+    try:
+        meals, next_cursor = await db.get_meals_page(
+            user_id, start_date, end_date, cursor=cursor, limit=limit, projection=view
+        )
+    except Exception:
+        raise HTTPException(status_code=502, detail="Could not load meals")
+
+    if limit is not None:
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return JSONResponse(content=meals, headers=headers)
+
+    async def stream_meals():
+        yield "[" + ",".join(json.dumps(meal) for meal in meals)
+        first = not meals
+        if next_cursor:
+            # A failure on a later page propagates out of the generator, so
+            # the server aborts the response before the closing bracket and
+            # the client sees a truncated body instead of a short, valid list
+            async for page in db.iter_meals(user_id, start_date, end_date, cursor=next_cursor, projection=view):
+                for meal in page:
+                    yield ("" if first else ",") + json.dumps(meal)
+                    first = False
+        yield "]"
+
+    return StreamingResponse(stream_meals(), media_type="application/json")
 
 @app.patch("/meals/{meal_id}")
 async def update_meal(meal_id: str, meal: MealUpdate):
@@ -201,28 +251,23 @@ async def update_meal(meal_id: str, meal: MealUpdate):
     }
 
 # Gamification routes
-@app.get("/badges/{user_id}")
-async def get_badges(user_id: str):
-    # Placeholder for getting gamification data from Supabase
+@app.get("/badges/{user_id}", response_model=GamificationData)
+async def get_badges(user_id: str = Depends(authorized_user_id)):
+    gamification = await db.get_gamification(user_id)
+    if gamification is None:
+        raise HTTPException(status_code=404, detail="Gamification data not found")
+    # Map the row to the documented shape; stored badges also carry
+    # internal fields such as their XP value
     return {
-        "user_id": user_id,
+        "user_id": gamification["user_id"],
         "badges": [
-            {
-                "id": "badge-1",
-                "name": "7-Day Streak",
-                "description": "Logged meals for 7 consecutive days",
-                "earned_at": "2025-05-20T12:00:00Z",
-            },
-            {
-                "id": "badge-2",
-                "name": "Protein Champion",
-                "description": "Hit protein goals 5 days in a row",
-                "earned_at": "2025-05-25T12:00:00Z",
-            },
+            {key: str(badge.get(key, "")) for key in ("id", "name", "description", "earned_at")}
+            for badge in gamification.get("badges") or []
+            if isinstance(badge, dict)
         ],
-        "current_level": 5,
-        "xp": 450,
-        "last_updated": datetime.now().isoformat(),
+        "current_level": gamification.get("current_level") or 1,
+        "xp": gamification.get("xp") or 0,
+        "last_updated": str(gamification.get("last_updated") or ""),
     }
 
 @app.post("/events/")
@@ -242,18 +287,146 @@ async def create_event(event: EventCreate):
         "xp": 460,
     }
 
-# Import AIOrchestrator at the top of the file
-from ai_orchestrator import ai_orchestrator, load_model
+# Import AIOrchestrator at the top of the file (torch/transformers load lazily)
+from ai_orchestrator import ai_orchestrator, ensure_model_loaded, get_model_state, shutdown_inference
+from config import Config
+from job_queue import InvalidWebhookError, MealJobQueue, QueueFullError
+from http_clients import http_clients
+from db_connector import db, decode_meal_cursor, parse_meal_time, MEAL_PROJECTIONS
+
+# Bounded queue for the submit/poll analysis API
+meal_jobs = MealJobQueue(
+    ai_orchestrator.process_meal,
+    max_size=Config.JOB_QUEUE_MAX_SIZE,
+    num_workers=Config.JOB_WORKERS,
+    result_ttl=Config.JOB_RESULT_TTL,
+    job_timeout=Config.REQUEST_TIMEOUT,
+    webhook_timeout=Config.JOB_WEBHOOK_TIMEOUT,
+    webhook_allowed_hosts=Config.JOB_WEBHOOK_ALLOWED_HOSTS
+)
 
-@app.on_event("startup")
 async def preload_food_model():
     """
-    Load the food‐classification model exactly once, at startup.
-    By running in a ThreadPoolExecutor, we avoid blocking the event loop.
+    Start loading and warming up the food‐classification model exactly once,
+    at startup. The load runs in the background so the app starts serving
+    non-AI routes immediately; /health/ready reports when it has finished.
+    Once the labels are known, their nutrition is prewarmed.
+    """
+    async def load_in_background():
+        try:
+            await ensure_model_loaded()
+        except Exception as e:
+            logger.error(f"Background model load failed: {str(e)}")
+            return
+        if Config.NUTRITION_PREWARM:
+            try:
+                await ai_orchestrator.prewarm_nutrition_cache()
+            except Exception as e:
+                logger.error(f"Nutrition cache prewarm failed: {str(e)}")
+    
+    app.state.model_load_task = asyncio.create_task(load_in_background())
+
+async def start_job_workers():
+    """
+    Start the meal analysis job workers. Jobs are polled from the process
+    that accepted them, so more than one server process is refused here
+    rather than failing polls at random later.
+    """
+    if Config.WEB_CONCURRENCY > 1:
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={Config.WEB_CONCURRENCY}: meal jobs are kept in process memory, "
+            "run one worker per instance"
+        )
+    await meal_jobs.start()
+
+async def stop_inference_workers():
+    """Stop job workers and inference worker processes started in process mode"""
+    await meal_jobs.stop()
+    shutdown_inference()
+
+# Magic numbers of the image formats the decoder accepts
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+)
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Return the image format from the first bytes of a file, or None"""
+    for signature, image_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+async def read_upload_capped(file: UploadFile, request_id: str) -> bytes:
+    """
+    Read a parsed upload in chunks, rejecting it if it exceeds
+    Config.MAX_IMAGE_SIZE or turns out not to be an image. By now the
+    multipart parser has spooled the whole file; UploadLimitMiddleware is
+    what stops an oversized request body while it is still arriving.
     """
-    loop = asyncio.get_event_loop()
-    # run load_model() on a background thread to prevent blocking UVicorn's event loop
-    await loop.run_in_executor(None, load_model)
+    max_size = Config.MAX_IMAGE_SIZE
+    max_size_mb = max_size / (1024 * 1024)
+    
+    # The multipart parser already knows the size of the spooled file
+    if file.size is not None and file.size > max_size:
+        logger.error(f"[{request_id}] Image too large: {file.size} bytes")
+        raise HTTPException(status_code=413, detail=f"Image too large (max {max_size_mb:g}MB)")
+    
+    chunks: List[bytes] = []
+    total = 0
+    sniffed = False
+    while True:
+        chunk = await file.read(Config.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_size:
+            logger.error(f"[{request_id}] Image too large: more than {max_size} bytes")
+            raise HTTPException(status_code=413, detail=f"Image too large (max {max_size_mb:g}MB)")
+        chunks.append(chunk)
+        
+        if not sniffed and total >= 12:
+            header = chunks[0] if len(chunks[0]) >= 12 else b"".join(chunks)
+            if sniff_image_type(header) is None:
+                logger.error(f"[{request_id}] Upload is not a supported image")
+                raise HTTPException(status_code=415, detail="Unsupported image format")
+            sniffed = True
+    
+    if not sniffed:
+        logger.error(f"[{request_id}] Upload is not a supported image")
+        raise HTTPException(status_code=415, detail="Unsupported image format")
+    
+    # A single chunk is returned as-is; otherwise join once. The decoder wraps
+    # these bytes in BytesIO, which shares the buffer instead of copying it.
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+async def read_image_upload(file: UploadFile, request_id: str) -> bytes:
+    """Read and validate one uploaded image"""
+    # Read image data with timeout
+    try:
+        return await asyncio.wait_for(read_upload_capped(file, request_id), timeout=30.0)
+    except asyncio.TimeoutError:
+        logger.error(f"[{request_id}] Timeout reading image data")
+        raise HTTPException(status_code=408, detail="Timeout reading image data")
+
+def parse_profile(profile: str, request_id: str) -> Dict[str, Any]:
+    """Parse the user profile JSON sent with an upload"""
+    try:
+        return json.loads(profile)
+    except json.JSONDecodeError:
+        logger.error(f"[{request_id}] Invalid profile JSON")
+        raise HTTPException(status_code=400, detail="Invalid profile JSON")
+
+async def read_meal_upload(file: UploadFile, profile: str, request_id: str) -> Tuple[bytes, Dict[str, Any]]:
+    """Read and validate the uploaded image and the user profile JSON"""
+    image_data = await read_image_upload(file, request_id)
+    user_profile = parse_profile(profile, request_id)
+    return image_data, user_profile
 
 # AI Meal Analysis Endpoint
 @app.post("/analyze-meal")
@@ -266,24 +439,7 @@ async def analyze_meal(
     start_time = time.time()
     
     try:
-        # Read image data with timeout
-        try:
-            image_data = await asyncio.wait_for(file.read(), timeout=30.0)
-        except asyncio.TimeoutError:
-            logger.error(f"[{request_id}] Timeout reading image data")
-            raise HTTPException(status_code=408, detail="Timeout reading image data")
-        
-        # Validate image size
-        if len(image_data) > 10 * 1024 * 1024:  # 10MB limit
-            logger.error(f"[{request_id}] Image too large: {len(image_data)} bytes")
-            raise HTTPException(status_code=413, detail="Image too large (max 10MB)")
-        
-        # Parse user profile
-        try:
-            user_profile = json.loads(profile)
-        except json.JSONDecodeError:
-            logger.error(f"[{request_id}] Invalid profile JSON")
-            raise HTTPException(status_code=400, detail="Invalid profile JSON")
+        image_data, user_profile = await read_meal_upload(file, profile, request_id)
         
         # Process meal with timeout
         try:
@@ -313,7 +469,163 @@ async def analyze_meal(
         logger.error(f"[{request_id}] Error processing meal: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze-meal/batch")
+async def analyze_meal_batch(
+    files: List[UploadFile] = File(...),
+    profile: str = Form(...)
+):
+    """
+    Analyze several meal photos in one request. The images share one batched
+    forward pass and one set of USDA lookups; results come back in upload order.
+    """
+    request_id = str(uuid.uuid4())[:8]
+    logger.info(f"[{request_id}] === BATCH MEAL ANALYSIS REQUEST START ({len(files)} images) ===")
+    start_time = time.time()
+    
+    if len(files) > Config.MAX_BATCH_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many images (max {Config.MAX_BATCH_IMAGES})"
+        )
+    
+    try:
+        user_profile = parse_profile(profile, request_id)
+        images_data = [await read_image_upload(file, request_id) for file in files]
+        
+        try:
+            results = await asyncio.wait_for(
+                ai_orchestrator.process_meal_batch(images_data, user_profile),
+                timeout=Config.REQUEST_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"[{request_id}] Batch processing timeout")
+            raise HTTPException(status_code=408, detail="Processing timeout")
+        
+        processing_time = time.time() - start_time
+        logger.info(f"[{request_id}] === BATCH MEAL ANALYSIS REQUEST END ===")
+        return {"results": results, "processing_time": processing_time}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[{request_id}] Error processing meal batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze-meal/jobs", status_code=202)
+async def submit_meal_job(
+    file: UploadFile = File(...),
+    profile: str = Form(...),
+    webhook_url: Optional[str] = Form(None)
+):
+    """
+    Queue a meal analysis and return immediately with a job id. Poll
+    /analyze-meal/jobs/{job_id} for the result, or pass webhook_url to have
+    the finished job POSTed back (https, public hosts only). Returns 429
+    with Retry-After when full.
+    """
+    request_id = str(uuid.uuid4())[:8]
+    if webhook_url:
+        try:
+            await meal_jobs.check_webhook(webhook_url)
+        except InvalidWebhookError as e:
+            logger.warning(f"[{request_id}] Rejected webhook_url: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Invalid webhook_url: {str(e)}")
+    image_data, user_profile = await read_meal_upload(file, profile, request_id)
+    
+    try:
+        job = meal_jobs.submit(
+            {
+                "image_data": image_data,
+                "audio_data": None,
+                "manual_transcript": None,
+                "user_profile": user_profile
+            },
+            webhook_url=webhook_url
+        )
+    except QueueFullError as e:
+        logger.warning(f"[{request_id}] Job queue full, rejecting request")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many pending analyses, please retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    logger.info(f"[{request_id}] Queued meal analysis job {job['job_id']}")
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/analyze-meal/jobs/{job['job_id']}"
+    }
+
+@app.get("/analyze-meal/jobs/{job_id}")
+async def get_meal_job(job_id: str):
+    """Return the status and, once finished, the result of a queued analysis"""
+    job = meal_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return MealJobQueue.public_view(job)
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/analyze-meal/stream")
+async def analyze_meal_stream(
+    file: UploadFile = File(...),
+    profile: str = Form(...)
+):
+    """
+    Streaming variant of /analyze-meal using Server-Sent Events. Emits
+    identified_foods as soon as classification finishes, then one
+    nutrition_item per food, the aggregate nutrition, advice and done.
+    """
+    request_id = str(uuid.uuid4())[:8]
+    logger.info(f"[{request_id}] === MEAL ANALYSIS STREAM START ===")
+    
+    # Validate before streaming so bad requests still get proper status codes
+    image_data, user_profile = await read_meal_upload(file, profile, request_id)
+    
+    async def event_stream():
+        try:
+            async for event, data in ai_orchestrator.process_meal_stream(
+                image_data=image_data,
+                audio_data=None,
+                manual_transcript=None,
+                user_profile=user_profile
+            ):
+                yield format_sse(event, data)
+        except Exception as e:
+            logger.error(f"[{request_id}] Error streaming meal analysis: {str(e)}", exc_info=True)
+            yield format_sse("error", {"detail": str(e)})
+        logger.info(f"[{request_id}] === MEAL ANALYSIS STREAM END ===")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
\ No newline at end of file
+    """Liveness check: the process is up and serving requests"""
+    return {"status": "healthy"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness check: not ready until the model is loaded and warmed up"""
+    state = get_model_state()
+    if state != "ready":
+        return JSONResponse(status_code=503, content={"status": "not_ready", "model": state})
+    return {"status": "ready", "model": state}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Cache, batching, worker, job queue, HTTP pool and database cache counters"""
+    return {
+        **ai_orchestrator.get_metrics(),
+        "job_queue": meal_jobs.get_stats(),
+        "http_pools": http_clients.get_stats(),
+        "db_cache": db.get_cache_stats(),
+        "db_backend": db.backend.get_stats(),
+    }
\ No newline at end of file
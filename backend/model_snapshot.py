@@ -0,0 +1,115 @@
+"""
+Offline, memory-mapped model snapshots for TrackTreat AI
+
+A snapshot is a local directory holding the model config, processor config
+and weights as safetensors. Loading one never touches the Hugging Face hub,
+and the weights are mapped read-only straight from the file, so every
+process on a host serving the same snapshot shares one copy in the page
+cache instead of holding private memory.
+"""
+import os
+import json
+import mmap
+import struct
+import logging
+import warnings
+from typing import Dict, List
+import torch
+from transformers import AutoConfig, AutoImageProcessor, AutoModelForImageClassification
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("model_snapshot")
+
+WEIGHTS_FILE = "model.safetensors"
+WEIGHTS_INDEX_FILE = "model.safetensors.index.json"
+
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+def is_snapshot(path: str) -> bool:
+    """Return True if the path is a local snapshot directory"""
+    return os.path.isdir(path) and (
+        os.path.exists(os.path.join(path, WEIGHTS_FILE))
+        or os.path.exists(os.path.join(path, WEIGHTS_INDEX_FILE))
+    )
+
+def save_snapshot(model_name: str, directory: str) -> str:
+    """Download (or load) a model and write it as a safetensors snapshot"""
+    os.makedirs(directory, exist_ok=True)
+    AutoImageProcessor.from_pretrained(model_name).save_pretrained(directory)
+    model = AutoModelForImageClassification.from_pretrained(model_name)
+    model.save_pretrained(directory, safe_serialization=True)
+    logger.info(f"Saved snapshot of {model_name} to {directory}")
+    return directory
+
+def _weight_files(directory: str) -> List[str]:
+    index_path = os.path.join(directory, WEIGHTS_INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            shards = sorted(set(json.load(f)["weight_map"].values()))
+        return [os.path.join(directory, shard) for shard in shards]
+    return [os.path.join(directory, WEIGHTS_FILE)]
+
+def map_safetensors(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Map a safetensors file read-only and return tensors that point directly
+    into the mapping. Writing to them will crash the process.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    (header_size,) = struct.unpack("<Q", mapped[:8])
+    header = json.loads(mapped[8:8 + header_size])
+    data_start = 8 + header_size
+
+    tensors = {}
+    with warnings.catch_warnings():
+        # torch warns that the buffer is read-only; that is the point
+        warnings.simplefilter("ignore", UserWarning)
+        for name, info in header.items():
+            if name == "__metadata__":
+                continue
+            dtype = _DTYPES[info["dtype"]]
+            begin, end = info["data_offsets"]
+            count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+            if count == 0:
+                tensor = torch.empty(0, dtype=dtype)
+            else:
+                tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + begin)
+            tensors[name] = tensor.reshape(info["shape"])
+    return tensors
+
+def load_snapshot_model(directory: str) -> torch.nn.Module:
+    """
+    Build the model without allocating weights and point every parameter at
+    the memory-mapped snapshot
+    """
+    config = AutoConfig.from_pretrained(directory, local_files_only=True)
+    with torch.device("meta"):
+        model = AutoModelForImageClassification.from_config(config)
+
+    state_dict: Dict[str, torch.Tensor] = {}
+    for path in _weight_files(directory):
+        state_dict.update(map_safetensors(path))
+
+    model.load_state_dict(state_dict, strict=True, assign=True)
+
+    leftover = [name for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+                if tensor.is_meta]
+    if leftover:
+        raise ValueError(f"Snapshot is missing tensors: {leftover[:5]}")
+
+    model.eval()
+    logger.info(f"Memory-mapped {len(state_dict)} tensors from {directory}")
+    return model
@@ -0,0 +1,156 @@
+"""
+Two-tier cache of per-food nutrition lookups for TrackTreat AI
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config import Config
+from cache_utils import SingleFlight, TTLCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("nutrition_cache")
+
+def normalize_food_name(name: str) -> str:
+    """Cache key for a food: "French_Fries" and "french fries" share an entry"""
+    return " ".join(re.findall(r"[a-z0-9]+", name.lower().replace("_", " ")))
+
+class DiskTier:
+    """
+    SQLite table of nutrition lookups that survives restarts, so a fresh
+    process doesn't re-query USDA for foods it has already seen. Reads and
+    writes run on a worker thread, off the event loop.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nutrition-cache")
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS nutrition ("
+            "name TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM nutrition WHERE name = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO nutrition (name, data, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl_seconds)
+            )
+            self._connection.commit()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._get, key)
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._set, key, value)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM nutrition").fetchone()[0]
+
+class NutritionCache:
+    """
+    Memory LRU in front of a persistent SQLite tier, keyed by normalized food
+    name. Concurrent misses for the same food share one upstream lookup.
+    Only real lookups are cached; a fetch returning None is not.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, disk_path: Optional[str] = None):
+        self.memory = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.disk: Optional[DiskTier] = None
+        if disk_path:
+            try:
+                self.disk = DiskTier(disk_path, ttl_seconds)
+            except sqlite3.Error as e:
+                logger.error(f"Could not open nutrition cache at {disk_path}, memory only: {str(e)}")
+        self._flights = SingleFlight()
+
+        # Counters for monitoring
+        self.disk_hits = 0
+        self.fetches = 0
+
+    async def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = await self.disk.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        return value
+
+    @staticmethod
+    def _named(value: Optional[Dict[str, Any]], name: str) -> Optional[Dict[str, Any]]:
+        if value is None:
+            return None
+        nutrition = dict(value)
+        nutrition["name"] = name
+        return nutrition
+
+    async def get_cached(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return cached nutrition for a food without fetching on a miss"""
+        return self._named(await self._lookup(normalize_food_name(name)), name)
+
+    async def get_or_fetch(self, name: str,
+                           fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """Return cached nutrition for a food, calling `fetch` once on a miss"""
+        key = normalize_food_name(name)
+        value = await self._lookup(key)
+        if value is None:
+            value = await self._flights.do(key, lambda: self._fetch_and_store(key, fetch))
+        return self._named(value, name)
+
+    async def _fetch_and_store(self, key: str,
+                               fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        self.fetches += 1
+        value = await fetch()
+        if value is not None:
+            self.memory.set(key, value)
+            if self.disk is not None:
+                try:
+                    await self.disk.set(key, value)
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not persist nutrition for {key}: {str(e)}")
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per-tier counters"""
+        return {
+            "memory": self.memory.get_stats(),
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+            "disk_hits": self.disk_hits,
+            "upstream_fetches": self.fetches,
+            "single_flight": self._flights.get_stats(),
+        }
+
+def create_nutrition_cache() -> Optional[NutritionCache]:
+    """Build the nutrition cache from Config, or None if disabled"""
+    if not Config.NUTRITION_CACHE_ENABLED:
+        return None
+    return NutritionCache(
+        max_entries=Config.NUTRITION_CACHE_MAX_ENTRIES,
+        ttl_seconds=Config.NUTRITION_CACHE_TTL,
+        disk_path=Config.NUTRITION_CACHE_PATH or None
+    )
@@ -0,0 +1,271 @@
+"""
+Direct PostgreSQL storage backend for TrackTreat AI
+
+Talks the Postgres wire protocol through an asyncpg connection pool
+instead of going JSON-over-HTTPS through PostgREST. It connects with the
+service role's database credentials, so like the Supabase service key it
+is not subject to row level security; every query filters on user_id.
+"""
+import json
+import time
+import uuid
+import asyncio
+import logging
+from decimal import Decimal
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from db_backends import TIMESTAMP_COLUMNS, DatabaseBackend, checked_columns
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("postgres_backend")
+
+# The tables from supabase/schema.sql without the auth.users references,
+# triggers and RLS policies, for a plain local Postgres (13+) instance
+LOCAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL UNIQUE,
+    weight_kg NUMERIC,
+    height_cm NUMERIC,
+    dob DATE,
+    gender TEXT,
+    activity_level TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS meals (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    image_url TEXT,
+    voice_url TEXT,
+    transcript TEXT,
+    meal_name TEXT,
+    nutrition JSONB,
+    advice TEXT,
+    logged_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_meals_user_date ON meals (user_id, logged_at);
+
+CREATE TABLE IF NOT EXISTS gamification (
+    user_id UUID PRIMARY KEY,
+    badges JSONB DEFAULT '[]'::jsonb,
+    current_level INTEGER DEFAULT 1,
+    xp INTEGER DEFAULT 0,
+    last_updated TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+"""
+
+def to_datetime(value: Any) -> Any:
+    """Parse an ISO date or datetime string; naive values are taken as UTC"""
+    if not isinstance(value, str):
+        return value
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def _encode(column: str, value: Any) -> Any:
+    """Convert a JSON-style value to what asyncpg expects for the column"""
+    if value is None:
+        return None
+    if column in TIMESTAMP_COLUMNS:
+        return to_datetime(value)
+    if column == "dob" and isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+def _decode(value: Any) -> Any:
+    """Convert a Postgres value to the JSON-style value PostgREST would return"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _row(record: Any) -> Optional[Dict[str, Any]]:
+    if record is None:
+        return None
+    return {key: _decode(value) for key, value in record.items()}
+
+def _on_user_conflict(columns: List[str]) -> str:
+    """Upsert clause that overwrites only the given columns"""
+    if not columns:
+        return "ON CONFLICT (user_id) DO NOTHING"
+    return "ON CONFLICT (user_id) DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+
+class PostgresBackend(DatabaseBackend):
+    """
+    asyncpg connection pool. asyncpg prepares every query on first use and
+    keeps up to `statement_cache_size` prepared statements per connection,
+    so the fixed SQL strings below are parsed and planned once.
+    """
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, min_size: int = 2, max_size: int = 10,
+                 statement_cache_size: int = 256, command_timeout: float = 10.0):
+        import asyncpg  # Optional dependency, only needed for this backend
+        self._asyncpg = asyncpg
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.statement_cache_size = statement_cache_size
+        self.command_timeout = command_timeout
+        self._pool = None
+        self._pool_lock: Optional[asyncio.Lock] = None
+
+        # Counters for monitoring
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    @staticmethod
+    async def _init_connection(connection: Any) -> None:
+        # Hand JSONB columns back and forth as Python objects
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(
+                type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+            )
+
+    async def _get_pool(self) -> Any:
+        """Create the pool on first use, from inside the running event loop"""
+        if self._pool is None:
+            if self._pool_lock is None:
+                self._pool_lock = asyncio.Lock()
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await self._asyncpg.create_pool(
+                        self.dsn,
+                        min_size=self.min_size,
+                        max_size=self.max_size,
+                        statement_cache_size=self.statement_cache_size,
+                        command_timeout=self.command_timeout,
+                        init=self._init_connection
+                    )
+                    logger.info(f"Postgres pool ready ({self.min_size}-{self.max_size} connections)")
+        return self._pool
+
+    async def _query(self, method: str, sql: str, *args: Any) -> Any:
+        """Run one pool method (fetch, fetchrow, execute, executemany) and time it"""
+        pool = await self._get_pool()
+        start = time.perf_counter()
+        result = await getattr(pool, method)(sql, *args)
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - start
+        return result
+
+    async def create_schema(self) -> None:
+        """Create the tables on a local Postgres instance that lacks Supabase's schema"""
+        pool = await self._get_pool()
+        async with pool.acquire() as connection:
+            await connection.execute(LOCAL_SCHEMA)
+
+    async def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return _row(await self._query("fetchrow", "SELECT * FROM profiles WHERE user_id = $1", user_id))
+
+    async def update_profile(self, user_id: str, data: Dict[str, Any]) -> None:
+        # Supabase creates the row from an auth.users trigger at signup, but
+        # LOCAL_SCHEMA has no such trigger, so the first update inserts it
+        data = {key: value for key, value in data.items() if key not in ("id", "user_id")}
+        columns = checked_columns("profiles", data)
+        placeholders = "".join(f", ${i}" for i in range(2, len(columns) + 2))
+        await self._query(
+            "execute",
+            f"INSERT INTO profiles (user_id{''.join(', ' + column for column in columns)}) "
+            f"VALUES ($1{placeholders}) {_on_user_conflict(columns)}",
+            user_id, *(_encode(column, data[column]) for column in columns)
+        )
+
+    async def insert_meals(self, meals: List[Dict[str, Any]]) -> None:
+        # Group rows by column set so each group is one prepared statement
+        # executed for every row in a single pipelined round trip
+        groups: Dict[Tuple[str, ...], List[Tuple[Any, ...]]] = {}
+        for meal in meals:
+            columns = tuple(checked_columns("meals", meal))
+            groups.setdefault(columns, []).append(tuple(_encode(c, meal[c]) for c in columns))
+
+        pool = await self._get_pool()
+        start = time.perf_counter()
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                for columns, rows in groups.items():
+                    placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+                    await connection.executemany(
+                        f"INSERT INTO meals ({', '.join(columns)}) VALUES ({placeholders})", rows
+                    )
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - start
+
+    async def select_meals(self, user_id: str, start_date: Optional[str], end_date: Optional[str],
+                           after: Optional[Tuple[str, str]], limit: int,
+                           columns: Optional[List[str]]) -> List[Dict[str, Any]]:
+        if columns:
+            checked_columns("meals", dict.fromkeys(columns))
+        sql = f"SELECT {', '.join(columns) if columns else '*'} FROM meals WHERE user_id = $1"
+        args: List[Any] = [user_id]
+        if start_date:
+            args.append(to_datetime(start_date))
+            sql += f" AND logged_at >= ${len(args)}"
+        if end_date:
+            args.append(to_datetime(end_date))
+            sql += f" AND logged_at <= ${len(args)}"
+        if after:
+            args.extend((to_datetime(after[0]), after[1]))
+            sql += f" AND (logged_at, id) < (${len(args) - 1}, ${len(args)}::uuid)"
+        args.append(limit)
+        sql += f" ORDER BY logged_at DESC, id DESC LIMIT ${len(args)}"
+        return [_row(record) for record in await self._query("fetch", sql, *args)]
+
+    async def update_meal(self, meal_id: str, user_id: str, data: Dict[str, Any]) -> None:
+        data = {key: value for key, value in data.items() if key not in ("id", "user_id")}
+        columns = checked_columns("meals", data)
+        if not columns:
+            return
+        assignments = ", ".join(f"{column} = ${i}" for i, column in enumerate(columns, start=3))
+        await self._query(
+            "execute", f"UPDATE meals SET {assignments} WHERE id = $1 AND user_id = $2",
+            meal_id, user_id, *(_encode(column, data[column]) for column in columns)
+        )
+
+    async def delete_meal(self, meal_id: str, user_id: str) -> None:
+        await self._query("execute", "DELETE FROM meals WHERE id = $1 AND user_id = $2", meal_id, user_id)
+
+    async def get_gamification(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return _row(await self._query("fetchrow", "SELECT * FROM gamification WHERE user_id = $1", user_id))
+
+    async def upsert_gamification(self, user_id: str, data: Dict[str, Any]) -> None:
+        data = {key: value for key, value in data.items() if key != "user_id"}
+        columns = checked_columns("gamification", data)
+        placeholders = "".join(f", ${i}" for i in range(2, len(columns) + 2))
+        await self._query(
+            "execute",
+            f"INSERT INTO gamification (user_id{''.join(', ' + column for column in columns)}) "
+            f"VALUES ($1{placeholders}) {_on_user_conflict(columns)}",
+            user_id, *(_encode(column, data[column]) for column in columns)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return query counters and pool usage"""
+        stats = {
+            **super().get_stats(),
+            "queries": self.queries,
+            "avg_query_ms": self.query_seconds / self.queries * 1000 if self.queries else 0.0,
+            "pool_max_size": self.max_size,
+        }
+        if self._pool is not None:
+            stats["pool_size"] = self._pool.get_size()
+            stats["idle_connections"] = self._pool.get_idle_size()
+        return stats
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
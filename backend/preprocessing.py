@@ -0,0 +1,118 @@
+"""
+Vectorized image preprocessing for TrackTreat AI inference
+"""
+import threading
+import logging
+from typing import Any, List, Optional, Tuple
+import numpy as np
+import torch
+from PIL import Image
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("preprocessing")
+
+class FastImagePreprocessor:
+    """
+    Replaces the generic Hugging Face image processor on the hot path.
+
+    Resize, center-crop, rescale and normalize parameters are read once from
+    the loaded processor config. Each batch is written into a preallocated,
+    per-thread float32 buffer and returned as a tensor that shares its memory.
+    The tensor is only valid until the next call on the same thread.
+    """
+
+    def __init__(self, image_processor: Any, max_batch_size: int = 8):
+        size = image_processor.size or {}
+        self.do_resize = bool(getattr(image_processor, "do_resize", True))
+        self.resample = getattr(image_processor, "resample", Image.Resampling.BILINEAR)
+
+        if "height" in size and "width" in size:
+            self.resize_size: Optional[Tuple[int, int]] = (size["width"], size["height"])
+            self.shortest_edge = None
+        elif "shortest_edge" in size:
+            self.resize_size = None
+            self.shortest_edge = size["shortest_edge"]
+        else:
+            raise ValueError(f"Unsupported image processor size config: {size}")
+
+        crop_size = getattr(image_processor, "crop_size", None) or {}
+        self.do_center_crop = bool(getattr(image_processor, "do_center_crop", False)) and bool(crop_size)
+        if self.do_center_crop:
+            self.output_size = (crop_size["width"], crop_size["height"])
+        elif self.resize_size:
+            self.output_size = self.resize_size
+        else:
+            raise ValueError("Image processor needs a fixed size or a center crop")
+
+        # Fold rescale and normalize into one multiply-add: x * scale - shift
+        rescale = image_processor.rescale_factor if getattr(image_processor, "do_rescale", True) else 1.0
+        if getattr(image_processor, "do_normalize", True):
+            mean = np.asarray(image_processor.image_mean, dtype=np.float32)
+            std = np.asarray(image_processor.image_std, dtype=np.float32)
+        else:
+            mean = np.zeros(3, dtype=np.float32)
+            std = np.ones(3, dtype=np.float32)
+        self.scale = (rescale / std).astype(np.float32).reshape(3, 1, 1)
+        self.shift = (mean / std).astype(np.float32).reshape(3, 1, 1)
+
+        self.max_batch_size = max(1, max_batch_size)
+        self._local = threading.local()
+
+    def _get_buffer(self, batch_size: int) -> np.ndarray:
+        """Return this thread's batch buffer, growing it if needed"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < batch_size:
+            width, height = self.output_size
+            capacity = max(batch_size, self.max_batch_size)
+            buffer = np.empty((capacity, 3, height, width), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer
+
+    def _prepare(self, image: Image.Image) -> Image.Image:
+        """Resize and center-crop a single image to the output size"""
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if self.do_resize:
+            if self.resize_size is not None:
+                if image.size != self.resize_size:
+                    image = image.resize(self.resize_size, self.resample)
+            else:
+                width, height = image.size
+                if width <= height:
+                    new_size = (self.shortest_edge, int(self.shortest_edge * height / width))
+                else:
+                    new_size = (int(self.shortest_edge * width / height), self.shortest_edge)
+                if image.size != new_size:
+                    image = image.resize(new_size, self.resample)
+
+        if self.do_center_crop and image.size != self.output_size:
+            width, height = image.size
+            crop_width, crop_height = self.output_size
+            left = (width - crop_width) // 2
+            top = (height - crop_height) // 2
+            image = image.crop((left, top, left + crop_width, top + crop_height))
+
+        return image
+
+    def __call__(self, images: List[Image.Image]) -> torch.Tensor:
+        """Convert a list of PIL images into a normalized NCHW float tensor"""
+        buffer = self._get_buffer(len(images))
+
+        for index, image in enumerate(images):
+            pixels = np.asarray(self._prepare(image), dtype=np.uint8)
+            target = buffer[index]
+            # HWC uint8 -> CHW float32, scaled and shifted in place
+            np.multiply(pixels.transpose(2, 0, 1), self.scale, out=target)
+            np.subtract(target, self.shift, out=target)
+
+        return torch.from_numpy(buffer[:len(images)])
+
+def build_fast_preprocessor(image_processor: Any, max_batch_size: int) -> Optional[FastImagePreprocessor]:
+    """Create a fast preprocessor, or None if the processor config isn't supported"""
+    try:
+        return FastImagePreprocessor(image_processor, max_batch_size=max_batch_size)
+    except Exception as e:
+        logger.warning(f"Fast preprocessing unavailable, using the Hugging Face processor: {str(e)}")
+        return None
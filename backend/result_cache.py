@@ -0,0 +1,127 @@
+"""
+Content-addressed cache of meal analysis results for TrackTreat AI
+"""
+import copy
+import json
+import asyncio
+import hashlib
+import logging
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+from PIL import Image
+from config import Config
+from cache_utils import TTLCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("result_cache")
+
+def perceptual_hash(image_data: bytes) -> int:
+    """
+    Compute a 64-bit difference hash (dHash) that survives re-encoding,
+    resizing and small compression changes
+    """
+    image = Image.open(BytesIO(image_data))
+    # Let the JPEG decoder produce a tiny image instead of a full bitmap
+    image.draft("L", (64, 64))
+    image = image.convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+    pixels = list(image.getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+def _estimate_size(entry: Dict[str, Any]) -> int:
+    return len(json.dumps(entry["result"], default=str))
+
+class ResultCache:
+    """
+    Caches final `identified_foods` and nutrition results keyed by a hash of
+    the raw image bytes, with an optional perceptual-hash tier that also
+    matches near-identical re-encodes of the same photo
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, max_entries: int,
+                 enable_phash: bool = False, phash_distance: int = 4):
+        self.enable_phash = enable_phash
+        self.phash_distance = phash_distance
+        self._cache = TTLCache(
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds,
+            max_bytes=max_bytes,
+            sizeof=_estimate_size
+        )
+
+        # Counters for monitoring
+        self.exact_hits = 0
+        self.phash_hits = 0
+        self.misses = 0
+
+    async def lookup(self, image_data: bytes) -> Tuple[Optional[Dict[str, Any]], Tuple[str, Optional[int]]]:
+        """
+        Look up a cached result for an image.
+
+        Returns the cached result (or None) and the image fingerprint, which
+        should be passed back to `store` on a miss.
+        """
+        digest = hashlib.sha256(image_data).hexdigest()
+        entry = self._cache.get(digest)
+        if entry is not None:
+            self.exact_hits += 1
+            return copy.deepcopy(entry["result"]), (digest, entry["phash"])
+
+        phash = None
+        if self.enable_phash:
+            try:
+                # Decoding is blocking work; keep it off the event loop
+                loop = asyncio.get_running_loop()
+                phash = await loop.run_in_executor(None, perceptual_hash, image_data)
+            except Exception as e:
+                logger.warning(f"Could not compute perceptual hash: {str(e)}")
+
+            if phash is not None:
+                for _, candidate in self._cache.items():
+                    if candidate["phash"] is None:
+                        continue
+                    if (candidate["phash"] ^ phash).bit_count() <= self.phash_distance:
+                        self.phash_hits += 1
+                        return copy.deepcopy(candidate["result"]), (digest, phash)
+
+        self.misses += 1
+        return None, (digest, phash)
+
+    def store(self, fingerprint: Tuple[str, Optional[int]], result: Dict[str, Any]) -> None:
+        """Cache a result under the fingerprint returned by `lookup`"""
+        digest, phash = fingerprint
+        self._cache.set(digest, {"result": copy.deepcopy(result), "phash": phash})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and cache usage"""
+        lookups = self.exact_hits + self.phash_hits + self.misses
+        stats = self._cache.get_stats()
+        return {
+            "entries": stats["entries"],
+            "bytes": stats["bytes"],
+            "evictions": stats["evictions"],
+            "expirations": stats["expirations"],
+            "exact_hits": self.exact_hits,
+            "phash_hits": self.phash_hits,
+            "misses": self.misses,
+            "hit_rate": ((self.exact_hits + self.phash_hits) / lookups) if lookups else 0.0,
+        }
+
+def create_result_cache() -> Optional[ResultCache]:
+    """Build the result cache from configuration, or None when disabled"""
+    if not Config.RESULT_CACHE_ENABLED:
+        return None
+    return ResultCache(
+        max_bytes=Config.RESULT_CACHE_MAX_BYTES,
+        ttl_seconds=Config.RESULT_CACHE_TTL,
+        max_entries=Config.RESULT_CACHE_MAX_ENTRIES,
+        enable_phash=Config.RESULT_CACHE_PHASH,
+        phash_distance=Config.RESULT_CACHE_PHASH_DISTANCE
+    )
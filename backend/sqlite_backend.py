@@ -0,0 +1,260 @@
+"""
+Embedded SQLite storage backend for TrackTreat AI
+
+Mirrors the tables in supabase/schema.sql so a single node (or a load
+test) can run without the hosted database. The file is opened in WAL mode
+so readers never wait on the writer, and queries run on a small pool of
+connections in worker threads.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from db_backends import JSON_COLUMNS, TIMESTAMP_COLUMNS, DatabaseBackend, checked_columns
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("sqlite_backend")
+
+# Timestamps are stored as UTC ISO-8601 text with a fixed width, so text
+# comparison orders them the same way Postgres orders timestamptz
+NOW_SQL = "(strftime('%Y-%m-%dT%H:%M:%f000Z', 'now'))"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL UNIQUE,
+    weight_kg REAL,
+    height_cm REAL,
+    dob TEXT,
+    gender TEXT,
+    activity_level TEXT,
+    created_at TEXT DEFAULT {NOW_SQL},
+    updated_at TEXT DEFAULT {NOW_SQL}
+);
+
+CREATE TABLE IF NOT EXISTS meals (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    image_url TEXT,
+    voice_url TEXT,
+    transcript TEXT,
+    meal_name TEXT,
+    nutrition TEXT,
+    advice TEXT,
+    logged_at TEXT DEFAULT {NOW_SQL},
+    created_at TEXT DEFAULT {NOW_SQL},
+    updated_at TEXT DEFAULT {NOW_SQL}
+);
+
+-- Same leading columns as idx_meals_user_date in Postgres; id is added so
+-- the (logged_at, id) keyset order is read straight off the index
+CREATE INDEX IF NOT EXISTS idx_meals_user_date ON meals (user_id, logged_at, id);
+
+CREATE TABLE IF NOT EXISTS gamification (
+    user_id TEXT PRIMARY KEY,
+    badges TEXT DEFAULT '[]',
+    current_level INTEGER DEFAULT 1,
+    xp INTEGER DEFAULT 0,
+    last_updated TEXT DEFAULT {NOW_SQL}
+);
+"""
+
+def to_timestamp(value: Any) -> Any:
+    """Normalize an ISO date or datetime to the stored UTC text format"""
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+def _encode(column: str, value: Any) -> Any:
+    if column in JSON_COLUMNS and value is not None:
+        return json.dumps(value)
+    if column in TIMESTAMP_COLUMNS:
+        return to_timestamp(value)
+    return value
+
+def _decode_row(cursor: sqlite3.Cursor, row: Sequence[Any]) -> Dict[str, Any]:
+    result = {}
+    for (column, *_), value in zip(cursor.description, row):
+        if column in JSON_COLUMNS and value is not None:
+            value = json.loads(value)
+        result[column] = value
+    return result
+
+def _on_user_conflict(columns: List[str]) -> str:
+    """Upsert clause that overwrites only the given columns"""
+    if not columns:
+        return "ON CONFLICT (user_id) DO NOTHING"
+    return "ON CONFLICT (user_id) DO UPDATE SET " + ", ".join(f"{column} = excluded.{column}" for column in columns)
+
+class SqliteBackend(DatabaseBackend):
+    """
+    SQLite database in WAL mode, shared by a fixed pool of connections.
+
+    Every query is a fixed SQL string with bound parameters, so each
+    connection's statement cache compiles it once and reuses the prepared
+    statement afterwards.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, pool_size: int = 4, busy_timeout_ms: int = 5000):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.pool_size = max(1, pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="sqlite")
+        self._connections: List[sqlite3.Connection] = []
+        self._idle: Optional[asyncio.Queue] = None
+        for _ in range(self.pool_size):
+            connection = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+            connection.row_factory = _decode_row
+            connection.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._connections.append(connection)
+        self._connections[0].executescript(SCHEMA)
+
+        # Counters for monitoring
+        self.queries = 0
+        self.query_seconds = 0.0
+
+        logger.info(f"SQLite backend at {path} (WAL, pool of {self.pool_size})")
+
+    def _pool(self) -> asyncio.Queue:
+        # Created on first use so it binds to the running event loop
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for connection in self._connections:
+                self._idle.put_nowait(connection)
+        return self._idle
+
+    async def _run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run `fn(connection)` on a pooled connection in a worker thread"""
+        pool = self._pool()
+        connection = await pool.get()
+        try:
+            start = time.perf_counter()
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, fn, connection)
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - start
+            return result
+        finally:
+            pool.put_nowait(connection)
+
+    async def _fetch_one(self, sql: str, params: Sequence[Any]) -> Optional[Dict[str, Any]]:
+        return await self._run(lambda connection: connection.execute(sql, params).fetchone())
+
+    async def _fetch_all(self, sql: str, params: Sequence[Any]) -> List[Dict[str, Any]]:
+        return await self._run(lambda connection: connection.execute(sql, params).fetchall())
+
+    async def _write(self, sql: str, rows: Sequence[Sequence[Any]]) -> int:
+        """Execute `sql` once per parameter row in a single transaction"""
+        def write(connection: sqlite3.Connection) -> int:
+            with connection:
+                return connection.executemany(sql, rows).rowcount
+        return await self._run(write)
+
+    async def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self._fetch_one("SELECT * FROM profiles WHERE user_id = ?", (user_id,))
+
+    async def update_profile(self, user_id: str, data: Dict[str, Any]) -> None:
+        # There is no auth.users trigger here to create the row at signup,
+        # so the first update inserts it
+        data = {key: value for key, value in data.items() if key not in ("id", "user_id")}
+        columns = checked_columns("profiles", data)
+        sql = (
+            f"INSERT INTO profiles (id, user_id{''.join(', ' + column for column in columns)}) "
+            f"VALUES (?, ?{', ?' * len(columns)}) {_on_user_conflict(columns)}"
+        )
+        await self._write(sql, [(str(uuid.uuid4()), user_id, *(_encode(c, data[c]) for c in columns))])
+
+    async def insert_meals(self, meals: List[Dict[str, Any]]) -> None:
+        # Group rows by column set so each group is one prepared statement
+        # executed for every row, like a multi-row insert
+        groups: Dict[Tuple[str, ...], List[Tuple[Any, ...]]] = {}
+        for meal in meals:
+            columns = tuple(checked_columns("meals", meal))
+            groups.setdefault(columns, []).append(tuple(_encode(c, meal[c]) for c in columns))
+
+        def insert(connection: sqlite3.Connection) -> None:
+            with connection:
+                for columns, rows in groups.items():
+                    connection.executemany(
+                        f"INSERT INTO meals ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        rows
+                    )
+        await self._run(insert)
+
+    async def select_meals(self, user_id: str, start_date: Optional[str], end_date: Optional[str],
+                           after: Optional[Tuple[str, str]], limit: int,
+                           columns: Optional[List[str]]) -> List[Dict[str, Any]]:
+        if columns:
+            checked_columns("meals", dict.fromkeys(columns))
+        sql = f"SELECT {', '.join(columns) if columns else '*'} FROM meals WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if start_date:
+            sql += " AND logged_at >= ?"
+            params.append(to_timestamp(start_date))
+        if end_date:
+            sql += " AND logged_at <= ?"
+            params.append(to_timestamp(end_date))
+        if after:
+            sql += " AND (logged_at, id) < (?, ?)"
+            params.extend((to_timestamp(after[0]), after[1]))
+        sql += " ORDER BY logged_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return await self._fetch_all(sql, params)
+
+    async def update_meal(self, meal_id: str, user_id: str, data: Dict[str, Any]) -> None:
+        data = {key: value for key, value in data.items() if key not in ("id", "user_id")}
+        columns = checked_columns("meals", data)
+        if not columns:
+            return
+        sql = f"UPDATE meals SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ? AND user_id = ?"
+        await self._write(sql, [(*(_encode(c, data[c]) for c in columns), meal_id, user_id)])
+
+    async def delete_meal(self, meal_id: str, user_id: str) -> None:
+        await self._write("DELETE FROM meals WHERE id = ? AND user_id = ?", [(meal_id, user_id)])
+
+    async def get_gamification(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self._fetch_one("SELECT * FROM gamification WHERE user_id = ?", (user_id,))
+
+    async def upsert_gamification(self, user_id: str, data: Dict[str, Any]) -> None:
+        data = {key: value for key, value in data.items() if key != "user_id"}
+        columns = checked_columns("gamification", data)
+        sql = (
+            f"INSERT INTO gamification (user_id{''.join(', ' + column for column in columns)}) "
+            f"VALUES (?{', ?' * len(columns)}) {_on_user_conflict(columns)}"
+        )
+        await self._write(sql, [(user_id, *(_encode(c, data[c]) for c in columns))])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return query counters and pool usage"""
+        return {
+            **super().get_stats(),
+            "queries": self.queries,
+            "avg_query_ms": self.query_seconds / self.queries * 1000 if self.queries else 0.0,
+            "pool_size": self.pool_size,
+            "idle_connections": self._idle.qsize() if self._idle is not None else self.pool_size,
+        }
+
+    async def close(self) -> None:
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._executor.shutdown(wait=False)
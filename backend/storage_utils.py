@@ -3,9 +3,9 @@ import logging
 import uuid
 from typing import Optional, Tuple
 from datetime import datetime
-import httpx
 from dotenv import load_dotenv
 import base64
+from http_clients import http_clients
 
 # Load environment variables
 load_dotenv()
@@ -57,17 +57,17 @@ class StorageManager:
                     "Content-Type": "image/jpeg",
                 }
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{SUPABASE_URL}/storage/v1/object/public/{path}",
-                        headers=headers,
-                        content=image_data
-                    )
-                    response.raise_for_status()
-                    
-                    # Get the public URL
-                    data = response.json()
-                    return f"{SUPABASE_URL}/storage/v1/object/public/{path}"
+                client = http_clients.get("supabase_storage")
+                response = await client.post(
+                    f"{SUPABASE_URL}/storage/v1/object/public/{path}",
+                    headers=headers,
+                    content=image_data
+                )
+                response.raise_for_status()
+                
+                # Get the public URL
+                data = response.json()
+                return f"{SUPABASE_URL}/storage/v1/object/public/{path}"
                 
         except Exception as e:
             logger.error(f"Error uploading image: {str(e)}")
@@ -97,16 +97,16 @@ class StorageManager:
                     "Content-Type": "audio/wav",
                 }
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{SUPABASE_URL}/storage/v1/object/public/{path}",
-                        headers=headers,
-                        content=audio_data
-                    )
-                    response.raise_for_status()
-                    
-                    # Get the public URL
-                    return f"{SUPABASE_URL}/storage/v1/object/public/{path}"
+                client = http_clients.get("supabase_storage")
+                response = await client.post(
+                    f"{SUPABASE_URL}/storage/v1/object/public/{path}",
+                    headers=headers,
+                    content=audio_data
+                )
+                response.raise_for_status()
+                
+                # Get the public URL
+                return f"{SUPABASE_URL}/storage/v1/object/public/{path}"
                 
         except Exception as e:
             logger.error(f"Error uploading audio: {str(e)}")
@@ -138,13 +138,13 @@ class StorageManager:
                     "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
                 }
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.delete(
-                        f"{SUPABASE_URL}/storage/v1/object/{file_path}",
-                        headers=headers
-                    )
-                    response.raise_for_status()
-                    return True
+                client = http_clients.get("supabase_storage")
+                response = await client.delete(
+                    f"{SUPABASE_URL}/storage/v1/object/{file_path}",
+                    headers=headers
+                )
+                response.raise_for_status()
+                return True
                 
         except Exception as e:
             logger.error(f"Error deleting file: {str(e)}")
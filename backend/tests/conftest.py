@@ -0,0 +1,23 @@
+import os
+import sys
+import time
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt
+from config import Config
+
+JWT_SECRET = "test-jwt-secret"
+
+@pytest.fixture
+def auth_headers(monkeypatch):
+    """Configure a JWT secret and return a factory of bearer headers for a user"""
+    monkeypatch.setattr(Config, "SUPABASE_JWT_SECRET", JWT_SECRET)
+
+    def make(user_id, secret=JWT_SECRET, audience="authenticated", expires_in=3600):
+        claims = {"sub": user_id, "aud": audience, "exp": int(time.time()) + expires_in}
+        return {"Authorization": f"Bearer {jwt.encode(claims, secret, algorithm='HS256')}"}
+
+    return make
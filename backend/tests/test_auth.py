@@ -0,0 +1,50 @@
+import uuid
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import main
+from config import Config
+from db_connector import DatabaseConnector
+from sqlite_backend import SqliteBackend
+
+@pytest.fixture
+def users(tmp_path, monkeypatch):
+    db = DatabaseConnector(SqliteBackend(str(tmp_path / "tracktreat.sqlite3"), pool_size=1))
+    monkeypatch.setattr(main, "db", db)
+    alice, bob = str(uuid.uuid4()), str(uuid.uuid4())
+    asyncio.run(db.create_meals([
+        {"user_id": alice, "meal_name": "Alice's lunch"},
+        {"user_id": bob, "meal_name": "Bob's lunch"},
+    ]))
+    yield alice, bob
+    asyncio.run(db.close())
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+def test_meals_need_a_token(client, users, auth_headers):
+    response = client.get("/meals/")
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+
+@pytest.mark.parametrize("kwargs", [
+    {"secret": "someone-elses-secret"},
+    {"audience": "anon"},
+    {"expires_in": -60},
+])
+def test_invalid_tokens_are_rejected(client, users, auth_headers, kwargs):
+    alice, _ = users
+    assert client.get("/meals/", headers=auth_headers(alice, **kwargs)).status_code == 401
+
+def test_meals_belong_to_the_token_user(client, users, auth_headers):
+    alice, bob = users
+    response = client.get("/meals/", params={"user_id": bob}, headers=auth_headers(alice))
+    assert response.status_code == 200
+    assert [meal["meal_name"] for meal in response.json()] == ["Alice's lunch"]
+
+def test_user_routes_fail_closed_without_a_secret(client, users, auth_headers, monkeypatch):
+    alice, _ = users
+    headers = auth_headers(alice)
+    monkeypatch.setattr(Config, "SUPABASE_JWT_SECRET", "")
+    assert client.get("/meals/", headers=headers).status_code == 503
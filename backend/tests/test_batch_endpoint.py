@@ -0,0 +1,54 @@
+"""
+/analyze-meal/batch: the image count limit, upload validation, and
+results returned in upload order
+"""
+from io import BytesIO
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+import main
+from config import Config
+
+def _jpeg(color):
+    buffer = BytesIO()
+    Image.new("RGB", (32, 32), color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(Config, "MAX_BATCH_IMAGES", 2)
+    batches = []
+
+    async def process_meal_batch(images_data, user_profile):
+        batches.append(images_data)
+        return [{"image": index} for index in range(len(images_data))]
+
+    monkeypatch.setattr(main.ai_orchestrator, "process_meal_batch", process_meal_batch)
+    client = TestClient(main.app)
+    client.batches = batches
+    return client
+
+def _post(client, images):
+    files = [("files", (f"meal{index}.jpg", data, "image/jpeg")) for index, data in enumerate(images)]
+    return client.post("/analyze-meal/batch", files=files, data={"profile": "{}"})
+
+def test_images_are_analyzed_in_one_batch(client):
+    images = [_jpeg((200, 40, 40)), _jpeg((40, 200, 40))]
+    response = _post(client, images)
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [{"image": 0}, {"image": 1}]
+    assert client.batches == [images]
+
+def test_too_many_images_are_rejected(client):
+    response = _post(client, [_jpeg((200, 40, 40))] * 3)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Too many images (max 2)"
+    assert client.batches == []
+
+def test_non_image_upload_is_rejected(client):
+    response = _post(client, [_jpeg((200, 40, 40)), b"definitely not an image"])
+
+    assert response.status_code == 415
+    assert client.batches == []
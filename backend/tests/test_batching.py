@@ -0,0 +1,97 @@
+"""
+MicroBatcher: concurrent submissions share one batch call, results go back
+to the right callers, and callers that gave up are left out of the batch
+"""
+import asyncio
+import pytest
+from batching import MicroBatcher
+
+def _recording_batcher(**kwargs):
+    calls = []
+
+    async def double(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    return MicroBatcher(double, **kwargs), calls
+
+def test_concurrent_submissions_share_a_batch():
+    batcher, calls = _recording_batcher(max_batch_size=8, window_ms=20)
+
+    async def scenario():
+        results = await asyncio.gather(*(batcher.submit(item) for item in range(5)))
+        await batcher.close()
+        return results
+
+    assert asyncio.run(scenario()) == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+    assert batcher.get_stats()["avg_batch_size"] == 5
+
+def test_batches_are_capped_at_max_batch_size():
+    batcher, calls = _recording_batcher(max_batch_size=3, window_ms=20)
+
+    async def scenario():
+        results = await batcher.submit_many(list(range(7)))
+        await batcher.close()
+        return results
+
+    assert asyncio.run(scenario()) == [0, 2, 4, 6, 8, 10, 12]
+    assert [len(batch) for batch in calls] == [3, 3, 1]
+
+def test_cancelled_callers_are_skipped():
+    release = None
+    calls = []
+
+    async def slow_double(items):
+        calls.append(list(items))
+        await release.wait()
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(slow_double, max_batch_size=8, window_ms=5, max_concurrency=1)
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        # The first batch holds the only dispatch slot while the rest queue up
+        first = asyncio.ensure_future(batcher.submit(1))
+        await asyncio.sleep(0.02)
+        gave_up = asyncio.ensure_future(batcher.submit(2))
+        kept = asyncio.ensure_future(batcher.submit(3))
+        await asyncio.sleep(0.01)
+        gave_up.cancel()
+        release.set()
+        results = await asyncio.gather(first, kept)
+        await batcher.close()
+        return results
+
+    assert asyncio.run(scenario()) == [2, 6]
+    assert calls == [[1], [3]]
+
+def test_batch_failure_reaches_every_caller():
+    async def broken(items):
+        raise RuntimeError("inference failed")
+
+    batcher = MicroBatcher(broken, max_batch_size=4, window_ms=5)
+
+    async def scenario():
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        await batcher.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_result_count_mismatch_is_an_error():
+    async def short(items):
+        return items[:-1]
+
+    batcher = MicroBatcher(short, max_batch_size=4, window_ms=5)
+
+    async def scenario():
+        try:
+            with pytest.raises(RuntimeError, match="returned 1 results for 2 items"):
+                await batcher.submit_many([1, 2])
+        finally:
+            await batcher.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,176 @@
+import types
+import asyncio
+import pytest
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Only the breaker's clock; the event loop keeps the real one
+    monkeypatch.setattr(circuit_breaker, "time", types.SimpleNamespace(monotonic=clock))
+    return clock
+
+def _breaker():
+    return CircuitBreaker("test", window_size=4, min_calls=4, failure_threshold=0.5,
+                          slow_call_seconds=3.0, open_seconds=30.0)
+
+async def _ok():
+    return "ok"
+
+async def _fail():
+    raise RuntimeError("upstream error")
+
+def _call(breaker, fn):
+    return asyncio.run(breaker.call(fn))
+
+def _trip(breaker):
+    for _ in range(4):
+        with pytest.raises(RuntimeError):
+            _call(breaker, _fail)
+    assert breaker.state == OPEN
+
+def test_opens_after_enough_failures(clock):
+    breaker = _breaker()
+    _call(breaker, _ok)
+    _call(breaker, _ok)
+    with pytest.raises(RuntimeError):
+        _call(breaker, _fail)
+    assert breaker.state == CLOSED
+    with pytest.raises(RuntimeError):
+        _call(breaker, _fail)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        _call(breaker, _ok)
+    assert breaker.rejected == 1
+
+def test_half_open_probe_closes_or_reopens(clock):
+    breaker = _breaker()
+    _trip(breaker)
+
+    clock.now += 30.0
+    with pytest.raises(RuntimeError):
+        _call(breaker, _fail)
+    assert breaker.state == OPEN
+
+    clock.now += 30.0
+    assert _call(breaker, _ok) == "ok"
+    assert breaker.state == CLOSED
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    clock.now += 30.0
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+def test_stale_call_does_not_close_half_open_circuit(clock):
+    breaker = _breaker()
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def stale():
+            await release.wait()
+            return "stale"
+
+        # Started while closed, finishes after the circuit has gone half-open
+        stale_task = asyncio.ensure_future(breaker.call(stale))
+        await asyncio.sleep(0)
+        for _ in range(4):
+            with pytest.raises(RuntimeError):
+                await breaker.call(_fail)
+        clock.now += 30.0
+        assert breaker.allow()
+        release.set()
+        assert await stale_task == "stale"
+
+    asyncio.run(scenario())
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        _call(breaker, _ok)
+
+def test_cancelled_slow_call_counts_as_failure(clock):
+    breaker = _breaker()
+
+    async def hung():
+        clock.now += 10.0
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        for _ in range(4):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(breaker.call(hung), timeout=0.01)
+
+    asyncio.run(scenario())
+    assert breaker.state == OPEN
+
+def test_cancelled_fast_call_is_not_counted(clock):
+    breaker = _breaker()
+
+    async def scenario():
+        for _ in range(4):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(breaker.call(lambda: asyncio.sleep(3600)), timeout=0.01)
+
+    asyncio.run(scenario())
+    assert breaker.state == CLOSED
+    assert breaker.failure_rate() == 0.0
+
+def _hedger():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(True, 0.001)
+    return circuit_breaker.Hedger(breaker, percentile=95, min_delay_ms=0)
+
+def test_hedger_prefers_success_finishing_in_same_wakeup():
+    hedger = _hedger()
+
+    async def scenario():
+        release = asyncio.Event()
+        attempts = []
+
+        async def fn():
+            attempt = len(attempts)
+            attempts.append(attempt)
+            await release.wait()
+            if attempt == 0:
+                raise RuntimeError("first attempt failed")
+            return "hedged"
+
+        call = asyncio.ensure_future(hedger.call(fn))
+        while len(attempts) < 2:
+            await asyncio.sleep(0.001)
+        release.set()
+        return await call
+
+    # Which of the two finished tasks is looked at first varies between runs
+    for _ in range(20):
+        assert asyncio.run(scenario()) == "hedged"
+
+def test_hedger_raises_when_both_attempts_fail():
+    hedger = _hedger()
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def fn():
+            await release.wait()
+            raise RuntimeError("upstream error")
+
+        call = asyncio.ensure_future(hedger.call(fn))
+        await asyncio.sleep(0.01)
+        release.set()
+        return await call
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
@@ -0,0 +1,50 @@
+"""
+decode_image: large JPEGs are downscaled in the decoder and come out at
+the model input size; without a fixed input size they are only capped
+"""
+from io import BytesIO
+import pytest
+from PIL import Image, JpegImagePlugin
+from transformers import ViTImageProcessor
+import ai_orchestrator
+from config import Config
+
+def _encode(size, image_format="JPEG", mode="RGB"):
+    buffer = BytesIO()
+    Image.new(mode, size, 128).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+@pytest.fixture
+def fixed_input(monkeypatch):
+    monkeypatch.setattr(ai_orchestrator, "image_processor", ViTImageProcessor(size={"height": 224, "width": 224}))
+
+def test_large_jpeg_is_drafted_down_to_the_input_size(fixed_input, monkeypatch):
+    drafts = []
+    draft = JpegImagePlugin.JpegImageFile.draft
+
+    def recording_draft(image, mode, size):
+        result = draft(image, mode, size)
+        drafts.append(image.size)
+        return result
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", recording_draft)
+    image = ai_orchestrator.decode_image(_encode((4000, 3000)))
+
+    assert image.size == (224, 224) and image.mode == "RGB"
+    # The DCT-domain reduction stays at or above the target size
+    assert drafts == [(500, 375)]
+
+@pytest.mark.parametrize("image_format, mode", [("PNG", "RGBA"), ("PNG", "L"), ("GIF", "P")])
+def test_other_formats_are_converted_and_resized(fixed_input, image_format, mode):
+    image = ai_orchestrator.decode_image(_encode((640, 480), image_format, mode))
+    assert image.size == (224, 224) and image.mode == "RGB"
+
+def test_unknown_input_size_only_caps_the_dimensions(monkeypatch):
+    monkeypatch.setattr(ai_orchestrator, "image_processor", None)
+    monkeypatch.setattr(Config, "MAX_IMAGE_DIMENSION", 800)
+
+    large = ai_orchestrator.decode_image(_encode((4000, 3000)))
+    small = ai_orchestrator.decode_image(_encode((600, 400)))
+
+    assert max(large.size) <= 800 and large.size[0] / large.size[1] == pytest.approx(4 / 3, rel=0.01)
+    assert small.size == (600, 400)
@@ -0,0 +1,99 @@
+"""
+Offline FDC store: the CSV import keeps the preferred nutrient sources,
+and search prefers full matches and generic foods over branded products
+"""
+import csv
+import asyncio
+import pytest
+import import_fdc
+from config import Config
+from ai_orchestrator import AIOrchestrator
+from fdc_store import FdcStore, open_fdc_store
+
+NUTRIENTS = [
+    (1008, "Energy", "KCAL"), (2047, "Energy (Atwater General Factors)", "KCAL"),
+    (1003, "Protein", "G"), (1005, "Carbohydrate, by difference", "G"),
+    (1004, "Total lipid (fat)", "G"), (1079, "Fiber, total dietary", "G"),
+    (2000, "Sugars, Total", "G"), (1093, "Sodium, Na", "MG"), (1087, "Calcium, Ca", "MG"),
+]
+
+FOODS = [
+    (1, "Potatoes, french fried, frozen, oven-heated", "sr_legacy_food"),
+    (2, "Pizza, cheese topping, regular crust", "survey_fndds_food"),
+    (3, "CRISPY FRENCH FRIES", "branded_food"),
+    (4, "Apples, raw, with skin", "foundation_food"),
+    (5, "Water, tap", "sr_legacy_food"),
+]
+
+FOOD_NUTRIENTS = [
+    (1, 2047, 150), (1, 1008, 172), (1, 1003, 2.7), (1, 1005, 27), (1, 1004, 6.8), (1, 1093, 270),
+    (2, 1008, 266), (2, 1003, 11.4), (2, 1004, 10.4), (2, 1087, 190),
+    (3, 1008, 310), (3, 1004, 15),
+    (4, 2047, 61), (4, 2000, 10.4),
+]
+
+def _write(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def _import(tmp_path, data_types):
+    source = tmp_path / "csv"
+    source.mkdir()
+    _write(source / "nutrient.csv", ["id", "name", "unit_name"], NUTRIENTS)
+    _write(source / "food.csv", ["fdc_id", "description", "data_type"], FOODS)
+    _write(source / "food_nutrient.csv", ["id", "fdc_id", "nutrient_id", "amount"],
+           [(index, *row) for index, row in enumerate(FOOD_NUTRIENTS)])
+
+    foods = import_fdc.load_foods(str(source), data_types)
+    values = import_fdc.load_nutrients(str(source), foods, import_fdc.load_nutrient_ids(str(source)))
+    path = str(tmp_path / "fdc.sqlite3")
+    import_fdc.write_store(path, foods, values)
+    return path
+
+@pytest.fixture
+def store(tmp_path):
+    return FdcStore(_import(tmp_path, set(import_fdc.DEFAULT_DATA_TYPES) | {"branded_food"}))
+
+def test_foods_without_nutrients_are_left_out(store):
+    assert store.food_count == 4
+    assert store.search("water") is None
+
+def test_generic_food_and_preferred_nutrient_source_win(store):
+    # Not the branded "CRISPY FRENCH FRIES", and Energy over the Atwater value
+    fries = store.search("french_fries")
+    assert fries == {"name": "french_fries", "calories": 172, "protein": 2.7, "carbs": 27,
+                     "fat": 6.8, "fiber": 0, "sugar": 0, "sodium": 270}
+    # Only the Atwater energy was reported
+    assert store.search("apple")["calories"] == 61
+
+def test_any_word_match_is_the_fallback(store):
+    assert store.search("pizza_margherita")["calories"] == 266
+    assert store.search("sushi") is None
+    assert store.search("___") is None
+
+def test_default_import_skips_branded_foods(tmp_path):
+    store = FdcStore(_import(tmp_path, set(import_fdc.DEFAULT_DATA_TYPES)))
+    assert store.food_count == 3
+
+def test_missing_store_is_not_opened(tmp_path):
+    assert open_fdc_store(str(tmp_path / "missing.sqlite3")) is None
+
+def test_orchestrator_uses_the_store_before_usda(store, monkeypatch):
+    monkeypatch.setattr(Config, "FDC_DB_PATH", store.path)
+    monkeypatch.setattr(Config, "USDA_API_FALLBACK", False)
+    monkeypatch.setattr(Config, "NUTRITION_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "RESULT_CACHE_ENABLED", False)
+    orchestrator = AIOrchestrator()
+
+    async def fetch_usda_nutrition(client, food):
+        raise AssertionError("USDA must not be called")
+
+    monkeypatch.setattr(orchestrator, "fetch_usda_nutrition", fetch_usda_nutrition)
+
+    async def lookup(name):
+        return await orchestrator.lookup_food_nutrition(None, {"name": name})
+
+    assert asyncio.run(lookup("pizza"))["calories"] == 266
+    assert asyncio.run(lookup("sushi")) is None
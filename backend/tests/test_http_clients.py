@@ -0,0 +1,63 @@
+"""
+HttpClientRegistry: one pooled client per upstream whose connections are
+reused across requests, recreated after it is closed
+"""
+import asyncio
+import httpx
+from http_clients import HttpClientRegistry
+
+async def _keep_alive_server(connections):
+    async def answer(reader, writer):
+        connections.append(writer)
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    return await asyncio.start_server(answer, "127.0.0.1", 0)
+
+def _registry():
+    registry = HttpClientRegistry()
+    registry.register("upstream", timeout=httpx.Timeout(5.0), max_connections=4,
+                      max_keepalive_connections=2, keepalive_expiry=30.0)
+    return registry
+
+def test_requests_reuse_one_pooled_connection():
+    registry = _registry()
+    connections = []
+
+    async def scenario():
+        server = await _keep_alive_server(connections)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+        try:
+            client = registry.get("upstream")
+            assert registry.get("upstream") is client
+            for _ in range(3):
+                assert (await client.get(url)).text == "ok"
+            return registry.get_stats()["upstream"]
+        finally:
+            await registry.aclose()
+            server.close()
+            await server.wait_closed()
+
+    stats = asyncio.run(scenario())
+    assert len(connections) == 1
+    assert (stats["requests"], stats["open"], stats["idle"], stats["active"]) == (3, 1, 1, 0)
+    assert stats["max_connections"] == 4 and stats["utilization"] == 0.0
+
+def test_closed_client_is_recreated():
+    registry = _registry()
+
+    async def scenario():
+        client = registry.get("upstream")
+        await registry.aclose()
+        assert client.is_closed
+        replacement = registry.get("upstream")
+        assert replacement is not client and not replacement.is_closed
+        await registry.aclose()
+
+    asyncio.run(scenario())
+    assert registry.get_stats()["upstream"]["open"] == 0
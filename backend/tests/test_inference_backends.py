@@ -0,0 +1,18 @@
+import inference_backends
+from config import Config
+from inference_backends import artifact_path, export_model
+
+def test_quantized_onnx_export_uses_the_given_model(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "MODEL_CACHE_DIR", str(tmp_path))
+    exported, quantized = [], []
+    monkeypatch.setattr(inference_backends, "export_onnx", lambda model, path: exported.append(path) or path)
+    monkeypatch.setattr(inference_backends, "quantize_onnx",
+                        lambda float_path, path: quantized.append((float_path, path)) or path)
+
+    path = export_model("onnx", object(), quantized=True, model_name="acme/small-food")
+
+    float_path = artifact_path("onnx", model_name="acme/small-food")
+    assert path == artifact_path("onnx", model_name="acme/small-food", quantized=True)
+    assert exported == [float_path]
+    assert quantized == [(float_path, path)]
+    assert float_path != artifact_path("onnx")
@@ -0,0 +1,28 @@
+"""
+A dead inference worker fails its own call and is replaced, instead of
+breaking every later call
+"""
+import os
+import asyncio
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from inference_pool import InferencePool
+
+def _die():
+    os._exit(1)
+
+def test_dead_worker_is_replaced():
+    pool = InferencePool(1)
+    try:
+        pool.start()
+        first_pid = pool.get_stats()["pids"][0]
+
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(pool.run(_die))
+        pid = asyncio.run(pool.run(os.getpid))
+
+        assert pid != first_pid
+        stats = pool.get_stats()
+        assert stats["restarts"] == 1 and stats["in_flight"] == [0]
+    finally:
+        pool.shutdown()
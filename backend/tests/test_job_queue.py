@@ -0,0 +1,14 @@
+"""
+Meal jobs live in one process's memory, so startup refuses more than one
+server process
+"""
+import asyncio
+import pytest
+import main
+from config import Config
+
+def test_multiple_server_processes_are_refused(monkeypatch):
+    monkeypatch.setattr(Config, "WEB_CONCURRENCY", 2)
+    with pytest.raises(RuntimeError, match="WEB_CONCURRENCY"):
+        asyncio.run(main.start_job_workers())
+    assert main.meal_jobs.get_stats()["queued"] == 0 and not main.meal_jobs._workers
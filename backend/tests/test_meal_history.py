@@ -0,0 +1,60 @@
+"""GET /meals/ must never report a partial history as a complete one"""
+import uuid
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import main
+from config import Config
+from db_connector import DatabaseConnector
+from sqlite_backend import SqliteBackend
+
+USER = str(uuid.uuid4())
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "MEALS_PAGE_SIZE", 2)
+    db = DatabaseConnector(SqliteBackend(str(tmp_path / "tracktreat.sqlite3"), pool_size=1))
+    monkeypatch.setattr(main, "db", db)
+    asyncio.run(db.create_meals([
+        {"user_id": USER, "meal_name": f"Meal {day}", "logged_at": f"2024-03-{day:02d}T12:00:00Z"}
+        for day in range(1, 6)
+    ]))
+    yield db
+    asyncio.run(db.close())
+
+def _fail_after(db, monkeypatch, pages):
+    select_meals = db.backend.select_meals
+    calls = []
+
+    async def flaky_select_meals(*args, **kwargs):
+        calls.append(args)
+        if len(calls) > pages:
+            raise RuntimeError("database went away")
+        return await select_meals(*args, **kwargs)
+
+    monkeypatch.setattr(db.backend, "select_meals", flaky_select_meals)
+
+def test_streams_every_page(db, auth_headers):
+    response = TestClient(main.app).get("/meals/", headers=auth_headers(USER))
+    assert response.status_code == 200
+    assert [meal["meal_name"] for meal in response.json()] == [f"Meal {day}" for day in range(5, 0, -1)]
+
+def test_first_page_failure_is_a_502(db, auth_headers, monkeypatch):
+    _fail_after(db, monkeypatch, pages=0)
+    client = TestClient(main.app)
+    assert client.get("/meals/", headers=auth_headers(USER)).status_code == 502
+    assert client.get("/meals/", params={"limit": 2}, headers=auth_headers(USER)).status_code == 502
+
+def test_later_page_failure_aborts_the_stream(db, auth_headers, monkeypatch):
+    _fail_after(db, monkeypatch, pages=1)
+    with pytest.raises(RuntimeError):
+        TestClient(main.app).get("/meals/", headers=auth_headers(USER))
+
+@pytest.mark.parametrize("params", [
+    {"cursor": "bm90IGEgY3Vyc29y"},
+    {"start_date": "yesterday"},
+    {"end_date": '2024-03-01",user_id.neq."x'},
+])
+def test_bad_paging_input_is_a_400(db, auth_headers, params):
+    response = TestClient(main.app).get("/meals/", params=params, headers=auth_headers(USER))
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+"""
+process_meal_stream must fall back, time out and fail the same way
+process_meal does, and always finish the stream with done or error
+"""
+import asyncio
+import pytest
+from config import Config
+from ai_orchestrator import AIOrchestrator
+
+IMAGE = b"not really a jpeg"
+
+@pytest.fixture
+def orchestrator(monkeypatch):
+    monkeypatch.setattr(Config, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "NUTRITION_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "FDC_DB_PATH", "")
+    orchestrator = AIOrchestrator()
+    lookups = []
+
+    async def lookup_food_nutrition(client, food):
+        lookups.append(food["name"])
+        return {"name": food["name"], "calories": 200, "protein": 10, "carbs": 20,
+                "fat": 8, "fiber": 1, "sugar": 2, "sodium": 100}
+
+    async def generate_advice_fast(nutrition_data, user_profile):
+        return "Eat more vegetables"
+
+    monkeypatch.setattr(orchestrator, "lookup_food_nutrition", lookup_food_nutrition)
+    monkeypatch.setattr(orchestrator, "generate_advice_fast", generate_advice_fast)
+    orchestrator.lookups = lookups
+    return orchestrator
+
+def _stream(orchestrator, transcript=None):
+    async def collect():
+        return [event async for event in orchestrator.process_meal_stream(IMAGE, None, transcript, {})]
+    return asyncio.run(collect())
+
+def test_identification_timeout_uses_fallback_nutrition(orchestrator, monkeypatch):
+    async def identify_food_items(image_data):
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(orchestrator, "identify_food_items", identify_food_items)
+    events = dict(_stream(orchestrator))
+
+    assert events["identified_foods"] == orchestrator.get_fallback_foods()
+    assert events["nutrition"] == orchestrator.get_fallback_nutrition()
+    assert orchestrator.lookups == []
+    assert "done" in events
+
+def test_identification_error_ends_with_error_event(orchestrator, monkeypatch):
+    async def identify_food_items(image_data):
+        raise RuntimeError("model crashed")
+
+    monkeypatch.setattr(orchestrator, "identify_food_items", identify_food_items)
+    events = _stream(orchestrator)
+
+    assert events == [("error", {"detail": "model crashed"})]
+
+def test_overall_timeout_finishes_with_fallback(orchestrator, monkeypatch):
+    async def identify_food_items(image_data):
+        return [{"name": "pizza", "confidence": 0.9, "portion_size": "medium", "weight_grams": 200}]
+
+    async def generate_advice_fast(nutrition_data, user_profile):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(orchestrator, "PROCESSING_TIMEOUT", 0.2)
+    monkeypatch.setattr(orchestrator, "identify_food_items", identify_food_items)
+    monkeypatch.setattr(orchestrator, "generate_advice_fast", generate_advice_fast)
+    events = _stream(orchestrator, transcript="pizza for lunch")
+
+    names = [name for name, _ in events]
+    assert names == ["identified_foods", "nutrition_item", "nutrition", "transcript", "advice", "done"]
+    assert dict(events)["advice"].startswith("Unable to analyze meal within time limit")
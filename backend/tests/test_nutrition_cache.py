@@ -0,0 +1,90 @@
+"""
+Nutrition cache: one upstream fetch per food however many requests miss
+at once, nothing cached for failed lookups, and a disk tier that outlives
+the process. The startup prewarm must not trip the USDA breaker.
+"""
+import types
+import asyncio
+import ai_orchestrator as orchestrator_module
+from config import Config
+from circuit_breaker import CircuitBreaker
+from nutrition_cache import NutritionCache
+
+PIZZA = {"name": "pizza", "calories": 285, "protein": 12, "carbs": 36,
+         "fat": 10, "fiber": 2, "sugar": 4, "sodium": 640}
+
+def test_concurrent_misses_share_one_fetch():
+    cache = NutritionCache(max_entries=10, ttl_seconds=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return dict(PIZZA)
+
+    async def scenario():
+        # Different spellings of one food share the key, and the flight
+        return await asyncio.gather(*(
+            cache.get_or_fetch(name, fetch) for name in ("pizza", "Pizza", "PIZZA", "pizza")
+        ))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [result["name"] for result in results] == ["pizza", "Pizza", "PIZZA", "pizza"]
+    assert cache.get_stats()["upstream_fetches"] == 1
+
+def test_failed_lookups_are_not_cached():
+    cache = NutritionCache(max_entries=10, ttl_seconds=60)
+    results = [None, dict(PIZZA)]
+
+    async def fetch():
+        return results.pop(0)
+
+    async def scenario():
+        assert await cache.get_or_fetch("pizza", fetch) is None
+        assert await cache.get_cached("pizza") is None
+        assert (await cache.get_or_fetch("pizza", fetch))["calories"] == 285
+        return await cache.get_cached("pizza")
+
+    assert asyncio.run(scenario())["calories"] == 285
+    assert cache.get_stats()["upstream_fetches"] == 2
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "nutrition.sqlite3")
+
+    async def fetch():
+        return dict(PIZZA)
+
+    async def unreachable():
+        raise AssertionError("should have been served from disk")
+
+    first = NutritionCache(max_entries=10, ttl_seconds=60, disk_path=path)
+    asyncio.run(first.get_or_fetch("French_Fries", fetch))
+
+    second = NutritionCache(max_entries=10, ttl_seconds=60, disk_path=path)
+    result = asyncio.run(second.get_or_fetch("french fries", unreachable))
+    assert result["name"] == "french fries" and result["calories"] == 285
+    assert second.get_stats()["disk_hits"] == 1
+
+def test_prewarm_failures_do_not_open_the_usda_breaker(monkeypatch):
+    monkeypatch.setattr(Config, "NUTRITION_CACHE_ENABLED", True)
+    monkeypatch.setattr(Config, "NUTRITION_CACHE_PATH", "")
+    monkeypatch.setattr(Config, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "FDC_DB_PATH", "")
+    breaker = CircuitBreaker("usda", window_size=10, min_calls=2, failure_threshold=0.5)
+    labels = {index: f"food {index}" for index in range(20)}
+    monkeypatch.setattr(orchestrator_module, "usda_breaker", breaker)
+    monkeypatch.setattr(orchestrator_module, "usda_hedger", None)
+    monkeypatch.setattr(orchestrator_module, "model", types.SimpleNamespace(
+        config=types.SimpleNamespace(id2label=labels)
+    ))
+    orchestrator = orchestrator_module.AIOrchestrator()
+
+    async def fetch_usda_nutrition(client, food):
+        raise RuntimeError("USDA is down")
+
+    monkeypatch.setattr(orchestrator, "fetch_usda_nutrition", fetch_usda_nutrition)
+    assert asyncio.run(orchestrator.prewarm_nutrition_cache()) == len(labels)
+
+    assert breaker.state == "closed" and breaker.get_stats()["window_calls"] == 0
+    assert orchestrator.nutrition_cache.get_stats()["upstream_fetches"] == len(labels)
@@ -0,0 +1,49 @@
+"""
+FastImagePreprocessor must produce the same tensors as the Hugging Face
+image processor it replaces
+"""
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from transformers import MobileNetV2ImageProcessor, ViTImageProcessor
+from preprocessing import FastImagePreprocessor, build_fast_preprocessor
+
+PROCESSORS = {
+    "fixed size": lambda: ViTImageProcessor(size={"height": 224, "width": 224}),
+    "shortest edge and crop": lambda: MobileNetV2ImageProcessor(
+        size={"shortest_edge": 256}, crop_size={"height": 224, "width": 224}
+    ),
+}
+
+def _photo(seed, size):
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+@pytest.mark.parametrize("name", PROCESSORS)
+def test_matches_the_hugging_face_processor(name):
+    processor = PROCESSORS[name]()
+    images = [_photo(0, (400, 300)), _photo(1, (300, 500)), _photo(2, (224, 224))]
+
+    expected = processor(images=images, return_tensors="pt")["pixel_values"]
+    actual = FastImagePreprocessor(processor, max_batch_size=2)(images)
+
+    assert actual.shape == expected.shape and actual.dtype == torch.float32
+    assert torch.allclose(actual, expected, atol=1e-5)
+
+def test_grayscale_images_are_converted():
+    processor = PROCESSORS["fixed size"]()
+    image = _photo(0, (320, 240))
+    gray = FastImagePreprocessor(processor)([image.convert("L")])
+    expected = processor(images=[image.convert("L").convert("RGB")], return_tensors="pt")["pixel_values"]
+    assert torch.allclose(gray, expected, atol=1e-5)
+
+def test_batch_buffer_is_reused():
+    preprocessor = FastImagePreprocessor(PROCESSORS["fixed size"](), max_batch_size=4)
+    first = preprocessor([_photo(0, (224, 224))] * 3)
+    second = preprocessor([_photo(1, (224, 224))])
+    assert first.data_ptr() == second.data_ptr()
+
+def test_unsupported_config_falls_back_to_the_processor():
+    processor = MobileNetV2ImageProcessor(size={"shortest_edge": 256}, do_center_crop=False)
+    assert build_fast_preprocessor(processor, max_batch_size=4) is None
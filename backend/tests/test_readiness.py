@@ -0,0 +1,53 @@
+"""
+Model warm-up covers every batch size, and /health/ready stays 503 until
+the model is loaded and warmed up
+"""
+import pytest
+from fastapi.testclient import TestClient
+import ai_orchestrator
+import main
+from config import Config
+
+@pytest.fixture
+def warmed_sizes(monkeypatch):
+    sizes = []
+    monkeypatch.setattr(ai_orchestrator, "warm_up_sync", lambda batch: sizes.append(len(batch)))
+    monkeypatch.setattr(ai_orchestrator, "_synthetic_image_bytes", lambda: b"jpeg")
+    monkeypatch.setattr(Config, "WARMUP_ENABLED", True)
+    return sizes
+
+def test_warm_up_runs_every_power_of_two_batch_size(warmed_sizes, monkeypatch):
+    monkeypatch.setattr(Config, "WARMUP_BATCH_SIZES", [])
+    monkeypatch.setattr(Config, "MAX_BATCH_SIZE", 6)
+    ai_orchestrator.warm_up_model()
+    assert warmed_sizes == [1, 2, 4, 6]
+
+def test_configured_batch_sizes_win(warmed_sizes, monkeypatch):
+    monkeypatch.setattr(Config, "WARMUP_BATCH_SIZES", [3])
+    ai_orchestrator.warm_up_model()
+    assert warmed_sizes == [3]
+
+def test_warm_up_can_be_disabled(warmed_sizes, monkeypatch):
+    monkeypatch.setattr(Config, "WARMUP_ENABLED", False)
+    ai_orchestrator.warm_up_model()
+    assert warmed_sizes == []
+
+@pytest.mark.parametrize("state, status_code", [
+    ("not_loaded", 503), ("loading", 503), ("warming_up", 503), ("failed", 503), ("ready", 200),
+])
+def test_readiness_follows_the_model_state(monkeypatch, state, status_code):
+    monkeypatch.setattr(ai_orchestrator, "model_state", state)
+    response = TestClient(main.app).get("/health/ready")
+    assert response.status_code == status_code
+    assert response.json()["model"] == state
+
+def test_failed_load_is_reported(monkeypatch):
+    def broken_load(model_name):
+        raise OSError("model files missing")
+
+    monkeypatch.setattr(ai_orchestrator, "model_state", "not_loaded")
+    monkeypatch.setattr(ai_orchestrator, "_load_classifier", broken_load)
+    with pytest.raises(OSError):
+        ai_orchestrator.load_model()
+    assert ai_orchestrator.get_model_state() == "failed"
+    assert TestClient(main.app).get("/health/live").status_code == 200
@@ -0,0 +1,146 @@
+"""
+Result cache tiers (exact bytes, then perceptual hash), and the rule that
+it only keeps meals that came from a real model prediction and real
+nutrition lookups for every item
+"""
+import asyncio
+from io import BytesIO
+import pytest
+from PIL import Image, ImageDraw
+from config import Config
+from ai_orchestrator import AIOrchestrator
+from result_cache import ResultCache, perceptual_hash
+
+IMAGE = b"not really a jpeg"
+
+RESULT = {"identified_foods": [{"name": "pizza", "confidence": 0.9}], "nutrition": {"calories": 285}}
+
+def _photo(size=(320, 240), quality=90, shapes=((40, 40, 160, 200),)):
+    """A JPEG with enough structure for the difference hash to bite on"""
+    image = Image.new("RGB", size, (235, 225, 200))
+    draw = ImageDraw.Draw(image)
+    scale_x, scale_y = size[0] / 320, size[1] / 240
+    for left, top, right, bottom in shapes:
+        draw.ellipse((left * scale_x, top * scale_y, right * scale_x, bottom * scale_y), fill=(180, 60, 30))
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+def _cache(enable_phash):
+    return ResultCache(max_bytes=1 << 20, ttl_seconds=60, max_entries=16, enable_phash=enable_phash)
+
+def _store_and_lookup(cache, stored, looked_up):
+    async def scenario():
+        cached, fingerprint = await cache.lookup(stored)
+        assert cached is None
+        cache.store(fingerprint, RESULT)
+        return (await cache.lookup(looked_up))[0]
+    return asyncio.run(scenario())
+
+def test_exact_tier_hits_identical_bytes_with_a_copy():
+    cache = _cache(enable_phash=False)
+    photo = _photo()
+    cached = _store_and_lookup(cache, photo, photo)
+
+    assert cached == RESULT
+    cached["nutrition"]["calories"] = 0
+    assert asyncio.run(cache.lookup(photo))[0] == RESULT
+    assert cache.get_stats()["exact_hits"] == 2
+
+def test_reencoded_photo_only_hits_the_phash_tier():
+    original, reencoded = _photo(), _photo(size=(640, 480), quality=60)
+    assert (perceptual_hash(original) ^ perceptual_hash(reencoded)).bit_count() <= 4
+
+    assert _store_and_lookup(_cache(enable_phash=False), original, reencoded) is None
+    cache = _cache(enable_phash=True)
+    assert _store_and_lookup(cache, original, reencoded) == RESULT
+    assert cache.get_stats()["phash_hits"] == 1
+
+def test_different_photo_misses_the_phash_tier():
+    cache = _cache(enable_phash=True)
+    other = _photo(shapes=((200, 20, 300, 90), (20, 150, 120, 230)))
+    assert _store_and_lookup(cache, _photo(), other) is None
+    assert cache.get_stats()["misses"] == 2
+
+def test_undecodable_bytes_fall_back_to_the_exact_tier():
+    cache = _cache(enable_phash=True)
+    assert _store_and_lookup(cache, b"not an image", b"not an image") == RESULT
+
+def _nutrition(name):
+    return {"name": name, "calories": 200, "protein": 10, "carbs": 20,
+            "fat": 8, "fiber": 1, "sugar": 2, "sodium": 100}
+
+@pytest.fixture
+def orchestrator(monkeypatch):
+    monkeypatch.setattr(Config, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(Config, "RESULT_CACHE_PHASH", False)
+    monkeypatch.setattr(Config, "NUTRITION_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "FDC_DB_PATH", "")
+    orchestrator = AIOrchestrator()
+
+    async def identify_food_items(image_data):
+        return [{"name": "pizza", "confidence": 0.9, "portion_size": "medium", "weight_grams": 200}]
+
+    async def lookup_food_nutrition(client, food):
+        return _nutrition(food["name"])
+
+    monkeypatch.setattr(orchestrator, "identify_food_items", identify_food_items)
+    monkeypatch.setattr(orchestrator, "lookup_food_nutrition", lookup_food_nutrition)
+    return orchestrator
+
+def _analyze(orchestrator):
+    return asyncio.run(orchestrator.process_meal(IMAGE, None, None, {}))
+
+def test_real_result_is_cached(orchestrator):
+    _analyze(orchestrator)
+    assert orchestrator.result_cache.get_stats()["entries"] == 1
+
+def test_fallback_foods_are_not_cached(orchestrator, monkeypatch):
+    async def identify_food_items(image_data):
+        return orchestrator.get_fallback_foods()
+
+    monkeypatch.setattr(orchestrator, "identify_food_items", identify_food_items)
+    result = _analyze(orchestrator)
+
+    assert result["identified_foods"][0]["fallback"] is True
+    assert orchestrator.result_cache.get_stats()["entries"] == 0
+
+def test_estimated_nutrition_is_not_cached(orchestrator, monkeypatch):
+    async def lookup_food_nutrition(client, food):
+        return None
+
+    monkeypatch.setattr(orchestrator, "lookup_food_nutrition", lookup_food_nutrition)
+    result = _analyze(orchestrator)
+
+    assert result["nutrition"]["items"][0]["estimated"] is True
+    assert orchestrator.result_cache.get_stats()["entries"] == 0
+
+def test_partial_lookups_are_not_cached(orchestrator, monkeypatch):
+    async def identify_food_items(image_data):
+        return [
+            {"name": "pizza", "confidence": 0.6, "portion_size": "medium", "weight_grams": 200},
+            {"name": "salad", "confidence": 0.3, "portion_size": "medium", "weight_grams": 200},
+        ]
+
+    async def lookup_food_nutrition(client, food):
+        if food["name"] == "salad":
+            raise RuntimeError("USDA unavailable")
+        return _nutrition(food["name"])
+
+    monkeypatch.setattr(orchestrator, "identify_food_items", identify_food_items)
+    monkeypatch.setattr(orchestrator, "lookup_food_nutrition", lookup_food_nutrition)
+    _analyze(orchestrator)
+
+    assert orchestrator.result_cache.get_stats()["entries"] == 0
+
+def test_batch_skips_fallback_images(orchestrator, monkeypatch):
+    async def identify_food_items_batch(images_data):
+        return [
+            [{"name": "pizza", "confidence": 0.9, "portion_size": "medium", "weight_grams": 200}],
+            orchestrator.get_fallback_foods(),
+        ]
+
+    monkeypatch.setattr(orchestrator, "identify_food_items_batch", identify_food_items_batch)
+    asyncio.run(orchestrator.process_meal_batch([b"first photo", b"second photo"], {}))
+
+    assert orchestrator.result_cache.get_stats()["entries"] == 1
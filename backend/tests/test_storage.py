@@ -0,0 +1,211 @@
+"""
+DatabaseConnector on the embedded SQLite backend: keyset paging, timestamp
+normalization, upserts and the profile/gamification read-through cache
+"""
+import re
+import json
+import uuid
+import base64
+import asyncio
+import pytest
+from config import Config
+from db_connector import (
+    DatabaseConnector, ReadThroughCache, decode_meal_cursor, encode_meal_cursor, parse_meal_time
+)
+from sqlite_backend import SqliteBackend, to_timestamp
+
+STORED_TIMESTAMP = re.compile(r"^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{6}Z$")
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "DB_CACHE_ENABLED", True)
+    db = DatabaseConnector(SqliteBackend(str(tmp_path / "tracktreat.sqlite3"), pool_size=2))
+    yield db
+    asyncio.run(db.close())
+
+def _user():
+    return str(uuid.uuid4())
+
+def _all_pages(db, user_id, limit, **kwargs):
+    async def collect():
+        meals, cursors, cursor = [], [], None
+        while True:
+            page, cursor = await db.get_meals_page(user_id, cursor=cursor, limit=limit, **kwargs)
+            meals.extend(page)
+            if cursor is None:
+                return meals, cursors
+            cursors.append(cursor)
+    return asyncio.run(collect())
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-03-01T12:00:00+02:00", "2024-03-01T10:00:00.000000Z"),
+    ("2024-03-01T10:00:00Z", "2024-03-01T10:00:00.000000Z"),
+    ("2024-03-01T10:00:00.5", "2024-03-01T10:00:00.500000Z"),
+    ("2024-03-01", "2024-03-01T00:00:00.000000Z"),
+    ("not a date", "not a date"),
+    (None, None),
+])
+def test_timestamps_are_normalized_to_fixed_width_utc(value, expected):
+    assert to_timestamp(value) == expected
+
+def test_default_timestamps_use_the_stored_format(db):
+    user_id = _user()
+    asyncio.run(db.create_meal({"user_id": user_id, "meal_name": "Lunch"}))
+    meals, _ = _all_pages(db, user_id, limit=10, projection="detail")
+    assert STORED_TIMESTAMP.match(meals[0]["logged_at"])
+    assert STORED_TIMESTAMP.match(meals[0]["created_at"])
+
+def test_meal_cursor_round_trip():
+    meal_id = str(uuid.uuid4())
+    cursor = encode_meal_cursor({"id": meal_id, "logged_at": "2024-03-01T10:00:00.000000Z"})
+    assert decode_meal_cursor(cursor) == ("2024-03-01T10:00:00+00:00", meal_id)
+
+def _raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    _raw_cursor(["2024-03-01T10:00:00Z"]),
+    _raw_cursor({"logged_at": "2024-03-01T10:00:00Z", "id": str(uuid.uuid4())}),
+    _raw_cursor(["2024-03-01T10:00:00Z", "abc"]),
+    _raw_cursor(["2024-03-01T10:00:00Z", "1),user_id.neq.(x"]),
+    _raw_cursor(['2024-03-01",id.gt."0', str(uuid.uuid4())]),
+    _raw_cursor([20240301, str(uuid.uuid4())]),
+])
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_meal_cursor(cursor)
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-03-02", "2024-03-02T00:00:00"),
+    ("2024-03-02T08:00:00Z", "2024-03-02T08:00:00+00:00"),
+    ("2024-03-02T10:00:00+02:00", "2024-03-02T10:00:00+02:00"),
+])
+def test_meal_dates_are_canonicalized(value, expected):
+    assert parse_meal_time(value) == expected
+
+@pytest.mark.parametrize("value", ["yesterday", '2024-03-02",id.gt."0', "2024-13-01", None])
+def test_bad_meal_dates_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_meal_time(value)
+
+def test_pages_follow_logged_at_then_id_order(db):
+    user_id = _user()
+    # Mixed offsets, and pairs sharing a timestamp so pages also split on id
+    logged_at = [
+        "2024-03-01T12:00:00+02:00",  # 10:00Z
+        "2024-03-01T11:00:00Z",
+        "2024-03-01T11:00:00Z",
+        "2024-03-01T06:30:00-05:00",  # 11:30Z
+        "2024-03-02",
+        "2024-03-02T00:00:00Z",
+        "2024-02-28T23:59:59.999999Z",
+    ]
+    asyncio.run(db.create_meals([
+        {"user_id": user_id, "meal_name": f"Meal {i}", "logged_at": value}
+        for i, value in enumerate(logged_at)
+    ]))
+    asyncio.run(db.create_meal({"user_id": _user(), "meal_name": "Someone else's"}))
+
+    meals, cursors = _all_pages(db, user_id, limit=2)
+
+    assert len(meals) == len(logged_at)
+    assert len(cursors) == 3
+    keys = [(meal["logged_at"], meal["id"]) for meal in meals]
+    assert keys == sorted(keys, reverse=True)
+    assert [meal["meal_name"] for meal in meals][-2:] == ["Meal 0", "Meal 6"]
+
+def test_get_meals_page(db):
+    user_id = _user()
+    asyncio.run(db.create_meals([
+        {"user_id": user_id, "meal_name": f"Meal {day}", "transcript": "Grilled chicken",
+         "nutrition": {"calories": 500 + day}, "logged_at": f"2024-03-{day:02d}T12:00:00Z"}
+        for day in range(1, 5)
+    ]))
+
+    # Exactly `limit` rows left: no cursor for an empty next page
+    page, cursor = asyncio.run(db.get_meals_page(user_id, limit=4))
+    assert len(page) == 4 and cursor is None
+
+    page, cursor = asyncio.run(db.get_meals_page(user_id, limit=3))
+    assert [meal["meal_name"] for meal in page] == ["Meal 4", "Meal 3", "Meal 2"]
+    assert decode_meal_cursor(cursor) == (parse_meal_time(page[-1]["logged_at"]), page[-1]["id"])
+    assert page[0]["nutrition"] == {"calories": 504}
+    assert "transcript" not in page[0]
+
+    page, cursor = asyncio.run(db.get_meals_page(user_id, cursor=cursor, limit=3, projection="detail"))
+    assert [meal["meal_name"] for meal in page] == ["Meal 1"]
+    assert page[0]["transcript"] == "Grilled chicken"
+    assert cursor is None
+
+    page, _ = asyncio.run(db.get_meals_page(
+        user_id, start_date="2024-03-02", end_date="2024-03-03T23:59:59+00:00", limit=10
+    ))
+    assert [meal["meal_name"] for meal in page] == ["Meal 3", "Meal 2"]
+
+    with pytest.raises(ValueError):
+        asyncio.run(db.get_meals_page(user_id, projection="everything"))
+
+def test_profile_upsert(db):
+    user_id = _user()
+
+    async def scenario():
+        assert await db.get_profile(user_id) is None
+        assert await db.update_profile(user_id, {"weight_kg": 70, "gender": "female"})
+        assert (await db.get_profile(user_id))["weight_kg"] == 70
+        assert await db.update_profile(user_id, {"weight_kg": 68, "height_cm": 170})
+        return await db.get_profile(user_id)
+
+    profile = asyncio.run(scenario())
+    assert (profile["weight_kg"], profile["height_cm"], profile["gender"]) == (68, 170, "female")
+
+def test_gamification_upsert(db):
+    user_id = _user()
+
+    async def scenario():
+        assert await db.update_gamification(user_id, {"xp": 10, "badges": ["first_meal"]})
+        assert (await db.get_gamification(user_id))["xp"] == 10
+        assert await db.update_gamification(user_id, {"xp": 25, "current_level": 2})
+        return await db.get_gamification(user_id)
+
+    row = asyncio.run(scenario())
+    assert (row["xp"], row["current_level"], row["badges"]) == (25, 2, ["first_meal"])
+
+def test_invalidation_stops_a_stale_fetch_from_caching():
+    cache = ReadThroughCache("profiles", max_entries=10, ttl_seconds=60)
+
+    async def scenario():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_fetch():
+            started.set()
+            await release.wait()
+            return {"weight_kg": 70}
+
+        # A read starts, a write lands and invalidates, then the old read returns
+        read = asyncio.ensure_future(cache.get("user", slow_fetch))
+        await started.wait()
+        cache.invalidate("user")
+        release.set()
+        assert await read == {"weight_kg": 70}
+        assert cache.entries.get("user") is None
+
+        async def fresh_fetch():
+            return {"weight_kg": 68}
+
+        assert await cache.get("user", fresh_fetch) == {"weight_kg": 68}
+        assert cache.entries.get("user") == {"weight_kg": 68}
+
+    asyncio.run(scenario())
+    assert cache.invalidations == 1
+    assert cache._versions == {} and cache._fetching == {}
+
+def test_cached_rows_are_copies():
+    cache = ReadThroughCache("profiles", max_entries=10, ttl_seconds=60)
+
+    async def fetch():
+        return {"weight_kg": 70}
+
+    row = asyncio.run(cache.get("user", fetch))
+    row["weight_kg"] = 1
+    assert cache.entries.get("user") == {"weight_kg": 70}
@@ -0,0 +1,90 @@
+"""SupabaseBackend requests, checked against a mock PostgREST transport"""
+import json
+import uuid
+import asyncio
+import httpx
+import pytest
+import db_backends
+from db_backends import SupabaseBackend
+from db_connector import DatabaseConnector, encode_meal_cursor
+
+@pytest.fixture
+def sent(monkeypatch):
+    monkeypatch.setattr(db_backends, "SUPABASE_ANON_KEY", "anon-key")
+    monkeypatch.setattr(db_backends, "SUPABASE_SERVICE_KEY", "service-key")
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json=[])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(SupabaseBackend, "client", property(lambda self: client))
+    return seen
+
+def test_meal_page_filters_are_canonical_and_quoted(sent):
+    db = DatabaseConnector(SupabaseBackend("https://project.supabase.co"))
+    meal_id = str(uuid.uuid4())
+    cursor = encode_meal_cursor({"logged_at": "2024-03-01T10:00:00Z", "id": meal_id})
+
+    asyncio.run(db.get_meals_page("user", start_date="2024-02-01", cursor=cursor, limit=10))
+
+    assert sent[0].url.params["and"] == (
+        '(logged_at.gte."2024-02-01T00:00:00",'
+        'or(logged_at.lt."2024-03-01T10:00:00+00:00",'
+        f'and(logged_at.eq."2024-03-01T10:00:00+00:00",id.lt."{meal_id}")))'
+    )
+
+def test_filter_syntax_in_dates_never_reaches_postgrest(sent):
+    db = DatabaseConnector(SupabaseBackend("https://project.supabase.co"))
+    with pytest.raises(ValueError):
+        asyncio.run(db.get_meals_page("user", end_date='2024-03-01",user_id.neq."x'))
+    assert sent == []
+
+def test_profile_update_is_an_upsert(sent):
+    backend = SupabaseBackend("https://project.supabase.co")
+    asyncio.run(backend.update_profile("user", {"id": "ignored", "weight_kg": 70}))
+
+    request = sent[0]
+    assert (request.method, request.url.path) == ("POST", "/rest/v1/profiles")
+    assert request.url.params["on_conflict"] == "user_id"
+    assert "resolution=merge-duplicates" in request.headers["prefer"]
+    assert json.loads(request.content) == {"weight_kg": 70, "user_id": "user"}
+
+def test_bulk_insert_is_one_minimal_request(sent):
+    backend = SupabaseBackend("https://project.supabase.co")
+    asyncio.run(backend.insert_meals([
+        {"user_id": "user", "meal_name": "Lunch", "nutrition": {"calories": 500}},
+        {"user_id": "user", "meal_name": "Dinner", "logged_at": "2024-03-01T19:00:00Z"},
+    ]))
+
+    assert len(sent) == 1
+    request = sent[0]
+    assert (request.method, request.url.path) == ("POST", "/rest/v1/meals")
+    # Every column is listed, so the first row's missing logged_at gets its default
+    assert request.url.params["columns"] == "logged_at,meal_name,nutrition,user_id"
+    assert "return=minimal" in request.headers["prefer"] and "missing=default" in request.headers["prefer"]
+    assert [meal["meal_name"] for meal in json.loads(request.content)] == ["Lunch", "Dinner"]
+
+def test_gamification_write_is_one_upsert(sent):
+    backend = SupabaseBackend("https://project.supabase.co")
+    asyncio.run(backend.upsert_gamification("user", {"xp": 25, "user_id": "someone else"}))
+
+    assert len(sent) == 1
+    request = sent[0]
+    assert (request.method, request.url.path) == ("POST", "/rest/v1/gamification")
+    assert request.url.params["on_conflict"] == "user_id"
+    assert "resolution=merge-duplicates" in request.headers["prefer"]
+    assert "return=minimal" in request.headers["prefer"]
+    assert json.loads(request.content) == {"xp": 25, "user_id": "user"}
+
+@pytest.mark.parametrize("write", [
+    lambda backend: backend.update_meal("meal", "user", {"meal_name": "Brunch"}),
+    lambda backend: backend.delete_meal("meal", "user"),
+])
+def test_meal_writes_skip_the_representation(sent, write):
+    asyncio.run(write(SupabaseBackend("https://project.supabase.co")))
+
+    request = sent[0]
+    assert request.url.params["id"] == "eq.meal" and request.url.params["user_id"] == "eq.user"
+    assert "return=minimal" in request.headers["prefer"]
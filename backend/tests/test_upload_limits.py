@@ -0,0 +1,44 @@
+from typing import List
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from upload_limits import UploadLimitMiddleware
+
+LIMIT = 1024
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, limits={"/upload": LIMIT})
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    @app.post("/unlimited")
+    async def unlimited(files: List[UploadFile] = File(...)):
+        return {"files": len(files)}
+
+    return TestClient(app)
+
+def test_small_upload_passes(client):
+    response = client.post("/upload", files={"file": ("meal.jpg", b"x" * 100)})
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+def test_content_length_over_limit_is_refused(client):
+    response = client.post("/upload", files={"file": ("meal.jpg", b"x" * (2 * LIMIT))})
+    assert response.status_code == 413
+
+def test_body_without_content_length_is_cut_off(client):
+    body = b"x" * (2 * LIMIT)
+    response = client.post(
+        "/upload",
+        content=iter([body[:LIMIT // 2], body[LIMIT // 2:]]),
+        headers={"Content-Type": "multipart/form-data; boundary=limit"}
+    )
+    assert response.status_code == 413
+
+def test_other_paths_are_not_limited(client):
+    response = client.post("/unlimited", files={"files": ("meal.jpg", b"x" * (2 * LIMIT))})
+    assert response.status_code == 200
@@ -0,0 +1,71 @@
+"""
+Detail lookups from concurrent USDA searches share one multi-item
+POST /foods request, and each caller gets its own food back
+"""
+import json
+import types
+import asyncio
+import httpx
+import pytest
+import ai_orchestrator
+from config import Config
+
+FDC_IDS = {"pizza": 101, "salad": 102, "apple": 103, "sushi": 104}
+
+def _food(fdc_id, calories):
+    return {"fdcId": fdc_id, "foodNutrients": [
+        {"nutrient": {"name": "Energy"}, "amount": calories},
+        {"nutrient": {"name": "Protein"}, "amount": 5},
+    ]}
+
+@pytest.fixture
+def usda(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path.endswith("/foods/search"):
+            fdc_id = FDC_IDS.get(request.url.params["query"])
+            return httpx.Response(200, json={"foods": [{"fdcId": fdc_id}] if fdc_id else []})
+        ids = json.loads(request.content)["fdcIds"]
+        # Out of order, and FDC has no record for sushi
+        return httpx.Response(200, json=[_food(fdc_id, fdc_id * 2) for fdc_id in reversed(ids) if fdc_id != 104])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ai_orchestrator, "http_clients", types.SimpleNamespace(get=lambda name: client))
+    monkeypatch.setattr(Config, "USDA_BATCH_DETAILS", True)
+    monkeypatch.setattr(Config, "NUTRITION_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "FDC_DB_PATH", "")
+    return client, requests
+
+def test_concurrent_detail_lookups_share_one_request(usda):
+    client, requests = usda
+    orchestrator = ai_orchestrator.AIOrchestrator()
+
+    async def scenario():
+        try:
+            return await asyncio.gather(*(
+                orchestrator.fetch_usda_nutrition(client, {"name": name}) for name in FDC_IDS
+            ))
+        finally:
+            await ai_orchestrator.usda_detail_batcher.close()
+
+    pizza, salad, apple, sushi = asyncio.run(scenario())
+
+    detail_requests = [request for request in requests if request.method == "POST"]
+    assert len(detail_requests) == 1
+    assert sorted(json.loads(detail_requests[0].content)["fdcIds"]) == [101, 102, 103, 104]
+    assert (pizza["name"], pizza["calories"], pizza["protein"]) == ("pizza", 202, 5)
+    assert (salad["calories"], apple["calories"]) == (204, 206)
+    assert sushi is None
+
+def test_duplicate_ids_are_requested_once(usda):
+    _, requests = usda
+
+    async def scenario():
+        return await ai_orchestrator.fetch_food_details([101, 102, 101])
+
+    foods = asyncio.run(scenario())
+    assert [food["fdcId"] for food in foods] == [101, 102, 101]
+    assert json.loads(requests[0].content)["fdcIds"] == [101, 102]
@@ -0,0 +1,58 @@
+"""Profile and badge routes only serve the authenticated user's own rows"""
+import uuid
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import main
+from db_connector import DatabaseConnector
+from sqlite_backend import SqliteBackend
+
+ALICE, BOB = str(uuid.uuid4()), str(uuid.uuid4())
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    db = DatabaseConnector(SqliteBackend(str(tmp_path / "tracktreat.sqlite3"), pool_size=1))
+    monkeypatch.setattr(main, "db", db)
+    asyncio.run(db.update_profile(BOB, {"weight_kg": 80}))
+    asyncio.run(db.update_gamification(BOB, {"xp": 100}))
+    yield TestClient(main.app)
+    asyncio.run(db.close())
+
+@pytest.mark.parametrize("method, path", [
+    ("get", f"/profiles/{BOB}"),
+    ("put", f"/profiles/{BOB}"),
+    ("get", f"/badges/{BOB}"),
+])
+def test_routes_need_a_token(client, auth_headers, method, path):
+    assert client.request(method, path, json={"weight_kg": 1}).status_code == 401
+
+@pytest.mark.parametrize("method, path", [
+    ("get", f"/profiles/{BOB}"),
+    ("put", f"/profiles/{BOB}"),
+    ("get", f"/badges/{BOB}"),
+])
+def test_other_users_rows_are_off_limits(client, auth_headers, method, path):
+    response = client.request(method, path, json={"weight_kg": 1}, headers=auth_headers(ALICE))
+    assert response.status_code == 403
+
+def test_own_profile_round_trip(client, auth_headers):
+    headers = auth_headers(ALICE)
+    response = client.put(f"/profiles/{ALICE}", json={"weight_kg": 61.5}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["weight_kg"] == 61.5
+    assert client.get(f"/profiles/{ALICE}", headers=headers).json()["weight_kg"] == 61.5
+    assert client.get(f"/profiles/{BOB}", headers=auth_headers(BOB)).json()["weight_kg"] == 80
+
+def test_badges_keep_the_documented_shape(client, auth_headers):
+    badge = {"id": "first_meal", "name": "First Bite", "description": "Logged a first meal",
+             "xp": 50, "earned_at": "2025-05-20T12:00:00Z"}
+    asyncio.run(main.db.update_gamification(ALICE, {"xp": 60, "current_level": 2, "badges": [badge]}))
+
+    response = client.get(f"/badges/{ALICE}", headers=auth_headers(ALICE))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"user_id", "badges", "current_level", "xp", "last_updated"}
+    assert body["badges"] == [{key: badge[key] for key in ("id", "name", "description", "earned_at")}]
+    assert (body["user_id"], body["current_level"], body["xp"]) == (ALICE, 2, 60)
+    assert body["last_updated"]
@@ -0,0 +1,84 @@
+"""
+Request body size limits for TrackTreat AI uploads
+
+FastAPI parses multipart forms, spooling every file to memory or disk,
+before a route handler runs, so a per-file check in the handler can only
+reject an oversized upload after all of it has arrived. This ASGI
+middleware caps the whole request body instead: an oversized
+Content-Length is refused up front, and a body without one (chunked
+encoding, or a client that lies) is cut off with a 413 as soon as the
+bytes received cross the limit.
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict, MutableMapping
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("upload_limits")
+
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body too large (max {max_size} bytes)")
+
+class UploadLimitMiddleware:
+    """
+    Caps the request body of the given paths, in bytes. Other paths are
+    passed through untouched.
+    """
+
+    def __init__(self, app: Any, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Message, receive: Receive, send: Send) -> None:
+        max_size = self.limits.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if max_size is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+            logger.warning(f"Rejected {scope['path']} upload: Content-Length {int(content_length)} > {max_size}")
+            await self._reject(scope, receive, send, _too_large(max_size))
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    logger.warning(f"Rejected {scope['path']} upload: body passed {max_size} bytes")
+                    # FastAPI passes HTTPExceptions raised while parsing the form
+                    # through to its exception handlers, which answer with a 413
+                    raise _too_large(max_size)
+            return message
+
+        async def tracked_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except HTTPException as e:
+            # Only reached when nothing inside the app turned it into a response
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(scope, receive, send, e)
+
+    @staticmethod
+    async def _reject(scope: Message, receive: Receive, send: Send, error: HTTPException) -> None:
+        response = JSONResponse({"detail": error.detail}, status_code=error.status_code,
+                                headers={"Connection": "close"})
+        await response(scope, receive, send)